@@ -0,0 +1,157 @@
+import os
+import re
+import sys
+import time
+import random
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+MAX_STACK_DEPTH = 128
+
+def _frame_name(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+def collapse_stack(frame, limit=MAX_STACK_DEPTH):
+    """Collapse a frame and its callers to 'root;...;leaf' (one entry per function)"""
+    names = []
+    while frame is not None and len(names) < limit:
+        names.append(_frame_name(frame.f_code))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+# evodoc_prototype/src/telemetry/profiler.py has the same sampler for the
+# FastAPI prototype. The backend is deployed on its own (own requirements, run
+# through manage.py) and the prototype's `src` package is not installed here,
+# so it cannot be imported; sampling fixes belong in both files.
+class SamplingProfiler:
+    """Statistical profiler for a sampled fraction of requests
+
+    A background thread wakes every interval_ms while a sampled request is in
+    flight, reads the stack of each thread serving one from
+    sys._current_frames() and counts collapsed stacks. Samples are added to
+    the endpoint's profile when the request ends and can be written as
+    collapsed-stack files for flamegraph.pl or speedscope.
+    """
+
+    def __init__(self, sample_rate=0.0, interval_ms=5.0, output_dir=None):
+        self.sample_rate = sample_rate
+        self.interval = interval_ms / 1000.0
+        self.output_dir = output_dir
+        self.profiles = {}
+        self.requests = Counter()
+        self._active = {}
+        self._next_token = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def should_sample(self):
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def begin(self, thread_id):
+        """Start sampling the thread serving a request; returns a token for end()"""
+        with self._lock:
+            self._next_token += 1
+            token = self._next_token
+            self._active[token] = {"thread_id": thread_id, "stacks": Counter()}
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+                self._thread.start()
+            self._wake.set()
+        return token
+
+    def end(self, token, endpoint):
+        """Stop sampling a request and add its samples to the endpoint's profile"""
+        with self._lock:
+            entry = self._active.pop(token, None)
+            if not self._active:
+                self._wake.clear()
+            if entry is None:
+                return
+            self.requests[endpoint] += 1
+            self.profiles.setdefault(endpoint, Counter()).update(entry["stacks"])
+
+    def _sample(self):
+        frames = sys._current_frames()
+        with self._lock:
+            for entry in self._active.values():
+                frame = frames.get(entry["thread_id"])
+                if frame is not None:
+                    entry["stacks"][collapse_stack(frame)] += 1
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            self._sample()
+            time.sleep(self.interval)
+
+    def collapsed(self, endpoint=None):
+        """Dictionary of endpoint -> collapsed-stack text"""
+        with self._lock:
+            profiles = {name: Counter(stacks) for name, stacks in self.profiles.items()
+                        if endpoint is None or name == endpoint}
+        return {name: "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+                for name, stacks in profiles.items()}
+
+    def combined(self, endpoint=None):
+        """All endpoints in one collapsed-stack text, each rooted at its endpoint name"""
+        return "".join(f"{name};{line}\n" for name, text in self.collapsed(endpoint).items()
+                       for line in text.splitlines())
+
+    def dump(self, output_dir=None, endpoint=None):
+        """Write one <endpoint>.collapsed file per endpoint; returns the paths"""
+        output_dir = output_dir or self.output_dir
+        os.makedirs(output_dir, exist_ok=True)
+        paths = []
+        for name, text in self.collapsed(endpoint).items():
+            path = os.path.join(output_dir, f"{re.sub(r'[^A-Za-z0-9]+', '_', name).strip('_') or 'root'}.collapsed")
+            with open(path, "w") as f:
+                f.write(text)
+            paths.append(path)
+        return paths
+
+    def reset(self):
+        with self._lock:
+            self.profiles.clear()
+            self.requests.clear()
+
+_profiler = None
+
+def get_profiler():
+    """Process-wide profiler configured from the PROFILE_* settings"""
+    global _profiler
+    if _profiler is None:
+        _profiler = SamplingProfiler(
+            sample_rate=getattr(settings, 'PROFILE_SAMPLE_RATE', 0.0),
+            interval_ms=getattr(settings, 'PROFILE_INTERVAL_MS', 5.0),
+            output_dir=str(getattr(settings, 'PROFILE_DIR', settings.BASE_DIR / 'logs' / 'profiles'))
+        )
+    return _profiler
+
+def endpoint_name(request):
+    """'METHOD /route/pattern/' for the matched URL pattern (keeps one profile per endpoint)"""
+    match = getattr(request, 'resolver_match', None)
+    route = f"/{match.route}" if match is not None and match.route else "unmatched"
+    return f"{request.method} {route}"
+
+class SamplingProfilerMiddleware:
+    """Profile PROFILE_SAMPLE_RATE of requests; removed from the stack when the rate is 0"""
+
+    def __init__(self, get_response):
+        self.profiler = get_profiler()
+        if self.profiler.sample_rate <= 0:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not self.profiler.should_sample():
+            return self.get_response(request)
+
+        token = self.profiler.begin(threading.get_ident())
+        try:
+            return self.get_response(request)
+        finally:
+            self.profiler.end(token, endpoint_name(request))
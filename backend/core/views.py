@@ -1,4 +1,21 @@
+import os
 from django.http import HttpResponse
+from django.contrib.admin.views.decorators import staff_member_required
+
+from .profiling import get_profiler
 
 def home(request):
     return HttpResponse("<h1>Welcome to EvoDoc</h1><p>The healthcare platform that evolves with patient feedback.</p>")
+
+@staff_member_required
+def profile_dump(request):
+    """Current sampled profile as collapsed stacks (?endpoint=, ?save=1 writes files, ?reset=1 clears)"""
+    profiler = get_profiler()
+    endpoint = request.GET.get('endpoint')
+    response = HttpResponse(profiler.combined(endpoint), content_type='text/plain')
+    if request.GET.get('save') == '1':
+        paths = profiler.dump(endpoint=endpoint)
+        response['X-Profile-Files'] = ','.join(os.path.basename(path) for path in paths)
+    if request.GET.get('reset') == '1':
+        profiler.reset()
+    return response
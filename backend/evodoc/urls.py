@@ -2,10 +2,11 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
-from core.views import home
+from core.views import home, profile_dump
 
 urlpatterns = [
     path('', home, name='home'),
+    path('admin/profile/', profile_dump, name='profile_dump'),
     path('admin/', admin.site.urls),
     path('api-auth/', include('rest_framework.urls')),
 ]
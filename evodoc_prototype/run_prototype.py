@@ -63,19 +63,31 @@ def train_models():
     
     print("Models trained successfully!")
 
-def start_api_server():
-    """Start API server"""
+def start_api_server(production=False):
+    """Start API server and wait until it reports ready
+
+    Args:
+        production: Use the pre-forked multi-worker server instead of the
+            single development process
+    """
+    from src.api.serve import wait_until_ready
+
     print("Starting API server...")
     
     # Start API server in a new process
+    module = "src.api.serve" if production else "src.api.run"
     api_process = subprocess.Popen(
-        [sys.executable, "-m", "src.api.run"],
+        [sys.executable, "-m", module],
         stdout=subprocess.PIPE,
         stderr=subprocess.STDOUT
     )
     
-    # Wait a bit for the server to start
-    time.sleep(2)
+    # Wait for the readiness probe (models loaded) instead of a fixed sleep
+    try:
+        seconds = wait_until_ready("http://localhost:8000/health/ready")
+        print(f"API server ready after {seconds:.1f}s")
+    except TimeoutError as e:
+        print(f"API server did not become ready: {e}")
     
     return api_process
 
@@ -102,7 +114,7 @@ def main():
     setup_database()
     generate_data()
     train_models()
-    api_process = start_api_server()
+    api_process = start_api_server(production="--production" in sys.argv)
     start_frontend_server()
     
     print("Prototype is running! Press Ctrl+C to stop.")
@@ -0,0 +1,33 @@
+import hashlib
+
+import orjson
+
+def page_etag(rows):
+    """Weak ETag for a page of version rows
+
+    The ETag hashes every row (ids, timestamps and any unversioned fields
+    the page shows), so edits, inserts and deletes that change the page
+    change it. There is deliberately no
+    Last-Modified: rows with older timestamps can move into a skip/limit
+    page, changing it without advancing its newest timestamp.
+
+    Args:
+        rows: Version row tuples (ids, created_at/updated_at and unversioned fields)
+
+    Returns:
+        ETag header value
+    """
+    digest = hashlib.sha1(orjson.dumps([tuple(row) for row in rows])).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+def validator_headers(etag):
+    """ETag and Cache-Control headers for a pollable response"""
+    return {"ETag": etag, "Cache-Control": "no-cache"}
+
+def is_not_modified(request_headers, etag):
+    """Whether a conditional GET can be answered with 304 Not Modified (If-None-Match only)"""
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is None:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or any(tag.removeprefix("W/") == etag.removeprefix("W/") for tag in tags)
@@ -1,12 +1,24 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+import os
+import secrets
+from datetime import datetime
+from fastapi import FastAPI, Depends, Header, HTTPException, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from pydantic import BaseModel
 
 from ..db.config import get_db
 from ..db.models import Patient, Doctor, Appointment, Treatment, Allergy
-from ..ml.predict import recommend_treatments
+from ..ml.registry import REGISTRY
+from ..telemetry.metrics import CONTENT_TYPE, render_metrics
+from ..telemetry.profiler import PROFILER
+from ..telemetry.tracing import span
+from .conditional import page_etag, validator_headers, is_not_modified
+from .middleware import TimingMiddleware, ProfilingMiddleware, CompressionMiddleware, ProfiledRoute
+
+# Token required by the /admin/ endpoints (unset disables them)
+ADMIN_TOKEN_ENV = "EVODOC_ADMIN_TOKEN"
 
 # Create FastAPI app
 app = FastAPI(
@@ -15,6 +27,9 @@ app = FastAPI(
     version="0.1.0"
 )
 
+# Endpoints report their threadpool thread to the sampling profiler
+app.router.route_class = ProfiledRoute
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -22,8 +37,18 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "ETag"],
 )
 
+# gzip (or brotli, if installed) for response bodies over 1 KiB
+app.add_middleware(CompressionMiddleware)
+
+# Request tracing, Server-Timing headers and /metrics histograms
+app.add_middleware(TimingMiddleware)
+
+# Sampling profiler for EVODOC_PROFILE_RATE of requests (off by default)
+app.add_middleware(ProfilingMiddleware)
+
 # Pydantic models for request/response
 class PatientCreate(BaseModel):
     name: str
@@ -53,7 +78,7 @@ class AppointmentResponse(BaseModel):
     doctor_id: int
     patient_name: str
     doctor_name: str
-    date: str
+    date: datetime
     symptoms: str
     status: str
     
@@ -107,10 +132,81 @@ class RecommendationResponse(BaseModel):
     alternatives: List[Alternative]
     explanation: str
 
+# Columns selected by the list endpoints, in response field order
+PATIENT_COLUMNS = [Patient.id, Patient.name, Patient.age, Patient.gender, Patient.medical_history]
+APPOINTMENT_COLUMNS = [
+    Appointment.id,
+    Appointment.patient_id,
+    Appointment.doctor_id,
+    Patient.name.label("patient_name"),
+    Doctor.name.label("doctor_name"),
+    Appointment.date,
+    Appointment.symptoms,
+    Appointment.status
+]
+
+# Columns that change whenever a list page's content does (ETag)
+PATIENT_VERSION_COLUMNS = [Patient.id, Patient.created_at, Patient.updated_at]
+APPOINTMENT_VERSION_COLUMNS = [
+    Appointment.id,
+    Appointment.created_at,
+    Appointment.updated_at,
+    Patient.updated_at,
+    # Doctors have no updated_at, so the doctor's name itself is versioned
+    Doctor.name
+]
+
+def rows_response(rows, columns, headers=None):
+    """Serialize row tuples straight to a JSON array of objects
+
+    The rows already have the response model's fields and types, so the
+    list is encoded with orjson and returned as a Response, which FastAPI
+    sends without validating it again against the response_model.
+    """
+    fields = [column.key for column in columns]
+    return ORJSONResponse([dict(zip(fields, row)) for row in rows], headers=headers)
+
+@app.on_event("startup")
+def warm_up_models():
+    # The ML stack loads in the background; CRUD routes never import it
+    REGISTRY.start_warm_up()
+
 @app.get("/")
 def read_root():
     return {"message": "Welcome to EvoDoc API"}
 
+@app.get("/health/live")
+def liveness():
+    return {"status": "ok"}
+
+@app.get("/health/ready")
+def readiness(response: Response):
+    if not REGISTRY.ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return REGISTRY.status()
+
+@app.get("/metrics")
+def read_metrics():
+    return Response(render_metrics(), media_type=CONTENT_TYPE)
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    expected = os.getenv(ADMIN_TOKEN_ENV)
+    if not expected:
+        raise HTTPException(status_code=404, detail="Not found")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, expected):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+@app.get("/admin/profile", dependencies=[Depends(require_admin)])
+def dump_profile(endpoint: Optional[str] = None, save: bool = True, reset: bool = False):
+    """Current sampled profile as collapsed stacks rooted at each endpoint"""
+    text = PROFILER.combined(endpoint)
+    headers = {}
+    if save:
+        headers["X-Profile-Files"] = ",".join(os.path.basename(path) for path in PROFILER.dump(endpoint=endpoint))
+    if reset:
+        PROFILER.reset()
+    return Response(text, media_type="text/plain", headers=headers)
+
 @app.post("/patients/", response_model=PatientResponse)
 def create_patient(patient: PatientCreate, db: Session = Depends(get_db)):
     db_patient = Patient(
@@ -125,9 +221,16 @@ def create_patient(patient: PatientCreate, db: Session = Depends(get_db)):
     return db_patient
 
 @app.get("/patients/", response_model=List[PatientResponse])
-def read_patients(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    patients = db.query(Patient).offset(skip).limit(limit).all()
-    return patients
+def read_patients(request: Request, skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+    # Unchanged pages are answered from the ids and timestamps alone
+    versions = db.query(*PATIENT_VERSION_COLUMNS).order_by(Patient.id).offset(skip).limit(limit).all()
+    etag = page_etag(versions)
+    headers = validator_headers(etag)
+    if is_not_modified(request.headers, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    rows = db.query(*PATIENT_COLUMNS).order_by(Patient.id).offset(skip).limit(limit).all()
+    return rows_response(rows, PATIENT_COLUMNS, headers)
 
 @app.get("/patients/{patient_id}", response_model=PatientResponse)
 def read_patient(patient_id: int, db: Session = Depends(get_db)):
@@ -171,41 +274,30 @@ def create_appointment(appointment: AppointmentCreate, db: Session = Depends(get
     }
 
 @app.get("/appointments/", response_model=List[AppointmentResponse])
-def read_appointments(skip: int = 0, limit: int = 100, doctor_id: Optional[int] = None, 
+def read_appointments(request: Request, skip: int = 0, limit: int = 100, doctor_id: Optional[int] = None, 
                      patient_id: Optional[int] = None, db: Session = Depends(get_db)):
-    query = db.query(
-        Appointment, 
-        Patient.name.label("patient_name"), 
-        Doctor.name.label("doctor_name")
-    ).join(
-        Patient, Appointment.patient_id == Patient.id
-    ).join(
-        Doctor, Appointment.doctor_id == Doctor.id
-    )
-    
-    # Filter by doctor or patient if provided
-    if doctor_id:
-        query = query.filter(Appointment.doctor_id == doctor_id)
-    if patient_id:
-        query = query.filter(Appointment.patient_id == patient_id)
+    def page(columns):
+        query = db.query(*columns).join(
+            Patient, Appointment.patient_id == Patient.id
+        ).join(
+            Doctor, Appointment.doctor_id == Doctor.id
+        )
+        
+        # Filter by doctor or patient if provided
+        if doctor_id:
+            query = query.filter(Appointment.doctor_id == doctor_id)
+        if patient_id:
+            query = query.filter(Appointment.patient_id == patient_id)
+        
+        return query.order_by(Appointment.id).offset(skip).limit(limit).all()
     
-    appointments = query.offset(skip).limit(limit).all()
+    # Unchanged pages are answered from the ids and timestamps alone
+    etag = page_etag(page(APPOINTMENT_VERSION_COLUMNS))
+    headers = validator_headers(etag)
+    if is_not_modified(request.headers, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
     
-    # Format response
-    result = []
-    for appt, patient_name, doctor_name in appointments:
-        result.append({
-            "id": appt.id,
-            "patient_id": appt.patient_id,
-            "doctor_id": appt.doctor_id,
-            "patient_name": patient_name,
-            "doctor_name": doctor_name,
-            "date": appt.date,
-            "symptoms": appt.symptoms,
-            "status": appt.status
-        })
-    
-    return result
+    return rows_response(page(APPOINTMENT_COLUMNS), APPOINTMENT_COLUMNS, headers)
 
 @app.get("/appointments/{appointment_id}", response_model=AppointmentResponse)
 def read_appointment(appointment_id: int, db: Session = Depends(get_db)):
@@ -277,18 +369,20 @@ def create_treatment(treatment: TreatmentCreate, db: Session = Depends(get_db)):
 @app.post("/recommend/", response_model=RecommendationResponse)
 def get_recommendations(req: RecommendationRequest, db: Session = Depends(get_db)):
     # Get patient data
-    patient = db.query(Patient).filter(Patient.id == req.patient_id).first()
+    with span("db.patient"):
+        patient = db.query(Patient).filter(Patient.id == req.patient_id).first()
     if patient is None:
         raise HTTPException(status_code=404, detail="Patient not found")
     
     # Get patient allergies
-    patient_allergies = db.query(
-        Allergy.id
-    ).join(
-        "patients"
-    ).filter(
-        Patient.id == req.patient_id
-    ).all()
+    with span("db.allergies"):
+        patient_allergies = db.query(
+            Allergy.id
+        ).join(
+            Allergy.patients
+        ).filter(
+            Patient.id == req.patient_id
+        ).all()
     
     allergy_ids = [allergy[0] for allergy in patient_allergies]
     
@@ -300,7 +394,8 @@ def get_recommendations(req: RecommendationRequest, db: Session = Depends(get_db
         "medications": req.current_medications or []
     }
     
-    # Get recommendations
+    # Get recommendations (imports the ML stack on first use if warm-up has not)
+    from ..ml.predict import recommend_treatments
     recommendations = recommend_treatments(patient_data, allergy_ids)
     
     return recommendations
@@ -0,0 +1,200 @@
+import gzip
+import time
+
+from fastapi.routing import APIRoute
+
+from ..telemetry.metrics import REQUEST_SECONDS
+from ..telemetry.profiler import PROFILER, profile_thread, set_current_request, reset_current_request
+from ..telemetry.tracing import SPAN_KIND_SERVER, STATUS_ERROR, start_trace, end_trace, span
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+UNMATCHED_ROUTE = "unmatched"
+
+# Compression settings
+COMPRESSION_MIN_SIZE = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+
+def route_template(scope):
+    """Path template of the route that handled the request (keeps label cardinality low)"""
+    endpoint = scope.get("endpoint")
+    router = scope.get("router")
+    if endpoint is not None and router is not None:
+        for route in router.routes:
+            if getattr(route, "endpoint", None) is endpoint:
+                return route.path
+    return UNMATCHED_ROUTE
+
+def server_timing(stages, total):
+    """Server-Timing header value: one entry per stage plus the total"""
+    entries = [f"{stage};dur={seconds * 1000:.3f}" for stage, seconds in stages.items()]
+    entries.append(f"total;dur={total * 1000:.3f}")
+    return ", ".join(entries)
+
+class TimingMiddleware:
+    """ASGI middleware that traces each HTTP request
+
+    Starts a trace (continuing an incoming W3C traceparent), wraps the request
+    in a server span, adds a Server-Timing header with the stage durations
+    recorded by span()/stage() in the handlers, and records the request and
+    stage histograms served by /metrics.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        trace, token = start_trace(headers.get(b"traceparent", b"").decode("latin-1"))
+        start = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                value = server_timing(trace.stages, time.perf_counter() - start)
+                message = dict(message, headers=list(message.get("headers", [])) + [
+                    (b"server-timing", value.encode("latin-1")),
+                    (b"traceparent", f"00-{trace.trace_id}-{root['spanId']}-01".encode("latin-1"))
+                ])
+            await send(message)
+
+        try:
+            with span(scope["method"], kind=SPAN_KIND_SERVER, **{"http.method": scope["method"],
+                                                                  "http.target": scope["path"]}) as root:
+                try:
+                    await self.app(scope, receive, send_with_timing)
+                finally:
+                    route = route_template(scope)
+                    root["name"] = f"{scope['method']} {route}"
+                    root["attributes"].update({"http.route": route, "http.status_code": status["code"]})
+                    if status["code"] >= 500:
+                        root["status"] = STATUS_ERROR
+        finally:
+            REQUEST_SECONDS.observe(time.perf_counter() - start, method=scope["method"],
+                                    route=route_template(scope), status=status["code"])
+            end_trace(token)
+
+class ProfilingMiddleware:
+    """ASGI middleware that runs the sampling profiler on a fraction of requests
+
+    Sync endpoints run on threadpool workers, so the sampled thread is set
+    by the endpoint itself once it runs (routes must use ProfiledRoute).
+    Requests that are not sampled cost one random() call.
+    """
+
+    def __init__(self, app, profiler=PROFILER):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.profiler.should_sample():
+            await self.app(scope, receive, send)
+            return
+
+        token = self.profiler.begin()
+        context_token = set_current_request(self.profiler, token)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            reset_current_request(context_token)
+            self.profiler.end(token, f"{scope['method']} {route_template(scope)}")
+
+class ProfiledRoute(APIRoute):
+    """API route whose endpoint attaches its thread to a sampled request (see profile_thread)"""
+
+    def __init__(self, path, endpoint, **kwargs):
+        super().__init__(path, profile_thread(endpoint), **kwargs)
+
+def accepted_encodings(header):
+    """Content codings from an Accept-Encoding header, without those given q=0"""
+    encodings = set()
+    for item in header.split(","):
+        coding, _, params = item.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        encodings.add(coding.strip().lower())
+    return encodings
+
+class CompressionMiddleware:
+    """ASGI middleware that compresses complete response bodies
+
+    Uses brotli when the client accepts it and the brotli package is
+    installed, otherwise gzip. Bodies under minimum_size, streamed bodies
+    and responses that already have a Content-Encoding are sent unchanged.
+    """
+
+    def __init__(self, app, minimum_size=COMPRESSION_MIN_SIZE, gzip_level=GZIP_LEVEL,
+                 brotli_quality=BROTLI_QUALITY):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def choose_encoding(self, scope):
+        for name, value in scope.get("headers") or []:
+            if name == b"accept-encoding":
+                encodings = accepted_encodings(value.decode("latin-1"))
+                if brotli is not None and "br" in encodings:
+                    return "br"
+                if "gzip" in encodings:
+                    return "gzip"
+        return None
+
+    def compress(self, body, encoding):
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = self.choose_encoding(scope)
+        start_message = None
+
+        async def send_compressed(message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                # Held back until the first body chunk shows whether to compress
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or start_message is None:
+                await send(message)
+                return
+
+            start, start_message = start_message, None
+            original = list(start.get("headers", []))
+            vary = [value for name, value in original if name == b"vary"]
+            headers = [(name, value) for name, value in original if name != b"vary"]
+            headers.append((b"vary", b", ".join(vary + [b"Accept-Encoding"])))
+
+            body = message.get("body", b"")
+            if (encoding is None or message.get("more_body", False) or len(body) < self.minimum_size
+                    or any(name == b"content-encoding" for name, _ in headers)):
+                await send(dict(start, headers=headers))
+                await send(message)
+                return
+
+            body = self.compress(body, encoding)
+            headers = [(name, value) for name, value in headers if name != b"content-length"]
+            headers += [(b"content-encoding", encoding.encode("latin-1")),
+                        (b"content-length", str(len(body)).encode("latin-1"))]
+            await send(dict(start, headers=headers))
+            await send(dict(message, body=body))
+
+        await self.app(scope, receive, send_compressed)
@@ -1,12 +1,13 @@
+import sys
 import uvicorn
 
 def main():
-    """Run API server"""
+    """Run API server (pass --reload for auto-reload during development)"""
     uvicorn.run(
         "src.api.main:app",
         host="0.0.0.0",
         port=8000,
-        reload=True
+        reload="--reload" in sys.argv
     )
 
 if __name__ == "__main__":
@@ -0,0 +1,323 @@
+import gc
+import os
+import sys
+import time
+import random
+import select
+import signal
+import socket
+import argparse
+import urllib.error
+import urllib.request
+
+import uvicorn
+
+# Server settings
+DEFAULT_HOST = "0.0.0.0"
+DEFAULT_PORT = 8000
+WORKERS_ENV = "WEB_CONCURRENCY"
+BACKLOG = 2048
+GRACEFUL_TIMEOUT = 30.0
+WORKER_READY_TIMEOUT = 60.0
+READY_PATH = "/health/ready"
+RESTART_BACKOFF = 1.0
+MAX_RESTART_BACKOFF = 60.0
+
+def default_workers():
+    """Worker count: $WEB_CONCURRENCY, else one per CPU core"""
+    return int(os.getenv(WORKERS_ENV, os.cpu_count() or 1))
+
+def bind_socket(host=DEFAULT_HOST, port=DEFAULT_PORT, backlog=BACKLOG):
+    """Create the listening socket shared by all workers"""
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+def wait_until_ready(url, timeout=WORKER_READY_TIMEOUT, interval=0.1):
+    """Poll a readiness URL until it returns 200
+
+    Returns:
+        Seconds until ready
+
+    Raises:
+        TimeoutError: if the URL is not ready within timeout seconds
+    """
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        try:
+            with urllib.request.urlopen(url, timeout=interval * 10) as response:
+                if response.status == 200:
+                    return time.perf_counter() - start
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(interval)
+    raise TimeoutError(f"{url} not ready after {timeout:.0f}s")
+
+class WorkerServer(uvicorn.Server):
+    """uvicorn server that reports to the arbiter once it is accepting connections"""
+
+    def __init__(self, config, ready_fd):
+        super().__init__(config)
+        self.ready_fd = ready_fd
+
+    async def startup(self, sockets=None):
+        await super().startup(sockets)
+        if self.started and self.ready_fd is not None:
+            os.write(self.ready_fd, b"1")
+            os.close(self.ready_fd)
+            self.ready_fd = None
+
+class PreforkServer:
+    """Pre-forking process manager for the API
+
+    The parent imports the app and loads every model before forking, so
+    workers share the model memory copy-on-write instead of each loading its
+    own copy. Workers are uvicorn servers on one shared listening socket.
+
+    Signals to the parent:
+        SIGHUP: reload models from disk, then replace workers one at a time;
+            a new worker must be accepting connections before the old one is
+            asked to finish its requests and exit
+        SIGTERM / SIGINT: graceful shutdown
+        SIGTTIN / SIGTTOU: add / remove a worker
+
+    A worker that fails to start is logged and never stops the parent: a
+    reload keeps the old workers it has not replaced yet, and lost workers
+    are restarted with exponential backoff.
+    """
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, workers=None, graceful_timeout=GRACEFUL_TIMEOUT,
+                 log_level="warning"):
+        """Initialize server
+
+        Args:
+            host: Interface to bind
+            port: Port to bind
+            workers: Number of worker processes (default: default_workers())
+            graceful_timeout: Seconds a worker gets to finish its requests
+            log_level: uvicorn log level in the workers
+        """
+        self.host = host
+        self.port = port
+        self.n_workers = max(1, workers or default_workers())
+        self.graceful_timeout = graceful_timeout
+        self.log_level = log_level
+        self.workers = {}
+        self.missing = 0
+        self.restart_backoff = RESTART_BACKOFF
+        self.next_restart = 0.0
+        self.app = None
+        self.sock = None
+        self._signals = []
+
+    def preload(self):
+        """Import the app and load the models in the parent process"""
+        from .main import app
+        from ..ml.registry import REGISTRY
+
+        start = time.perf_counter()
+        self.app = app
+        if not REGISTRY.warm_up():
+            raise RuntimeError(f"Model warm-up failed: {REGISTRY.error}")
+        # Move everything loaded so far out of the GC's reach, so collections
+        # in the workers do not write to (and un-share) these pages
+        gc.collect()
+        gc.freeze()
+        print(f"Preloaded app and models (version {REGISTRY.version}) in {time.perf_counter() - start:.2f}s")
+
+    def spawn_worker(self):
+        """Fork one worker and wait until it accepts connections
+
+        Returns:
+            Worker PID
+        """
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            self._run_worker(write_fd)
+        os.close(write_fd)
+
+        try:
+            ready, _, _ = select.select([read_fd], [], [], WORKER_READY_TIMEOUT)
+            started = bool(ready) and os.read(read_fd, 1) == b"1"
+        finally:
+            os.close(read_fd)
+        if not started:
+            self._stop_worker(pid, kill=True)
+            raise RuntimeError(f"Worker {pid} did not start")
+        self.workers[pid] = time.time()
+        return pid
+
+    def _try_spawn_worker(self, action):
+        """Spawn a worker, logging a failed start instead of raising
+
+        Returns:
+            Worker PID, or None if the worker did not start
+        """
+        try:
+            return self.spawn_worker()
+        except (RuntimeError, OSError) as e:
+            print(f"Could not {action}: {type(e).__name__}: {e}", file=sys.stderr)
+            return None
+
+    def _restore_workers(self):
+        """Start replacements for missing workers, backing off after a failed start"""
+        while self.missing and time.time() >= self.next_restart:
+            if self._try_spawn_worker("restart worker") is None:
+                self.next_restart = time.time() + self.restart_backoff
+                print(f"Retrying in {self.restart_backoff:.0f}s ({self.missing} workers missing)", file=sys.stderr)
+                self.restart_backoff = min(self.restart_backoff * 2, MAX_RESTART_BACKOFF)
+                return
+            self.missing -= 1
+            self.restart_backoff = RESTART_BACKOFF
+
+    def _run_worker(self, ready_fd):
+        status = 0
+        try:
+            for sig in (signal.SIGHUP, signal.SIGTTIN, signal.SIGTTOU):
+                signal.signal(sig, signal.SIG_IGN)
+            for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+                signal.signal(sig, signal.SIG_DFL)
+            random.seed()
+            config = uvicorn.Config(self.app, lifespan="on", log_level=self.log_level, access_log=False,
+                                    timeout_graceful_shutdown=int(self.graceful_timeout))
+            WorkerServer(config, ready_fd).run(sockets=[self.sock])
+        except BaseException as e:
+            print(f"Worker {os.getpid()} failed: {type(e).__name__}: {e}", file=sys.stderr)
+            status = 1
+        finally:
+            os._exit(status)
+
+    def _stop_worker(self, pid, kill=False):
+        try:
+            os.kill(pid, signal.SIGKILL if kill else signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+    def _wait_for_exit(self, pids, timeout):
+        """Wait for workers to exit, killing any still running after timeout"""
+        deadline = time.time() + timeout
+        remaining = set(pids)
+        while remaining and time.time() < deadline:
+            for pid in list(remaining):
+                try:
+                    done, _ = os.waitpid(pid, os.WNOHANG)
+                except ChildProcessError:
+                    done = pid
+                if done:
+                    remaining.discard(pid)
+            time.sleep(0.05)
+        for pid in remaining:
+            self._stop_worker(pid, kill=True)
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+        for pid in pids:
+            self.workers.pop(pid, None)
+
+    def reload(self):
+        """Reload models in the parent and replace the workers one at a time"""
+        from ..ml.registry import REGISTRY
+
+        try:
+            gc.unfreeze()
+            REGISTRY.reload()
+            gc.collect()
+            gc.freeze()
+        except Exception as e:
+            print(f"Model reload failed, keeping current workers: {type(e).__name__}: {e}")
+            return
+        old_pids = list(self.workers)
+        for i, old_pid in enumerate(old_pids):
+            if self._try_spawn_worker("start replacement worker") is None:
+                # Old workers keep serving the previous models rather than
+                # shrinking the pool; the next SIGHUP tries again
+                print(f"Reload stopped, keeping {len(old_pids) - i} old workers: {old_pids[i:]}", file=sys.stderr)
+                return
+            self._stop_worker(old_pid)
+            self._wait_for_exit([old_pid], self.graceful_timeout)
+        print(f"Workers replaced: {sorted(self.workers)}")
+
+    def _reap(self):
+        """Collect workers that exited unexpectedly and start replacements"""
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            if pid in self.workers:
+                del self.workers[pid]
+                print(f"Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}; restarting")
+                self.missing += 1
+
+    def _handle_signal(self, sig, frame):
+        self._signals.append(sig)
+
+    def run(self):
+        """Preload, fork the workers and supervise them until SIGTERM/SIGINT"""
+        self.preload()
+        self.sock = bind_socket(self.host, self.port)
+        for _ in range(self.n_workers):
+            if self._try_spawn_worker("start worker") is None:
+                self.missing += 1
+        if self.missing:
+            self.next_restart = time.time() + self.restart_backoff
+        print(f"Serving on {self.host}:{self.port} with {len(self.workers)} of {self.n_workers} workers "
+              f"(parent {os.getpid()}, SIGHUP reloads models)")
+
+        for sig in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT, signal.SIGTTIN, signal.SIGTTOU):
+            signal.signal(sig, self._handle_signal)
+        try:
+            while True:
+                while self._signals:
+                    sig = self._signals.pop(0)
+                    if sig in (signal.SIGTERM, signal.SIGINT):
+                        return
+                    if sig == signal.SIGHUP:
+                        self.reload()
+                    elif sig == signal.SIGTTIN:
+                        self._try_spawn_worker("add worker")
+                    elif sig == signal.SIGTTOU and self.missing:
+                        self.missing -= 1
+                    elif sig == signal.SIGTTOU and len(self.workers) > 1:
+                        pid = max(self.workers, key=self.workers.get)
+                        self._stop_worker(pid)
+                        self._wait_for_exit([pid], self.graceful_timeout)
+                self._reap()
+                self._restore_workers()
+                try:
+                    time.sleep(0.5)
+                except InterruptedError:
+                    pass
+        finally:
+            print(f"Stopping {len(self.workers)} workers...")
+            pids = list(self.workers)
+            for pid in pids:
+                self._stop_worker(pid)
+            self._wait_for_exit(pids, self.graceful_timeout)
+            self.sock.close()
+
+def main(argv=None):
+    """Run the API with pre-forked workers (production mode)"""
+    parser = argparse.ArgumentParser(description="Run the EvoDoc API with pre-forked workers")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="Interface to bind")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port to bind")
+    parser.add_argument("--workers", type=int, default=None,
+                        help=f"Worker processes (default: ${WORKERS_ENV} or one per CPU core)")
+    parser.add_argument("--graceful-timeout", type=float, default=GRACEFUL_TIMEOUT,
+                        help="Seconds a worker gets to finish in-flight requests")
+    parser.add_argument("--log-level", default="warning", help="uvicorn log level")
+    args = parser.parse_args(argv)
+
+    PreforkServer(args.host, args.port, args.workers, args.graceful_timeout, args.log_level).run()
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,163 @@
+import os
+import sys
+import json
+import time
+import platform
+import resource
+import tracemalloc
+import subprocess
+from datetime import datetime
+
+import numpy as np
+
+# Paths
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+RESULTS_DIR = os.path.join(PROJECT_ROOT, "models", "benchmarks")
+
+# Benchmark settings
+PERCENTILES = (50, 95, 99)
+DEFAULT_ITERATIONS = 200
+DEFAULT_WARMUP = 10
+MEMORY_CALLS = 20
+REGRESSION_THRESHOLD = 0.10
+
+def measure(name, func, inputs, iterations=DEFAULT_ITERATIONS, warmup=DEFAULT_WARMUP,
+            memory_calls=MEMORY_CALLS):
+    """Time one callable over a list of inputs
+
+    Latency is measured per call with perf_counter and without tracing, and
+    CPU time (process_time) over the same timed loop. Peak
+    memory is measured in a separate, shorter pass under tracemalloc so the
+    tracing overhead does not leak into the latency numbers.
+
+    Args:
+        name: Benchmark name
+        func: Callable taking one input
+        inputs: List of inputs, cycled through in order
+        iterations: Number of timed calls
+        warmup: Untimed calls made first (caches, lazy imports)
+        memory_calls: Calls made under tracemalloc
+
+    Returns:
+        Dictionary with latency percentiles (ms), ops/sec, CPU ms per call and
+        peak memory (KiB)
+    """
+    if not inputs:
+        raise ValueError(f"No inputs for benchmark {name}")
+
+    for i in range(warmup):
+        func(inputs[i % len(inputs)])
+
+    latencies = np.empty(iterations)
+    total_start = time.perf_counter()
+    cpu_start = time.process_time()
+    for i in range(iterations):
+        start = time.perf_counter()
+        func(inputs[i % len(inputs)])
+        latencies[i] = time.perf_counter() - start
+    total_seconds = time.perf_counter() - total_start
+    cpu_seconds = time.process_time() - cpu_start
+
+    tracemalloc.start()
+    try:
+        for i in range(memory_calls):
+            func(inputs[i % len(inputs)])
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    result = {
+        "name": name,
+        "iterations": iterations,
+        "mean_ms": float(latencies.mean() * 1000),
+        "ops_per_sec": iterations / total_seconds,
+        "cpu_ms": cpu_seconds / iterations * 1000,
+        "peak_memory_kb": peak / 1024
+    }
+    for percentile, value in zip(PERCENTILES, np.percentile(latencies, PERCENTILES)):
+        result[f"p{percentile}_ms"] = float(value * 1000)
+
+    print(f"  {name}: p50 {result['p50_ms']:.3f} ms, p95 {result['p95_ms']:.3f} ms, "
+          f"p99 {result['p99_ms']:.3f} ms, {result['ops_per_sec']:,.0f} ops/sec, cpu {result['cpu_ms']:.3f} ms, "
+          f"peak {result['peak_memory_kb']:,.0f} KiB")
+    return result
+
+def git_commit():
+    """Current git commit hash, or None outside a git checkout"""
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=PROJECT_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def environment():
+    """Machine and interpreter details stored with every result file"""
+    return {
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    }
+
+def save_results(results, settings, output_dir=RESULTS_DIR):
+    """Save benchmark results with the commit they were measured on
+
+    Args:
+        results: List of measure() dictionaries
+        settings: Benchmark settings (sizes, iterations, ...)
+        output_dir: Directory for the JSON file
+
+    Returns:
+        Path of the JSON file
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    commit = git_commit()
+    created = datetime.now()
+    payload = {
+        "commit": commit,
+        "created_at": created.isoformat(timespec="seconds"),
+        "settings": settings,
+        "environment": environment(),
+        "results": results
+    }
+    filename = f"{created.strftime('%Y%m%d_%H%M%S')}_{(commit or 'nogit')[:8]}.json"
+    path = os.path.join(output_dir, filename)
+    with open(path, "w") as f:
+        json.dump(payload, f, indent=2)
+    print(f"Benchmark results saved to {path}")
+    return path
+
+def load_results(path):
+    """Load a result file written by save_results()"""
+    with open(path, "r") as f:
+        return json.load(f)
+
+def compare_results(baseline, current, metric="p95_ms", threshold=REGRESSION_THRESHOLD):
+    """Compare two result files benchmark by benchmark
+
+    Args:
+        baseline: Dictionary from load_results() for the reference commit
+        current: Dictionary from load_results() for the commit under test
+        metric: Latency metric to compare
+        threshold: Relative slowdown reported as a regression
+
+    Returns:
+        List of names of benchmarks that regressed
+    """
+    before = {result["name"]: result for result in baseline["results"]}
+    regressions = []
+    print(f"Comparing {metric}: {(baseline.get('commit') or 'unknown')[:8]} -> "
+          f"{(current.get('commit') or 'unknown')[:8]}")
+    for result in current["results"]:
+        name = result["name"]
+        if name not in before:
+            print(f"  {name}: new ({result[metric]:.3f} ms)")
+            continue
+        old, new = before[name][metric], result[metric]
+        change = (new - old) / old if old else 0.0
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"  {name}: {old:.3f} ms -> {new:.3f} ms ({change:+.1%}){flag}")
+    return regressions
@@ -0,0 +1,157 @@
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+
+import numpy as np
+
+from .harness import PROJECT_ROOT, RESULTS_DIR, save_results
+
+# Benchmark settings
+DEFAULT_WORKERS = 4
+DEFAULT_NODES = 2_000_000
+DEFAULT_FEATURES = 64
+FORMATS = ["npz", "mmap"]
+
+def process_memory_kb(pid):
+    """Resident (Rss), proportional (Pss) and private (USS) memory of one process"""
+    memory = {"rss_kb": 0, "pss_kb": 0, "private_kb": 0}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            field, _, value = line.partition(":")
+            if field == "Rss":
+                memory["rss_kb"] += int(value.split()[0])
+            elif field == "Pss":
+                memory["pss_kb"] += int(value.split()[0])
+            elif field in ("Private_Clean", "Private_Dirty"):
+                memory["private_kb"] += int(value.split()[0])
+    return memory
+
+def synthetic_export(export_dir, n_nodes=DEFAULT_NODES, n_features=DEFAULT_FEATURES, seed=42):
+    """Write one large random tree ensemble in both export formats
+
+    The shipped models are a few kilobytes, too small for per-process model
+    memory to show up next to the interpreter, so the comparison uses a
+    synthetic ensemble of production size instead.
+
+    Returns:
+        Dictionary of format -> manifest entry
+    """
+    from ..ml.lightweight import write_flat_arrays
+
+    rng = np.random.default_rng(seed)
+    node = np.arange(n_nodes)
+    # Complete binary trees of 2**depth - 1 nodes laid out breadth-first
+    depth = 10
+    tree_size = 2 ** depth - 1
+    local = node % tree_size
+    internal = local < 2 ** (depth - 1) - 1
+    arrays = {
+        'feature': np.where(internal, rng.integers(0, n_features, n_nodes), -2).astype(np.int32),
+        'threshold': rng.random(n_nodes),
+        'left': np.where(internal, node - local + 2 * local + 1, -1).astype(np.int32),
+        'right': np.where(internal, node - local + 2 * local + 2, -1).astype(np.int32),
+        'value': rng.random(n_nodes),
+        'roots': np.arange(0, n_nodes - tree_size + 1, tree_size, dtype=np.int32)
+    }
+
+    np.savez(os.path.join(export_dir, "synthetic.npz"), scale=np.float64(1.0 / len(arrays['roots'])),
+             base=np.float64(0.0), n_features=np.int64(n_features), **arrays)
+    layout = write_flat_arrays(os.path.join(export_dir, "synthetic.bin"), arrays)
+    return {
+        "npz": {'type': 'tree_ensemble', 'file': "synthetic.npz"},
+        "mmap": {'type': 'tree_ensemble', 'file': "synthetic.bin", 'arrays': layout,
+                 'scale': 1.0 / len(arrays['roots']), 'base': 0.0, 'n_features': n_features}
+    }
+
+def worker(export_dir, entry):
+    """Load a model in this process, report memory and wait for the parent
+
+    Prints the memory before loading and once the model has predicted (so
+    every page of a mapped model has been touched), then blocks on stdin so
+    all workers are alive when the parent reads their shared memory.
+    """
+    from ..ml.lightweight import load_model
+
+    before = process_memory_kb(os.getpid())
+    model = load_model(entry, export_dir)
+    for name in ('feature', 'threshold', 'left', 'right', 'value', 'roots'):
+        # Read every page, as a model that has served for a while would have
+        int(np.asarray(getattr(model, name)).sum())
+    model.predict(np.random.default_rng(0).random((8, model.n_features_in_)))
+    print(json.dumps({"before": before, "after": process_memory_kb(os.getpid())}), flush=True)
+    sys.stdin.readline()
+
+def measure_format(fmt, export_dir, entry, n_workers):
+    """Start n_workers processes loading the model in one format and report their memory"""
+    env = dict(os.environ, PYTHONWARNINGS="ignore")
+    workers = [subprocess.Popen([sys.executable, "-m", "src.bench.memory", "--worker", export_dir, json.dumps(entry)],
+                                cwd=PROJECT_ROOT, env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+               for _ in range(n_workers)]
+    try:
+        reports = [json.loads(process.stdout.readline()) for process in workers]
+        # Pss is only meaningful while every worker is still mapping the file
+        current = [process_memory_kb(process.pid) for process in workers]
+    finally:
+        for process in workers:
+            process.stdin.close()
+            process.wait(timeout=60)
+
+    per_worker = []
+    print(f"  {fmt}:")
+    for i, (report, memory) in enumerate(zip(reports, current)):
+        before, after = report["before"], memory
+        per_worker.append({"before": before, "after": after})
+        print(f"    worker {i}: RSS {before['rss_kb'] / 1024:,.1f} -> {after['rss_kb'] / 1024:,.1f} MiB, "
+              f"Pss {after['pss_kb'] / 1024:,.1f} MiB, private {before['private_kb'] / 1024:,.1f} -> "
+              f"{after['private_kb'] / 1024:,.1f} MiB")
+
+    result = {
+        "name": f"model_memory[{fmt}]",
+        "format": fmt,
+        "workers": n_workers,
+        "per_worker": per_worker,
+        "model_private_kb": float(np.mean([w["after"]["private_kb"] - w["before"]["private_kb"] for w in per_worker])),
+        "total_pss_kb": sum(w["after"]["pss_kb"] for w in per_worker)
+    }
+    print(f"    model memory private to each worker: {result['model_private_kb'] / 1024:,.1f} MiB, "
+          f"total Pss {result['total_pss_kb'] / 1024:,.1f} MiB")
+    return result
+
+def model_memory(n_workers=DEFAULT_WORKERS, n_nodes=DEFAULT_NODES, formats=FORMATS):
+    """Per-worker memory of a tree ensemble loaded from npz versus memory-mapped
+
+    Returns:
+        List of result dictionaries, one per format
+    """
+    results = []
+    with tempfile.TemporaryDirectory(prefix="evodoc_memory_") as export_dir:
+        entries = synthetic_export(export_dir, n_nodes)
+        size_mb = os.path.getsize(os.path.join(export_dir, "synthetic.bin")) / 1024 ** 2
+        print(f"Loading a {n_nodes:,}-node tree ensemble ({size_mb:,.1f} MiB) in {n_workers} worker processes")
+        for fmt in formats:
+            results.append(measure_format(fmt, export_dir, entries[fmt], n_workers))
+    return results
+
+def main(argv=None):
+    """Run the model memory benchmark from the command line"""
+    parser = argparse.ArgumentParser(description="Per-worker memory of npz-loaded versus memory-mapped models")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Worker processes per format")
+    parser.add_argument("--nodes", type=int, default=DEFAULT_NODES, help="Nodes in the synthetic tree ensemble")
+    parser.add_argument("--formats", nargs="+", default=FORMATS, choices=FORMATS, help="Formats to compare")
+    parser.add_argument("--output-dir", default=RESULTS_DIR, help="Directory for the JSON results")
+    parser.add_argument("--worker", nargs=2, metavar=("EXPORT_DIR", "ENTRY"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        worker(args.worker[0], json.loads(args.worker[1]))
+        return
+
+    results = model_memory(args.workers, args.nodes, args.formats)
+    save_results(results, {"benchmark": "model_memory", "workers": args.workers, "nodes": args.nodes},
+                 args.output_dir)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,106 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+# Kept free of numpy/pandas imports so the probe process starts cold
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+
+# Benchmark settings
+DEFAULT_REPEATS = 5
+READY_TIMEOUT = 120.0
+METRICS = ["import_seconds", "first_crud_seconds", "ready_seconds", "first_recommend_seconds"]
+
+def probe():
+    """Measure one cold start in this (fresh) process and print the timings as JSON
+
+    import_seconds: importing src.api.main
+    first_crud_seconds: import, startup hooks and the first GET /patients/
+    ready_seconds: start until /health/ready returns 200 (None on builds without it)
+    first_recommend_seconds: latency of the first POST /recommend/
+    """
+    start = time.perf_counter()
+    from ..api.main import app
+    import_seconds = time.perf_counter() - start
+    heavy_modules = [name for name in ("pandas", "sklearn", "xgboost", "matplotlib") if name in sys.modules]
+
+    import httpx
+    from ..db.config import Base, engine
+    Base.metadata.create_all(bind=engine)
+
+    async def run():
+        timings = {"import_seconds": import_seconds, "heavy_modules_after_import": heavy_modules}
+        await app.router.startup()
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            (await client.get("/patients/")).raise_for_status()
+            timings["first_crud_seconds"] = time.perf_counter() - start
+
+            timings["ready_seconds"] = None
+            while time.perf_counter() - start < READY_TIMEOUT:
+                response = await client.get("/health/ready")
+                if response.status_code == 404:
+                    break
+                if response.status_code == 200:
+                    timings["ready_seconds"] = time.perf_counter() - start
+                    break
+                await asyncio.sleep(0.01)
+
+            patient = (await client.post("/patients/", json={"name": "Cold Start", "age": 60,
+                                                             "gender": "Female"})).json()
+            request_start = time.perf_counter()
+            (await client.post("/recommend/", json={"patient_id": patient["id"],
+                                                    "symptoms": "Headache, dizziness"})).raise_for_status()
+            timings["first_recommend_seconds"] = time.perf_counter() - request_start
+        await app.router.shutdown()
+        return timings
+
+    print(json.dumps(asyncio.run(run())))
+
+def cold_start(repeats=DEFAULT_REPEATS):
+    """Run probe() in fresh interpreters against a throwaway SQLite database
+
+    Returns:
+        Dictionary of metric -> median seconds, plus the per-run timings
+    """
+    runs = []
+    for i in range(repeats):
+        with tempfile.TemporaryDirectory(prefix="evodoc_cold_") as directory:
+            env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(directory, 'cold.db')}",
+                       PYTHONWARNINGS="ignore")
+            output = subprocess.run([sys.executable, "-m", "src.bench.startup", "--probe"], cwd=PROJECT_ROOT,
+                                    env=env, capture_output=True, text=True, check=True).stdout
+            runs.append(json.loads(output.strip().splitlines()[-1]))
+
+    summary = {}
+    for metric in METRICS:
+        values = [run[metric] for run in runs if run.get(metric) is not None]
+        summary[metric] = statistics.median(values) if values else None
+    summary["heavy_modules_after_import"] = runs[-1]["heavy_modules_after_import"]
+    summary["runs"] = runs
+
+    print(f"Cold start over {repeats} runs (median):")
+    for metric in METRICS:
+        value = summary[metric]
+        print(f"  {metric}: {'n/a' if value is None else f'{value:.3f}s'}")
+    print(f"  ML modules loaded by import: {', '.join(summary['heavy_modules_after_import']) or 'none'}")
+    return summary
+
+def main(argv=None):
+    """Measure API cold-start time from the command line"""
+    parser = argparse.ArgumentParser(description="Measure EvoDoc API cold-start time")
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS, help="Fresh processes to start")
+    parser.add_argument("--probe", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.probe:
+        probe()
+    else:
+        cold_start(args.repeats)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,412 @@
+import os
+import io
+import sys
+import asyncio
+import argparse
+import tempfile
+import contextlib
+
+import numpy as np
+import pandas as pd
+
+from .harness import (PROJECT_ROOT, RESULTS_DIR, DEFAULT_ITERATIONS, DEFAULT_WARMUP, MEMORY_CALLS,
+                      REGRESSION_THRESHOLD, measure, save_results, load_results, compare_results)
+
+# Benchmark settings
+DEFAULT_SIZES = [1000]
+N_INPUTS = 500
+TARGETS = ["transform_patient", "recommend", "predict_side_effects", "treatment_recommender", "api_recommend",
+           "api_patient"]
+PROFILE_RATES = [0.0, 0.01, 1.0]
+PAGE_SIZES = [100, 1000, 10000]
+LIST_ENDPOINTS = ["/patients/", "/appointments/"]
+# Polling clients: no compression, gzip, and gzip revalidating with the last ETag
+POLL_MODES = ["identity", "gzip", "revalidate"]
+REVIEW1_DIR = os.path.join(os.path.dirname(PROJECT_ROOT), "review1")
+REFERENCE_DATE = "2025-01-01"
+
+def generate_data(n_patients, output_dir, seed=42):
+    """Generate a synthetic dataset of the given size into output_dir"""
+    from ..data.synthetic_scale import generate_at_scale
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        generate_at_scale(n_patients, seed=seed, workers=1, output_dir=output_dir,
+                          reference_date=REFERENCE_DATE)
+
+def build_inputs(data_dir, n_inputs=N_INPUTS, seed=42):
+    """Sample patient requests from a generated dataset
+
+    Each input is one appointment: the patient's age and gender, the
+    appointment symptoms as the diagnosis, the medications prescribed at that
+    appointment and the patient's allergies.
+
+    Returns:
+        List of patient dictionaries
+    """
+    patients = pd.read_csv(os.path.join(data_dir, "patients.csv")).set_index("id")
+    appointments = pd.read_csv(os.path.join(data_dir, "appointments.csv"))
+    treatments = pd.read_csv(os.path.join(data_dir, "treatments.csv"))
+    medications = pd.read_csv(os.path.join(data_dir, "medications.csv"))
+    allergies = pd.read_csv(os.path.join(data_dir, "allergies.csv"))
+    patient_allergy = pd.read_csv(os.path.join(data_dir, "patient_allergy.csv"))
+
+    rng = np.random.default_rng(seed)
+    sample = appointments.iloc[rng.choice(len(appointments), min(n_inputs, len(appointments)), replace=False)]
+
+    medication_names = medications.set_index("id")["name"]
+    prescribed = treatments[treatments["appointment_id"].isin(sample["id"])]
+    prescribed = prescribed.assign(name=prescribed["medication_id"].map(medication_names))
+    prescribed = prescribed.groupby("appointment_id")["name"].agg(list)
+
+    patient_allergy = patient_allergy[patient_allergy["patient_id"].isin(sample["patient_id"])]
+    patient_allergy = patient_allergy.assign(name=patient_allergy["allergy_id"].map(allergies.set_index("id")["name"]))
+    allergy_ids = patient_allergy.groupby("patient_id")["allergy_id"].agg(list)
+    allergy_names = patient_allergy.groupby("patient_id")["name"].agg(list)
+
+    inputs = []
+    for appointment in sample.itertuples(index=False):
+        patient = patients.loc[appointment.patient_id]
+        inputs.append({
+            "patient_id": int(appointment.patient_id),
+            "name": patient["name"],
+            "age": int(patient["age"]),
+            "gender": patient["gender"],
+            "diagnosis": appointment.symptoms,
+            "medications": prescribed.get(appointment.id, []),
+            "allergies": allergy_names.get(appointment.patient_id, []),
+            "allergy_ids": [int(i) for i in allergy_ids.get(appointment.patient_id, [])]
+        })
+    return inputs
+
+def _patient_data(patient):
+    return {key: patient[key] for key in ("age", "gender", "diagnosis", "medications", "allergies")}
+
+def transform_patient_target(context):
+    """PatientFeatureExtractor.transform_patient on one patient"""
+    from ..ml.features import PatientFeatureExtractor
+    from ..ml.predict import FEATURE_DIR
+
+    extractor = PatientFeatureExtractor(load_from=os.path.join(FEATURE_DIR, "patient_feature_extractor.pkl"))
+    return lambda patient: extractor.transform_patient(_patient_data(patient))
+
+def recommend_target(context):
+    """MedicationRecommender.recommend on one patient (model already loaded)"""
+    from ..ml.predict import MedicationRecommender
+
+    recommender = MedicationRecommender()
+    return lambda patient: recommender.recommend(_patient_data(patient), patient["allergy_ids"])
+
+def predict_side_effects_target(context):
+    """SideEffectPredictor.predict_side_effects for one of the patient's medications"""
+    from ..ml.predict import SideEffectPredictor
+
+    predictor = SideEffectPredictor()
+    names = predictor.medications["name"].tolist()
+
+    def run(patient):
+        medication = patient["medications"][0] if patient["medications"] else names[patient["patient_id"] % len(names)]
+        return predictor.predict_side_effects(medication, _patient_data(patient))
+    return run
+
+def treatment_recommender_target(context):
+    """review1 TreatmentRecommender.get_recommendations without LLM insights
+
+    review1 resolves its data and models relative to the working directory,
+    so every call runs inside review1_dir.
+    """
+    review1_dir = os.path.abspath(context["review1_dir"])
+    if not os.path.exists(os.path.join(review1_dir, "recommend.py")):
+        raise FileNotFoundError(f"review1 not found at {review1_dir}")
+    if review1_dir not in sys.path:
+        sys.path.insert(0, review1_dir)
+
+    with contextlib.chdir(review1_dir), contextlib.redirect_stdout(io.StringIO()):
+        from recommend import TreatmentRecommender
+        recommender = TreatmentRecommender()
+
+    def run(patient):
+        patient_info = {
+            "name": patient["name"],
+            "age": patient["age"],
+            "gender": patient["gender"][:1],
+            "symptoms": patient["diagnosis"],
+            "allergies": patient["allergies"],
+            "current_medications": patient["medications"]
+        }
+        with contextlib.chdir(review1_dir), contextlib.redirect_stdout(io.StringIO()):
+            return recommender.get_recommendations(patient_info, include_insights=False)
+    return run
+
+def _asgi_client(context):
+    """In-process ASGI client for the API, backed by a SQLite copy of the generated data
+
+    The app's database dependency is pointed at the SQLite file, so endpoints
+    run their real queries. The client is built once per dataset.
+
+    Returns:
+        Function (method, url, **kwargs) -> response
+    """
+    if "asgi_request" in context:
+        return context["asgi_request"]
+
+    database_url = f"sqlite:///{os.path.join(context['work_dir'], 'bench.db')}"
+    # The configured engine is created on import; keep it off PostgreSQL
+    os.environ.setdefault("DATABASE_URL", database_url)
+
+    import httpx
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from ..api.main import app
+    from ..db.config import get_db
+    from ..db.bulk_load import bulk_load
+
+    engine = create_engine(database_url, connect_args={"check_same_thread": False})
+    with contextlib.redirect_stdout(io.StringIO()):
+        bulk_load(context["data_dir"], engine=engine, replace=True)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def bench_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+    app.dependency_overrides[get_db] = bench_db
+
+    loop = asyncio.new_event_loop()
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
+    context["cleanup"].append(lambda: (loop.run_until_complete(client.aclose()), loop.close(),
+                                       app.dependency_overrides.pop(get_db, None), engine.dispose()))
+
+    def request(method, url, **kwargs):
+        response = loop.run_until_complete(client.request(method, url, **kwargs))
+        if response.status_code != 304:
+            response.raise_for_status()
+        return response
+    context["asgi_request"] = request
+    return request
+
+def api_recommend_target(context):
+    """POST /recommend/ through an in-process ASGI client"""
+    request = _asgi_client(context)
+    return lambda patient: request("POST", "/recommend/", json={
+        "patient_id": patient["patient_id"],
+        "symptoms": patient["diagnosis"],
+        "current_medications": patient["medications"]
+    })
+
+def api_patient_target(context):
+    """GET /patients/{id}: a cheap endpoint, so fixed per-request costs stand out"""
+    request = _asgi_client(context)
+    return lambda patient: request("GET", f"/patients/{patient['patient_id']}")
+
+TARGET_BUILDERS = {
+    "transform_patient": transform_patient_target,
+    "recommend": recommend_target,
+    "predict_side_effects": predict_side_effects_target,
+    "treatment_recommender": treatment_recommender_target,
+    "api_recommend": api_recommend_target,
+    "api_patient": api_patient_target
+}
+
+def run_suite(sizes=DEFAULT_SIZES, targets=TARGETS, iterations=DEFAULT_ITERATIONS, warmup=DEFAULT_WARMUP,
+              review1_dir=REVIEW1_DIR, seed=42):
+    """Run every target on synthetic datasets of each size
+
+    Targets that cannot be set up (missing models, missing review1 checkout)
+    are reported and skipped.
+
+    Args:
+        sizes: Numbers of synthetic patients to generate
+        targets: Names from TARGETS
+        iterations: Timed calls per target and size
+        warmup: Untimed calls per target and size
+        review1_dir: review1 checkout for the treatment_recommender target
+        seed: Random seed for data generation and input sampling
+
+    Returns:
+        List of result dictionaries
+    """
+    results = []
+    for size in sizes:
+        with tempfile.TemporaryDirectory(prefix="evodoc_bench_") as work_dir:
+            data_dir = os.path.join(work_dir, "data")
+            print(f"\nGenerating {size:,} synthetic patients...")
+            generate_data(size, data_dir, seed)
+            inputs = build_inputs(data_dir, seed=seed)
+            context = {"data_dir": data_dir, "work_dir": work_dir, "review1_dir": review1_dir, "cleanup": []}
+
+            try:
+                for target in targets:
+                    try:
+                        func = TARGET_BUILDERS[target](context)
+                    except Exception as e:
+                        print(f"  {target}: skipped ({type(e).__name__}: {e})")
+                        continue
+                    result = measure(f"{target}@{size}", func, inputs, iterations, warmup)
+                    result.update(target=target, size=size)
+                    results.append(result)
+            finally:
+                for cleanup in context["cleanup"]:
+                    cleanup()
+    return results
+
+def profiler_overhead(rates=PROFILE_RATES, size=DEFAULT_SIZES[0], iterations=DEFAULT_ITERATIONS,
+                      warmup=DEFAULT_WARMUP, seed=42):
+    """Measure the API with the sampling profiler at several sample rates
+
+    Each rate is measured on the same dataset and client; overhead is the
+    change in mean latency against the first rate (normally 0, profiler off).
+
+    Returns:
+        List of result dictionaries
+    """
+    from ..telemetry.profiler import PROFILER
+
+    results = []
+    saved_rate = PROFILER.sample_rate
+    with tempfile.TemporaryDirectory(prefix="evodoc_bench_") as work_dir:
+        data_dir = os.path.join(work_dir, "data")
+        print(f"\nGenerating {size:,} synthetic patients...")
+        generate_data(size, data_dir, seed)
+        inputs = build_inputs(data_dir, seed=seed)
+        context = {"data_dir": data_dir, "work_dir": work_dir, "cleanup": []}
+        try:
+            for target in ("api_patient", "api_recommend"):
+                func = TARGET_BUILDERS[target](context)
+                baseline = None
+                for rate in rates:
+                    PROFILER.sample_rate = rate
+                    result = measure(f"{target}[profile={rate:g}]@{size}", func, inputs, iterations, warmup)
+                    result.update(target=target, size=size, profile_rate=rate)
+                    results.append(result)
+                    baseline = baseline or result
+                    print(f"    overhead vs profile={rates[0]:g}: "
+                          f"{result['mean_ms'] / baseline['mean_ms'] - 1:+.1%} mean")
+        finally:
+            PROFILER.sample_rate = saved_rate
+            PROFILER.reset()
+            for cleanup in context["cleanup"]:
+                cleanup()
+    return results
+
+def wire_bytes(response):
+    """Bytes of an HTTP/1.1 response on the wire: status line, headers and (encoded) body"""
+    head = len(f"HTTP/1.1 {response.status_code} {response.reason_phrase}\r\n") + 2
+    head += sum(len(name) + len(value) + 4 for name, value in response.headers.raw)
+    return head + response.num_bytes_downloaded
+
+def list_endpoints(page_sizes=PAGE_SIZES, iterations=DEFAULT_ITERATIONS, warmup=DEFAULT_WARMUP, seed=42,
+                   poll=False):
+    """Measure the list endpoints at several page sizes
+
+    The dataset is generated large enough to fill the largest page from
+    both tables. Each call requests a different offset so the same rows are
+    not served over and over. With poll=True every page size is measured
+    once per client in POLL_MODES and the results include the mean bytes on
+    the wire per request.
+
+    Returns:
+        List of result dictionaries
+    """
+    results = []
+    size = max(page_sizes)
+    with tempfile.TemporaryDirectory(prefix="evodoc_bench_") as work_dir:
+        data_dir = os.path.join(work_dir, "data")
+        print(f"\nGenerating {size:,} synthetic patients...")
+        generate_data(size, data_dir, seed)
+        context = {"data_dir": data_dir, "work_dir": work_dir, "cleanup": []}
+        try:
+            request = _asgi_client(context)
+            for endpoint in LIST_ENDPOINTS:
+                for page_size in page_sizes:
+                    offsets = list(range(0, size - page_size + 1, max(1, page_size // 10)))[:N_INPUTS]
+                    # Fewer calls for large pages, which take tens of milliseconds each
+                    calls = max(10, iterations * 100 // page_size)
+                    for mode in POLL_MODES if poll else [None]:
+                        headers = _poll_headers(request, endpoint, page_size, offsets, mode)
+                        def func(skip, endpoint=endpoint, page_size=page_size, headers=headers):
+                            return request("GET", endpoint, params={"skip": skip, "limit": page_size},
+                                           headers=headers.get(skip))
+                        name = f"GET {endpoint}[limit={page_size}{f',{mode}' if mode else ''}]@{size}"
+                        result = measure(name, func, offsets, calls, min(warmup, calls),
+                                         memory_calls=min(MEMORY_CALLS, calls))
+                        result.update(target=f"list_{endpoint.strip('/')}", size=size, page_size=page_size)
+                        if mode:
+                            sample = offsets[:min(calls, 20)]
+                            result.update(mode=mode, wire_bytes=float(np.mean([wire_bytes(func(skip))
+                                                                               for skip in sample])))
+                            print(f"    {result['wire_bytes']:,.0f} bytes on the wire per request")
+                        results.append(result)
+        finally:
+            for cleanup in context["cleanup"]:
+                cleanup()
+    return results
+
+def _poll_headers(request, endpoint, page_size, offsets, mode):
+    """Request headers per offset for a polling client mode (empty for the default client)"""
+    if mode is None:
+        return {}
+    if mode == "identity":
+        return {skip: {"Accept-Encoding": "identity"} for skip in offsets}
+    if mode == "gzip":
+        return {skip: {"Accept-Encoding": "gzip"} for skip in offsets}
+    # Revalidate: the client already holds each page and sends its ETag back
+    return {skip: {"Accept-Encoding": "gzip",
+                   "If-None-Match": request("GET", endpoint, params={"skip": skip, "limit": page_size}).headers["etag"]}
+            for skip in offsets}
+
+def _int_list(value):
+    return [int(v) for v in value.split(",") if v]
+
+def main(argv=None):
+    """Run the benchmark suite from the command line; exits with status 1 on a regression"""
+    parser = argparse.ArgumentParser(description="Latency and throughput benchmarks for the EvoDoc stack")
+    parser.add_argument("--sizes", type=_int_list, default=DEFAULT_SIZES,
+                        help="Comma-separated synthetic patient counts (default: 1000)")
+    parser.add_argument("--targets", default=",".join(TARGETS), help=f"Comma-separated subset of {', '.join(TARGETS)}")
+    parser.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS, help="Timed calls per target")
+    parser.add_argument("--warmup", type=int, default=DEFAULT_WARMUP, help="Untimed calls per target")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    parser.add_argument("--review1-dir", default=REVIEW1_DIR, help="review1 checkout for treatment_recommender")
+    parser.add_argument("--output-dir", default=RESULTS_DIR, help="Directory for the JSON results")
+    parser.add_argument("--baseline", help="Result file to compare against")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="Relative p95 slowdown reported as a regression")
+    parser.add_argument("--profile-rates", type=lambda value: [float(v) for v in value.split(",") if v],
+                        help="Measure sampling profiler overhead at these rates (e.g. 0,0.01,1) instead")
+    parser.add_argument("--page-sizes", type=_int_list,
+                        help=f"Measure the list endpoints at these page sizes (e.g. {','.join(map(str, PAGE_SIZES))}) instead")
+    parser.add_argument("--poll", action="store_true",
+                        help=f"With --page-sizes, measure each page as {', '.join(POLL_MODES)} polling clients")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"),
+                        help="Compare two saved result files without running anything")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        regressions = compare_results(load_results(args.compare[0]), load_results(args.compare[1]),
+                                      threshold=args.threshold)
+        return 1 if regressions else 0
+
+    targets = [target for target in args.targets.split(",") if target]
+    unknown = [target for target in targets if target not in TARGET_BUILDERS]
+    if unknown:
+        parser.error(f"Unknown targets: {', '.join(unknown)}")
+
+    if args.profile_rates:
+        results = profiler_overhead(args.profile_rates, args.sizes[0], args.iterations, args.warmup, args.seed)
+        targets = ["api_patient", "api_recommend"]
+    elif args.page_sizes:
+        results = list_endpoints(args.page_sizes, args.iterations, args.warmup, args.seed, args.poll)
+        targets = sorted({result["target"] for result in results})
+    else:
+        results = run_suite(args.sizes, targets, args.iterations, args.warmup, args.review1_dir, args.seed)
+    settings = {"sizes": args.sizes, "targets": targets, "iterations": args.iterations,
+                "warmup": args.warmup, "seed": args.seed, "profile_rates": args.profile_rates,
+                "page_sizes": args.page_sizes, "poll": args.poll}
+    path = save_results(results, settings, args.output_dir)
+
+    if args.baseline:
+        regressions = compare_results(load_results(args.baseline), load_results(path), threshold=args.threshold)
+        return 1 if regressions else 0
+    return 0
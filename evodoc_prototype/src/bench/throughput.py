@@ -0,0 +1,168 @@
+import os
+import io
+import sys
+import time
+import signal
+import socket
+import asyncio
+import argparse
+import tempfile
+import contextlib
+import subprocess
+
+import numpy as np
+
+from .harness import PROJECT_ROOT, RESULTS_DIR, save_results
+from .memory import process_memory_kb
+from .suite import generate_data, build_inputs
+
+# Benchmark settings
+DEFAULT_SIZE = 1000
+DEFAULT_DURATION = 10.0
+DEFAULT_CONCURRENCY = 16
+WARMUP_REQUESTS = 20
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _children(pid):
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(child) for child in f.read().split()]
+
+def memory_kb(pids):
+    """Summed proportional (Pss) and private (USS) memory of processes, from smaps_rollup
+
+    Pss splits pages shared copy-on-write between the processes sharing them,
+    so the Pss sum is the real footprint while USS is what each worker owns.
+    """
+    totals = {"pss_kb": 0, "private_kb": 0}
+    for pid in pids:
+        memory = process_memory_kb(pid)
+        totals["pss_kb"] += memory["pss_kb"]
+        totals["private_kb"] += memory["private_kb"]
+    return totals
+
+async def _load(base_url, inputs, duration, concurrency):
+    import httpx
+
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30.0) as client:
+        async def post(patient):
+            return await client.post("/recommend/", json={
+                "patient_id": patient["patient_id"],
+                "symptoms": patient["diagnosis"],
+                "current_medications": patient["medications"]
+            })
+
+        for patient in inputs[:WARMUP_REQUESTS]:
+            await post(patient)
+
+        async def user(offset):
+            nonlocal errors
+            i = offset
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                response = await post(inputs[i % len(inputs)])
+                latencies.append(time.perf_counter() - start)
+                errors += response.status_code != 200
+                i += concurrency
+
+        start = time.perf_counter()
+        await asyncio.gather(*(user(offset) for offset in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return np.array(latencies), errors, elapsed
+
+def measure_workers(n_workers, database_url, inputs, duration=DEFAULT_DURATION, concurrency=DEFAULT_CONCURRENCY):
+    """Start the pre-forked server with n_workers and drive /recommend/ for duration seconds"""
+    from ..api.serve import wait_until_ready
+
+    port = _free_port()
+    env = dict(os.environ, DATABASE_URL=database_url, PYTHONWARNINGS="ignore")
+    server = subprocess.Popen([sys.executable, "-m", "src.api.serve", "--host", "127.0.0.1", "--port", str(port),
+                               "--workers", str(n_workers)], cwd=PROJECT_ROOT, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        ready_seconds = wait_until_ready(f"http://127.0.0.1:{port}/health/ready")
+        latencies, errors, elapsed = asyncio.run(_load(f"http://127.0.0.1:{port}", inputs, duration, concurrency))
+        workers = _children(server.pid)
+        memory = memory_kb([server.pid] + workers)
+        per_worker = {pid: process_memory_kb(pid) for pid in workers}
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=60)
+
+    result = {
+        "name": f"serve_recommend[workers={n_workers}]",
+        "workers": n_workers,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": int(errors),
+        "requests_per_sec": len(latencies) / elapsed,
+        "p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "p95_ms": float(np.percentile(latencies, 95) * 1000),
+        "p99_ms": float(np.percentile(latencies, 99) * 1000),
+        "ready_seconds": ready_seconds,
+        **memory,
+        "worker_rss_kb": [worker["rss_kb"] for worker in per_worker.values()],
+        "worker_private_kb": [worker["private_kb"] for worker in per_worker.values()]
+    }
+    print(f"  {n_workers} workers: {result['requests_per_sec']:,.1f} req/s, p50 {result['p50_ms']:.1f} ms, "
+          f"p95 {result['p95_ms']:.1f} ms, {errors} errors, Pss {memory['pss_kb'] / 1024:,.0f} MiB "
+          f"(private {memory['private_kb'] / 1024:,.0f} MiB)")
+    for pid, worker in per_worker.items():
+        print(f"    worker {pid}: RSS {worker['rss_kb'] / 1024:,.1f} MiB, private {worker['private_kb'] / 1024:,.1f} MiB")
+    return result
+
+def worker_scaling(max_workers=None, size=DEFAULT_SIZE, duration=DEFAULT_DURATION,
+                   concurrency=DEFAULT_CONCURRENCY, seed=42):
+    """Requests/sec on /recommend/ as the worker count goes from 1 to max_workers
+
+    Returns:
+        List of result dictionaries
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    results = []
+    with tempfile.TemporaryDirectory(prefix="evodoc_bench_") as work_dir:
+        data_dir = os.path.join(work_dir, "data")
+        print(f"Generating {size:,} synthetic patients...")
+        generate_data(size, data_dir, seed)
+        inputs = build_inputs(data_dir, seed=seed)
+
+        database_url = f"sqlite:///{os.path.join(work_dir, 'bench.db')}"
+        # The configured engine is created on import; keep it off PostgreSQL
+        os.environ.setdefault("DATABASE_URL", database_url)
+        from sqlalchemy import create_engine
+        from ..db.bulk_load import bulk_load
+        engine = create_engine(database_url)
+        with contextlib.redirect_stdout(io.StringIO()):
+            bulk_load(data_dir, engine=engine)
+        engine.dispose()
+
+        print(f"Driving /recommend/ for {duration:.0f}s per worker count with {concurrency} concurrent clients")
+        for n_workers in range(1, max_workers + 1):
+            results.append(measure_workers(n_workers, database_url, inputs, duration, concurrency))
+    return results
+
+def main(argv=None):
+    """Run the worker scaling benchmark from the command line"""
+    parser = argparse.ArgumentParser(description="Requests/sec of the pre-forked API server by worker count")
+    parser.add_argument("--max-workers", type=int, default=None, help="Largest worker count (default: CPU count)")
+    parser.add_argument("--size", type=int, default=DEFAULT_SIZE, help="Synthetic patients in the database")
+    parser.add_argument("--duration", type=float, default=DEFAULT_DURATION, help="Seconds of load per worker count")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Concurrent clients")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    parser.add_argument("--output-dir", default=RESULTS_DIR, help="Directory for the JSON results")
+    args = parser.parse_args(argv)
+
+    results = worker_scaling(args.max_workers, args.size, args.duration, args.concurrency, args.seed)
+    save_results(results, {"benchmark": "worker_scaling", "size": args.size, "duration": args.duration,
+                           "concurrency": args.concurrency}, args.output_dir)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
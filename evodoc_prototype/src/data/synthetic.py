@@ -12,6 +12,76 @@ SYNTHETIC_DIR = os.path.join(DATA_DIR, "synthetic")
 # Initialize faker
 fake = Faker()
 
+# Shared vocabularies (also used by the scaled generator in synthetic_scale.py)
+SPECIALIZATIONS = [
+    "Family Medicine", "Internal Medicine", "Cardiology", "Endocrinology", 
+    "Gastroenterology", "Pulmonology", "Nephrology", "Neurology",
+    "Oncology", "Rheumatology"
+]
+
+SYMPTOM_SETS = [
+    "Fever, cough, sore throat",
+    "Headache, dizziness",
+    "Chest pain, shortness of breath",
+    "Abdominal pain, nausea",
+    "Back pain, stiffness",
+    "Rash, itching",
+    "Fatigue, weight loss",
+    "Anxiety, insomnia",
+    "Joint pain, swelling",
+    "Runny nose, sneezing, congestion"
+]
+
+FREQUENCIES = ["once daily", "twice daily", "three times daily", "four times daily", "as needed"]
+
+INSTRUCTIONS = [
+    "Take with food",
+    "Take on an empty stomach",
+    "Take before bedtime",
+    "Take in the morning",
+    "Avoid alcohol while taking this medication",
+    "Drink plenty of water with this medication",
+    "Continue until prescription is finished"
+]
+
+POSSIBLE_SIDE_EFFECTS = [
+    "Nausea", "Headache", "Dizziness", "Fatigue", "Rash",
+    "Stomach pain", "Insomnia", "Dry mouth", "Diarrhea", "Constipation"
+]
+
+POSITIVE_COMMENTS = [
+    "Worked very well, no issues",
+    "Symptoms improved quickly",
+    "Very satisfied with this treatment",
+    "Will recommend to others with similar condition",
+    ""
+]
+
+NEUTRAL_COMMENTS = [
+    "Worked adequately but took time",
+    "Some improvement but not complete resolution",
+    "Acceptable results overall",
+    "Moderate improvement in symptoms",
+    ""
+]
+
+NEGATIVE_COMMENTS = [
+    "Did not work well for me",
+    "Side effects were bothersome",
+    "Had to stop early due to side effects",
+    "Minimal improvement in symptoms",
+    "Would prefer to try something else",
+    ""
+]
+
+def parse_dosage(typical_dosage):
+    """Parse the upper bound of a typical dosage string (simplified)"""
+    if 'mg' in typical_dosage:
+        return typical_dosage.split('mg')[0].split('-')[-1].strip() + ' mg'
+    elif 'mcg' in typical_dosage:
+        return typical_dosage.split('mcg')[0].split('-')[-1].strip() + ' mcg'
+    return "Standard dose"
+
 def generate_patients(n=100):
     """Generate synthetic patient data"""
     patients = []
@@ -232,18 +302,12 @@ def generate_side_effects():
 
 def generate_doctors(n=10):
     """Generate doctor data"""
-    specializations = [
-        "Family Medicine", "Internal Medicine", "Cardiology", "Endocrinology", 
-        "Gastroenterology", "Pulmonology", "Nephrology", "Neurology",
-        "Oncology", "Rheumatology"
-    ]
-    
     doctors = []
     for i in range(1, n+1):
         doctors.append({
             'id': i,
             'name': fake.name(),
-            'specialization': random.choice(specializations),
+            'specialization': random.choice(SPECIALIZATIONS),
             'created_at': fake.date_time_between(start_date='-2y', end_date='-6m').isoformat()
         })
     
@@ -274,20 +338,6 @@ def generate_appointments(patients, doctors, seed=42):
     appointments = []
     appointment_id = 1
     
-    # Common symptoms for appointments
-    symptom_sets = [
-        "Fever, cough, sore throat",
-        "Headache, dizziness",
-        "Chest pain, shortness of breath",
-        "Abdominal pain, nausea",
-        "Back pain, stiffness",
-        "Rash, itching",
-        "Fatigue, weight loss",
-        "Anxiety, insomnia",
-        "Joint pain, swelling",
-        "Runny nose, sneezing, congestion"
-    ]
-    
     # Generate 1-3 appointments for each patient
     for patient_id in patients['id']:
         num_appointments = random.randint(1, 3)
@@ -312,7 +362,7 @@ def generate_appointments(patients, doctors, seed=42):
                 'patient_id': patient_id,
                 'doctor_id': doctor_id,
                 'date': date,
-                'symptoms': random.choice(symptom_sets),
+                'symptoms': random.choice(SYMPTOM_SETS),
                 'status': status,
                 'created_at': fake.date_time_between(start_date='-6m', end_date='now').isoformat()
             })
@@ -340,27 +390,13 @@ def generate_treatments(appointments, medications, seed=42):
             med_info = medications[medications['id'] == med_id].iloc[0]
             
             # Parse typical dosage (simplified)
-            if 'mg' in med_info['typical_dosage']:
-                dosage = med_info['typical_dosage'].split('mg')[0].split('-')[-1].strip() + ' mg'
-            elif 'mcg' in med_info['typical_dosage']:
-                dosage = med_info['typical_dosage'].split('mcg')[0].split('-')[-1].strip() + ' mcg'
-            else:
-                dosage = "Standard dose"
+            dosage = parse_dosage(med_info['typical_dosage'])
             
             # Generate frequencies
-            frequencies = ["once daily", "twice daily", "three times daily", "four times daily", "as needed"]
-            frequency = random.choice(frequencies)
+            frequency = random.choice(FREQUENCIES)
             
             # Generate instructions
-            instructions = random.choice([
-                "Take with food",
-                "Take on an empty stomach",
-                "Take before bedtime",
-                "Take in the morning",
-                "Avoid alcohol while taking this medication",
-                "Drink plenty of water with this medication",
-                "Continue until prescription is finished"
-            ])
+            instructions = random.choice(INSTRUCTIONS)
             
             # Generate treatment dates
             appointment_date = datetime.fromisoformat(appointment['date'])
@@ -417,40 +453,17 @@ def generate_treatment_feedbacks(treatments, patients, seed=42):
             
             side_effects = ""
             if random.random() < side_effect_probability:
-                possible_side_effects = [
-                    "Nausea", "Headache", "Dizziness", "Fatigue", "Rash",
-                    "Stomach pain", "Insomnia", "Dry mouth", "Diarrhea", "Constipation"
-                ]
                 num_side_effects = random.randint(1, 3)
-                selected_side_effects = random.sample(possible_side_effects, num_side_effects)
+                selected_side_effects = random.sample(POSSIBLE_SIDE_EFFECTS, num_side_effects)
                 side_effects = ", ".join(selected_side_effects)
             
             # Comments
             if effectiveness >= 8:
-                comments = random.choice([
-                    "Worked very well, no issues",
-                    "Symptoms improved quickly",
-                    "Very satisfied with this treatment",
-                    "Will recommend to others with similar condition",
-                    ""
-                ])
+                comments = random.choice(POSITIVE_COMMENTS)
             elif effectiveness >= 5:
-                comments = random.choice([
-                    "Worked adequately but took time",
-                    "Some improvement but not complete resolution",
-                    "Acceptable results overall",
-                    "Moderate improvement in symptoms",
-                    ""
-                ])
+                comments = random.choice(NEUTRAL_COMMENTS)
             else:
-                comments = random.choice([
-                    "Did not work well for me",
-                    "Side effects were bothersome",
-                    "Had to stop early due to side effects",
-                    "Minimal improvement in symptoms",
-                    "Would prefer to try something else",
-                    ""
-                ])
+                comments = random.choice(NEGATIVE_COMMENTS)
             
             feedbacks.append({
                 'id': feedback_id,
@@ -0,0 +1,443 @@
+import os
+import sys
+import time
+import shutil
+import argparse
+import numpy as np
+import pandas as pd
+from faker import Faker
+from concurrent.futures import ProcessPoolExecutor
+
+from .synthetic import (
+    SYNTHETIC_DIR,
+    SPECIALIZATIONS,
+    SYMPTOM_SETS,
+    FREQUENCIES,
+    INSTRUCTIONS,
+    POSSIBLE_SIDE_EFFECTS,
+    POSITIVE_COMMENTS,
+    NEUTRAL_COMMENTS,
+    NEGATIVE_COMMENTS,
+    parse_dosage,
+    generate_allergies,
+    generate_medications,
+    generate_ingredients,
+    generate_medication_ingredient_mapping,
+    generate_allergy_ingredient_mapping,
+    generate_side_effects
+)
+
+# Scale-out defaults
+NAME_POOL_SIZE = 2000
+DEFAULT_CHUNK_SIZE = 100_000
+MAX_MEDICATIONS_PER_APPOINTMENT = 3
+SECONDS_PER_DAY = 86400
+
+# Tables produced per shard, in the order they are written
+SHARD_TABLES = ["patients", "patient_allergy", "appointments", "treatments", "treatment_feedbacks"]
+
+# Medical history strings indexed by a 5-bit condition code
+HISTORY_CONDITIONS = ["Hypertension", "Diabetes Type 2", "Hyperlipidemia", "Asthma", "Allergic Rhinitis"]
+HISTORY_STRINGS = np.array([
+    ", ".join(c for bit, c in enumerate(HISTORY_CONDITIONS) if code & (1 << bit)) or "No significant history"
+    for code in range(1 << len(HISTORY_CONDITIONS))
+], dtype=object)
+
+def build_name_pool(seed=42, size=NAME_POOL_SIZE):
+    """Precompute pools of male and female names with Faker
+
+    Args:
+        seed: Seed for Faker so the pool is reproducible
+        size: Number of names per gender
+
+    Returns:
+        Dictionary with 'Male' and 'Female' name arrays
+    """
+    Faker.seed(seed)
+    fake = Faker()
+    return {
+        'Male': np.array([fake.name_male() for _ in range(size)], dtype=object),
+        'Female': np.array([fake.name_female() for _ in range(size)], dtype=object)
+    }
+
+def _side_effect_key(count, a, b, c, n):
+    """Lookup key for up to three side effect indices (a, b, c), in base n"""
+    return ((count * n + a) * n + b) * n + c
+
+def _side_effect_lookup():
+    """Build a lookup table of joined side effect strings
+
+    The key for up to three distinct side effect indices (a, b, c) chosen from
+    POSSIBLE_SIDE_EFFECTS is ``_side_effect_key(count, a, b, c, n)`` with
+    n = len(POSSIBLE_SIDE_EFFECTS); unused indices are 0.
+    """
+    n = len(POSSIBLE_SIDE_EFFECTS)
+    table = np.full(4 * n ** 3, "", dtype=object)
+    for a in range(n):
+        table[_side_effect_key(1, a, 0, 0, n)] = POSSIBLE_SIDE_EFFECTS[a]
+        for b in range(n):
+            table[_side_effect_key(2, a, b, 0, n)] = ", ".join([POSSIBLE_SIDE_EFFECTS[a], POSSIBLE_SIDE_EFFECTS[b]])
+            for c in range(n):
+                table[_side_effect_key(3, a, b, c, n)] = ", ".join(
+                    [POSSIBLE_SIDE_EFFECTS[a], POSSIBLE_SIDE_EFFECTS[b], POSSIBLE_SIDE_EFFECTS[c]]
+                )
+    return table
+
+def _sample_without_replacement(rng, n_rows, n_choices, k):
+    """Sample k distinct indices out of n_choices for every row"""
+    return np.argsort(rng.random((n_rows, n_choices)), axis=1)[:, :k]
+
+def _to_iso(seconds):
+    """Format epoch seconds as ISO 8601 strings"""
+    return np.datetime_as_string(seconds.astype('datetime64[s]'), unit='s')
+
+def _to_day(seconds):
+    """Format epoch seconds as YYYY-MM-DD strings"""
+    return np.datetime_as_string(seconds.astype('datetime64[s]').astype('datetime64[D]'), unit='D')
+
+def generate_doctors_vectorized(n, name_pool, reference_time, seed=42):
+    """Generate doctor data with vectorized sampling
+
+    Args:
+        n: Number of doctors
+        name_pool: Name pool from build_name_pool
+        reference_time: Reference "now" as epoch seconds
+        seed: Random seed
+
+    Returns:
+        DataFrame with doctors
+    """
+    rng = np.random.default_rng(seed)
+    names = np.concatenate([name_pool['Male'], name_pool['Female']])
+
+    # Created between 2 years and 6 months ago
+    created_at = reference_time - rng.integers(182 * SECONDS_PER_DAY, 730 * SECONDS_PER_DAY, n)
+
+    return pd.DataFrame({
+        'id': np.arange(1, n + 1),
+        'name': names[rng.integers(0, len(names), n)],
+        'specialization': np.array(SPECIALIZATIONS, dtype=object)[rng.integers(0, len(SPECIALIZATIONS), n)],
+        'created_at': _to_iso(created_at)
+    })
+
+def generate_shard(spec):
+    """Generate one deterministic shard of patients and their dependent rows
+
+    Every shard owns a contiguous range of patient and appointment IDs, so the
+    output does not depend on the number of worker processes. Treatment IDs are
+    derived from the appointment ID and feedback IDs from the treatment ID, which
+    keeps them globally unique without coordination between shards.
+
+    Args:
+        spec: Dictionary describing the shard (see generate_at_scale)
+
+    Returns:
+        Dictionary with row counts per table
+    """
+    rng = np.random.default_rng(spec['seed'])
+    reference_time = spec['reference_time']
+    name_pool = spec['name_pool']
+
+    # Patients
+    n = spec['n_patients']
+    patient_ids = np.arange(spec['patient_start'], spec['patient_start'] + n)
+    is_male = rng.random(n) < 0.5
+    male_names = name_pool['Male'][rng.integers(0, len(name_pool['Male']), n)]
+    female_names = name_pool['Female'][rng.integers(0, len(name_pool['Female']), n)]
+    ages = rng.integers(18, 86, n)
+
+    # Medical history based on age, encoded as a bit mask
+    older = ages > 50
+    history_code = (
+        (older & (rng.random(n) > 0.6)).astype(np.int64)
+        | (older & (rng.random(n) > 0.7)).astype(np.int64) << 1
+        | (older & (rng.random(n) > 0.8)).astype(np.int64) << 2
+        | (rng.random(n) > 0.8).astype(np.int64) << 3
+        | (rng.random(n) > 0.9).astype(np.int64) << 4
+    )
+
+    patients = pd.DataFrame({
+        'id': patient_ids,
+        'name': np.where(is_male, male_names, female_names),
+        'age': ages,
+        'gender': np.where(is_male, 'Male', 'Female'),
+        'medical_history': HISTORY_STRINGS[history_code],
+        'created_at': _to_iso(reference_time - rng.integers(0, 365 * SECONDS_PER_DAY, n))
+    })
+
+    # Patient allergies: 40% of patients have 1-3 distinct allergies
+    allergy_ids = spec['allergy_ids']
+    has_allergy = np.nonzero(rng.random(n) < 0.4)[0]
+    max_allergies = min(3, len(allergy_ids))
+    num_allergies = rng.integers(1, 4, len(has_allergy))
+    picks = _sample_without_replacement(rng, len(has_allergy), len(allergy_ids), max_allergies)
+    rows, slots = np.nonzero(np.arange(max_allergies) < num_allergies[:, None])
+    patient_allergy = pd.DataFrame({
+        'patient_id': patient_ids[has_allergy[rows]],
+        'allergy_id': allergy_ids[picks[rows, slots]]
+    })
+
+    # Appointments
+    m = spec['n_appointments']
+    appointment_ids = np.arange(spec['appointment_start'], spec['appointment_start'] + m)
+    appointment_patients = np.sort(rng.integers(spec['patient_start'], spec['patient_start'] + n, m)) if n else np.zeros(m, dtype=np.int64)
+    time_choice = rng.random(m)
+    past = time_choice < 0.6
+    upcoming = (time_choice >= 0.6) & (time_choice < 0.9)
+
+    # 60% past, 30% upcoming, 10% today
+    dates = np.where(
+        past,
+        reference_time - rng.integers(SECONDS_PER_DAY, 182 * SECONDS_PER_DAY, m),
+        np.where(
+            upcoming,
+            reference_time + rng.integers(SECONDS_PER_DAY, 30 * SECONDS_PER_DAY, m),
+            reference_time + rng.integers(0, SECONDS_PER_DAY, m)
+        )
+    )
+    status = np.where(
+        past,
+        np.where(rng.random(m) < 0.9, 'completed', 'cancelled'),
+        np.where(upcoming | (rng.random(m) < 0.5), 'scheduled', 'in-progress')
+    )
+
+    appointments = pd.DataFrame({
+        'id': appointment_ids,
+        'patient_id': appointment_patients,
+        'doctor_id': rng.integers(1, spec['n_doctors'] + 1, m),
+        'date': _to_iso(dates),
+        'symptoms': np.array(SYMPTOM_SETS, dtype=object)[rng.integers(0, len(SYMPTOM_SETS), m)],
+        'status': status,
+        'created_at': _to_iso(reference_time - rng.integers(0, 182 * SECONDS_PER_DAY, m))
+    })
+
+    # Treatments: 1-3 distinct medications per completed appointment
+    medication_ids = spec['medication_ids']
+    dosages = spec['dosages']
+    completed = np.nonzero(status == 'completed')[0]
+    num_medications = rng.integers(1, MAX_MEDICATIONS_PER_APPOINTMENT + 1, len(completed))
+    picks = _sample_without_replacement(rng, len(completed), len(medication_ids), MAX_MEDICATIONS_PER_APPOINTMENT)
+    rows, slots = np.nonzero(np.arange(MAX_MEDICATIONS_PER_APPOINTMENT) < num_medications[:, None])
+    treated = completed[rows]
+    med_index = picks[rows, slots]
+    t = len(treated)
+
+    start_seconds = dates[treated]
+    end_seconds = start_seconds + rng.integers(7, 15, t) * SECONDS_PER_DAY
+    treatment_ids = (appointment_ids[treated] - 1) * MAX_MEDICATIONS_PER_APPOINTMENT + slots + 1
+
+    treatments = pd.DataFrame({
+        'id': treatment_ids,
+        'appointment_id': appointment_ids[treated],
+        'doctor_id': appointments['doctor_id'].values[treated],
+        'medication_id': medication_ids[med_index],
+        'dosage': dosages[med_index],
+        'frequency': np.array(FREQUENCIES, dtype=object)[rng.integers(0, len(FREQUENCIES), t)],
+        'instructions': np.array(INSTRUCTIONS, dtype=object)[rng.integers(0, len(INSTRUCTIONS), t)],
+        'start_date': _to_day(start_seconds),
+        'end_date': _to_day(end_seconds),
+        'created_at': appointments['date'].values[treated]
+    })
+
+    # Feedback for 80% of treatments
+    keep = np.nonzero(rng.random(t) < 0.8)[0]
+    f = len(keep)
+    effectiveness = rng.integers(3, 11, f)
+
+    # Side effects are more likely if effectiveness is lower
+    has_side_effects = rng.random(f) < (0.8 - effectiveness / 15)
+    num_side_effects = np.where(has_side_effects, rng.integers(1, 4, f), 0)
+    se_picks = _sample_without_replacement(rng, f, len(POSSIBLE_SIDE_EFFECTS), 3)
+    se_key = _side_effect_key(
+        num_side_effects,
+        se_picks[:, 0],
+        np.where(num_side_effects >= 2, se_picks[:, 1], 0),
+        np.where(num_side_effects >= 3, se_picks[:, 2], 0),
+        len(POSSIBLE_SIDE_EFFECTS)
+    )
+
+    # Comments depend on the effectiveness tier
+    comment_table = np.array(POSITIVE_COMMENTS + NEUTRAL_COMMENTS + NEGATIVE_COMMENTS, dtype=object)
+    tier_offset = np.where(
+        effectiveness >= 8, 0,
+        np.where(effectiveness >= 5, len(POSITIVE_COMMENTS), len(POSITIVE_COMMENTS) + len(NEUTRAL_COMMENTS))
+    )
+    tier_size = np.where(
+        effectiveness >= 8, len(POSITIVE_COMMENTS),
+        np.where(effectiveness >= 5, len(NEUTRAL_COMMENTS), len(NEGATIVE_COMMENTS))
+    )
+    comments = comment_table[tier_offset + rng.integers(0, tier_size)]
+
+    end_days = end_seconds[keep] - end_seconds[keep] % SECONDS_PER_DAY
+    feedbacks = pd.DataFrame({
+        'id': treatment_ids[keep],
+        'treatment_id': treatment_ids[keep],
+        'patient_id': appointment_patients[treated[keep]],
+        'effectiveness': effectiveness,
+        'side_effects': spec['side_effect_lookup'][se_key],
+        'comments': comments,
+        'created_at': _to_iso(end_days + rng.integers(1, 6, f) * SECONDS_PER_DAY)
+    })
+
+    # Stream this shard to its own part files
+    frames = {
+        'patients': patients,
+        'patient_allergy': patient_allergy,
+        'appointments': appointments,
+        'treatments': treatments,
+        'treatment_feedbacks': feedbacks
+    }
+    for table in SHARD_TABLES:
+        part_path = os.path.join(spec['part_dir'], f"{table}.part-{spec['index']:05d}.csv")
+        frames[table].to_csv(part_path, index=False)
+
+    return {table: len(frames[table]) for table in SHARD_TABLES}
+
+def _split(total, sizes):
+    """Split a total proportionally to shard sizes (largest remainder)"""
+    sizes = np.asarray(sizes, dtype=np.int64)
+    if sizes.sum() == 0:
+        return np.zeros_like(sizes)
+    counts = total * sizes // sizes.sum()
+    counts[:total - counts.sum()] += 1
+    return counts
+
+def _concatenate_parts(part_dir, table, n_shards, output_path):
+    """Concatenate shard part files into one CSV without loading them"""
+    with open(output_path, 'wb') as out:
+        for index in range(n_shards):
+            part_path = os.path.join(part_dir, f"{table}.part-{index:05d}.csv")
+            with open(part_path, 'rb') as part:
+                header = part.readline()
+                if index == 0:
+                    out.write(header)
+                shutil.copyfileobj(part, out)
+
+def generate_at_scale(n_patients, n_appointments=None, n_doctors=None, seed=42, workers=None,
+                      chunk_size=DEFAULT_CHUNK_SIZE, output_dir=SYNTHETIC_DIR, reference_date=None):
+    """Generate synthetic data at a target scale
+
+    Patients are split into shards of ``chunk_size``; each shard draws its rows
+    with vectorized NumPy sampling from its own child seed and is written to
+    disk by a worker process. The result is identical for a given seed and
+    chunk size regardless of the number of workers.
+
+    Args:
+        n_patients: Target number of patients
+        n_appointments: Target number of appointments (default 2 per patient)
+        n_doctors: Number of doctors (default 1 per 1,000 patients, at least 10)
+        seed: Root random seed
+        workers: Number of worker processes (default: CPU count)
+        chunk_size: Patients per shard
+        output_dir: Directory to write CSV files to
+        reference_date: Date treated as "now" (default: today)
+
+    Returns:
+        Dictionary with row counts per table
+    """
+    if n_appointments is None:
+        n_appointments = 2 * n_patients
+    if n_doctors is None:
+        n_doctors = max(10, n_patients // 1000)
+
+    start_time = time.time()
+    os.makedirs(output_dir, exist_ok=True)
+    part_dir = os.path.join(output_dir, ".parts")
+    os.makedirs(part_dir, exist_ok=True)
+
+    reference_time = np.datetime64(reference_date or 'today', 's').astype(np.int64)
+    name_pool = build_name_pool(seed)
+
+    # Static reference tables
+    allergies_df = generate_allergies()
+    medications_df = generate_medications()
+    static_tables = {
+        'allergies': allergies_df,
+        'medications': medications_df,
+        'ingredients': generate_ingredients(),
+        'medication_ingredient': generate_medication_ingredient_mapping(),
+        'allergy_ingredient': generate_allergy_ingredient_mapping(),
+        'side_effects': generate_side_effects(),
+        'doctors': generate_doctors_vectorized(n_doctors, name_pool, reference_time, seed)
+    }
+
+    # Shard layout
+    patient_sizes = [min(chunk_size, n_patients - start) for start in range(0, n_patients, chunk_size)] or [0]
+    appointment_sizes = _split(n_appointments, patient_sizes)
+    patient_starts = 1 + np.concatenate([[0], np.cumsum(patient_sizes)[:-1]])
+    appointment_starts = 1 + np.concatenate([[0], np.cumsum(appointment_sizes)[:-1]])
+    child_seeds = np.random.SeedSequence(seed).spawn(len(patient_sizes))
+
+    shared = {
+        'reference_time': reference_time,
+        'name_pool': name_pool,
+        'n_doctors': n_doctors,
+        'allergy_ids': allergies_df['id'].values,
+        'medication_ids': medications_df['id'].values,
+        'dosages': np.array([parse_dosage(d) for d in medications_df['typical_dosage']], dtype=object),
+        'side_effect_lookup': _side_effect_lookup(),
+        'part_dir': part_dir
+    }
+    specs = [
+        dict(shared,
+             index=index,
+             seed=child_seeds[index],
+             patient_start=int(patient_starts[index]),
+             n_patients=int(patient_sizes[index]),
+             appointment_start=int(appointment_starts[index]),
+             n_appointments=int(appointment_sizes[index]))
+        for index in range(len(patient_sizes))
+    ]
+
+    print(f"Generating {n_patients:,} patients and {n_appointments:,} appointments "
+          f"in {len(specs)} shards...")
+
+    counts = {table: 0 for table in SHARD_TABLES}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for index, shard_counts in enumerate(executor.map(generate_shard, specs)):
+            for table, count in shard_counts.items():
+                counts[table] += count
+            print(f"  Shard {index + 1}/{len(specs)} written")
+
+    # Save data
+    for table, df in static_tables.items():
+        df.to_csv(os.path.join(output_dir, f"{table}.csv"), index=False)
+        counts[table] = len(df)
+    for table in SHARD_TABLES:
+        _concatenate_parts(part_dir, table, len(specs), os.path.join(output_dir, f"{table}.csv"))
+    shutil.rmtree(part_dir)
+
+    elapsed = time.time() - start_time
+    total_rows = sum(counts.values())
+    print(f"Generated {total_rows:,} rows in {elapsed:.2f} seconds ({total_rows / max(elapsed, 1e-9):,.0f} rows/sec)")
+    for table, count in counts.items():
+        print(f"  {table}: {count:,}")
+
+    return counts
+
+def main(argv=None):
+    """Generate synthetic data at a target scale from the command line"""
+    parser = argparse.ArgumentParser(description="Generate large-scale synthetic EvoDoc data")
+    parser.add_argument("--patients", type=int, default=1_000_000, help="Target number of patients")
+    parser.add_argument("--appointments", type=int, default=None, help="Target number of appointments")
+    parser.add_argument("--doctors", type=int, default=None, help="Number of doctors")
+    parser.add_argument("--seed", type=int, default=42, help="Root random seed")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Patients per shard")
+    parser.add_argument("--output-dir", default=SYNTHETIC_DIR, help="Output directory")
+    parser.add_argument("--reference-date", default=None, help="Date treated as 'now' (YYYY-MM-DD)")
+    args = parser.parse_args(argv)
+
+    generate_at_scale(
+        n_patients=args.patients,
+        n_appointments=args.appointments,
+        n_doctors=args.doctors,
+        seed=args.seed,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        output_dir=args.output_dir,
+        reference_date=args.reference_date
+    )
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,158 @@
+import os
+import sys
+import time
+import argparse
+import pandas as pd
+from sqlalchemy import create_engine, text, DateTime
+
+from .config import engine as default_engine, Base
+from . import models  # noqa: F401 (registers tables on Base.metadata)
+
+# Paths
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "data")
+SYNTHETIC_DIR = os.path.join(DATA_DIR, "synthetic")
+
+# Rows per executemany batch on non-PostgreSQL databases
+BATCH_SIZE = 50_000
+
+# Storage format SQLAlchemy uses for DateTime columns on SQLite
+SQLITE_DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+def load_order(data_dir):
+    """Return tables that have a CSV file, sorted so foreign keys load first
+
+    Args:
+        data_dir: Directory with <table>.csv files
+
+    Returns:
+        List of (table, csv_path) tuples
+    """
+    order = []
+    for table in Base.metadata.sorted_tables:
+        csv_path = os.path.join(data_dir, f"{table.name}.csv")
+        if os.path.exists(csv_path):
+            order.append((table, csv_path))
+    return order
+
+def _csv_columns(table, csv_path):
+    """Read the CSV header and check it against the table columns"""
+    columns = list(pd.read_csv(csv_path, nrows=0).columns)
+    unknown = [col for col in columns if col not in table.columns]
+    if unknown:
+        raise ValueError(f"{os.path.basename(csv_path)} has columns not in table {table.name}: {', '.join(unknown)}")
+    return columns
+
+def _copy_postgres(conn, table, csv_path, columns):
+    """Stream a CSV file into PostgreSQL with COPY"""
+    cursor = conn.connection.cursor()
+    column_list = ", ".join(f'"{col}"' for col in columns)
+    with open(csv_path, "r", encoding="utf-8") as f:
+        cursor.copy_expert(f"COPY {table.name} ({column_list}) FROM STDIN WITH (FORMAT csv, HEADER true)", f)
+    rows = cursor.rowcount
+
+    # Explicit IDs bypass the serial sequence, so move it past the loaded rows
+    if "id" in table.columns and table.columns["id"].primary_key:
+        conn.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), COALESCE(MAX(id), 1)) FROM {table.name}"
+        ))
+    return rows
+
+def _insert_batches(conn, table, csv_path, columns):
+    """Insert a CSV file in executemany batches"""
+    datetime_columns = [col for col in columns if isinstance(table.columns[col].type, DateTime)]
+    is_sqlite = conn.dialect.name == "sqlite"
+    if is_sqlite:
+        # Raw executemany on SQLite skips SQLAlchemy's per-row bind processing
+        column_list = ", ".join(f'"{col}"' for col in columns)
+        placeholders = ", ".join("?" for _ in columns)
+        statement = f"INSERT INTO {table.name} ({column_list}) VALUES ({placeholders})"
+
+    rows = 0
+    for chunk in pd.read_csv(csv_path, chunksize=BATCH_SIZE):
+        for col in datetime_columns:
+            values = pd.to_datetime(chunk[col], format='ISO8601')
+            chunk[col] = values.dt.strftime(SQLITE_DATETIME_FORMAT) if is_sqlite else values
+        chunk = chunk.astype(object).where(chunk.notna(), None)
+        if is_sqlite:
+            conn.exec_driver_sql(statement, list(chunk.itertuples(index=False, name=None)))
+        else:
+            conn.execute(table.insert(), chunk.to_dict("records"))
+        rows += len(chunk)
+    return rows
+
+def bulk_load(data_dir=SYNTHETIC_DIR, engine=None, replace=False):
+    """Load all synthetic CSV files into the database in one transaction
+
+    Secondary indexes are dropped before the load and rebuilt afterwards.
+    PostgreSQL uses COPY; other databases use batched executemany inserts.
+
+    Args:
+        data_dir: Directory with synthetic CSV files
+        engine: SQLAlchemy engine (default: the configured engine)
+        replace: Delete existing rows before loading
+
+    Returns:
+        Dictionary with rows loaded per table
+    """
+    engine = engine or default_engine
+    is_postgres = engine.dialect.name == "postgresql"
+    order = load_order(data_dir)
+    if not order:
+        print(f"No synthetic CSV files found in {data_dir}")
+        return {}
+
+    Base.metadata.create_all(bind=engine)
+
+    counts = {}
+    total_start = time.time()
+    print(f"Bulk loading {len(order)} tables into {engine.dialect.name}...")
+
+    with engine.begin() as conn:
+        if replace:
+            for table, _ in reversed(order):
+                conn.execute(table.delete())
+
+        # Defer index maintenance until all rows are in
+        for table, _ in order:
+            for index in table.indexes:
+                index.drop(bind=conn, checkfirst=True)
+
+        for table, csv_path in order:
+            columns = _csv_columns(table, csv_path)
+            start = time.time()
+            if is_postgres:
+                rows = _copy_postgres(conn, table, csv_path, columns)
+            else:
+                rows = _insert_batches(conn, table, csv_path, columns)
+            if "updated_at" in table.columns and "created_at" in columns and "updated_at" not in columns:
+                # The CSVs carry no updated_at; without one the list ETags
+                # would not change when these rows are edited
+                conn.execute(table.update().where(table.c.updated_at.is_(None)).values(updated_at=table.c.created_at))
+            elapsed = time.time() - start
+            counts[table.name] = rows
+            print(f"  {table.name}: {rows:,} rows in {elapsed:.2f}s ({rows / max(elapsed, 1e-9):,.0f} rows/sec)")
+
+        start = time.time()
+        for table, _ in order:
+            for index in table.indexes:
+                index.create(bind=conn, checkfirst=True)
+        print(f"  Rebuilt indexes in {time.time() - start:.2f}s")
+
+    elapsed = time.time() - total_start
+    total_rows = sum(counts.values())
+    print(f"Loaded {total_rows:,} rows in {elapsed:.2f} seconds ({total_rows / max(elapsed, 1e-9):,.0f} rows/sec)")
+    return counts
+
+def main(argv=None):
+    """Bulk load synthetic data from the command line"""
+    parser = argparse.ArgumentParser(description="Bulk load synthetic CSV files into the EvoDoc database")
+    parser.add_argument("--data-dir", default=SYNTHETIC_DIR, help="Directory with synthetic CSV files")
+    parser.add_argument("--database-url", default=None, help="Database URL (default: configured engine)")
+    parser.add_argument("--replace", action="store_true", help="Delete existing rows before loading")
+    args = parser.parse_args(argv)
+
+    engine = create_engine(args.database_url) if args.database_url else None
+    bulk_load(args.data_dir, engine=engine, replace=args.replace)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -29,6 +29,13 @@ medication_ingredient = Table(
     Column("ingredient_id", Integer, ForeignKey("ingredients.id"), primary_key=True)
 )
 
+allergy_ingredient = Table(
+    "allergy_ingredient",
+    Base.metadata,
+    Column("allergy_id", Integer, ForeignKey("allergies.id"), primary_key=True),
+    Column("ingredient_id", Integer, ForeignKey("ingredients.id"), primary_key=True)
+)
+
 # Patient model
 class Patient(Base):
     __tablename__ = "patients"
@@ -70,7 +77,7 @@ class Allergy(Base):
     
     # Relationships
     patients = relationship("Patient", secondary=patient_allergy, back_populates="allergies")
-    ingredients = relationship("Ingredient", back_populates="allergies")
+    ingredients = relationship("Ingredient", secondary=allergy_ingredient, back_populates="allergies")
 
 # Medication model
 class Medication(Base):
@@ -97,7 +104,7 @@ class Ingredient(Base):
     
     # Relationships
     medications = relationship("Medication", secondary=medication_ingredient, back_populates="ingredients")
-    allergies = relationship("Allergy", back_populates="ingredients")
+    allergies = relationship("Allergy", secondary=allergy_ingredient, back_populates="ingredients")
 
 # Appointment model
 class Appointment(Base):
@@ -110,6 +117,7 @@ class Appointment(Base):
     symptoms = Column(Text)
     status = Column(String)  # pending, completed, cancelled
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
     patient = relationship("Patient", back_populates="appointments")
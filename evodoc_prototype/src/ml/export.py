@@ -0,0 +1,337 @@
+import os
+import sys
+import json
+import time
+import pickle
+import subprocess
+import numpy as np
+from datetime import datetime
+
+from .lightweight import EXPORT_DIR, FORMAT_VERSION, load_exported, write_flat_arrays
+
+# Paths
+MODEL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "models")
+TRAINED_DIR = os.path.join(MODEL_DIR, "trained")
+FEATURE_DIR = os.path.join(MODEL_DIR, "feature_extractors")
+PROJECT_DIR = os.path.dirname(MODEL_DIR)
+
+# Exported models and their pickle sources
+MODEL_FILES = {
+    'recommendation': "best_recommendation_model.pkl",
+    'side_effect_severity': "side_effect_severity_model.pkl",
+    'side_effect_frequency': "side_effect_frequency_model.pkl"
+}
+
+def _json_values(values):
+    """Convert an array of categories to JSON-friendly Python values"""
+    return [value.item() if isinstance(value, np.generic) else value for value in values]
+
+# review1/tree_engine.py has the same flatten_trees and tree_ensemble_arrays,
+# and TreeEnsemble.apply follows its CompiledEnsemble. review1 is a separate
+# set of scripts that this package cannot import (nor it this one), so keep
+# the node layout in step there. Its export stays one .npz per model because
+# it is only read once at startup; this one is memory-mapped by every worker
+# and replaced while they run, hence the flat arrays and versioned manifest.
+def flatten_trees(trees):
+    """Concatenate fitted sklearn regression trees into flat node arrays
+
+    Args:
+        trees: List of fitted DecisionTreeRegressor objects
+
+    Returns:
+        Dictionary with feature, threshold, left, right, value and roots arrays
+    """
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset = 0
+
+    for tree in trees:
+        tree_ = tree.tree_
+        roots.append(offset)
+        features.append(tree_.feature.astype(np.int32))
+        thresholds.append(tree_.threshold.astype(np.float64))
+        lefts.append(np.where(tree_.children_left >= 0, tree_.children_left + offset, -1).astype(np.int32))
+        rights.append(np.where(tree_.children_right >= 0, tree_.children_right + offset, -1).astype(np.int32))
+        values.append(tree_.value[:, 0, 0].astype(np.float64))
+        offset += tree_.node_count
+
+    return {
+        'feature': np.concatenate(features),
+        'threshold': np.concatenate(thresholds),
+        'left': np.concatenate(lefts),
+        'right': np.concatenate(rights),
+        'value': np.concatenate(values),
+        'roots': np.array(roots, dtype=np.int32)
+    }
+
+def tree_ensemble_arrays(model):
+    """Flatten a fitted random forest or gradient boosting regressor"""
+    if hasattr(model, 'init_'):
+        # Gradient boosting: init prediction + learning_rate * sum of stages
+        trees = list(model.estimators_[:, 0])
+        scale = model.learning_rate
+        if model.init_ == 'zero':
+            base = 0.0
+        else:
+            base = float(np.ravel(model.init_.predict(np.zeros((1, model.n_features_in_))))[0])
+    else:
+        # Random forest: average of trees
+        trees = list(model.estimators_)
+        scale = 1.0 / len(trees)
+        base = 0.0
+
+    arrays = flatten_trees(trees)
+    arrays['scale'] = np.float64(scale)
+    arrays['base'] = np.float64(base)
+    arrays['n_features'] = np.int64(model.n_features_in_)
+    return arrays
+
+def export_model(name, model, export_dir=EXPORT_DIR, version=None):
+    """Write one model in a pickle-free format
+
+    Args:
+        name: Model name used for the file name
+        model: Fitted model
+        export_dir: Output directory
+        version: Export version added to the file name
+
+    Returns:
+        Manifest entry for the model
+    """
+    type_name = type(model).__name__
+    stem = f"{name}.{version}" if version else name
+
+    if type_name == 'XGBRegressor':
+        filename = f"{stem}.ubj"
+        model.get_booster().save_model(os.path.join(export_dir, filename))
+        return {'type': 'xgboost', 'file': filename, 'source': type_name}
+
+    if type_name in ('RandomForestRegressor', 'GradientBoostingRegressor'):
+        filename = f"{stem}.bin"
+        arrays = tree_ensemble_arrays(model)
+        scalars = {key: arrays.pop(key) for key in ('scale', 'base', 'n_features')}
+        layout = write_flat_arrays(os.path.join(export_dir, filename), arrays)
+        return {'type': 'tree_ensemble', 'file': filename, 'arrays': layout, 'source': type_name,
+                'scale': float(scalars['scale']), 'base': float(scalars['base']),
+                'n_features': int(scalars['n_features'])}
+
+    if type_name == 'LinearRegression':
+        filename = f"{stem}.bin"
+        layout = write_flat_arrays(os.path.join(export_dir, filename), {'coef': np.asarray(model.coef_, np.float64)})
+        return {'type': 'linear', 'file': filename, 'arrays': layout, 'source': type_name,
+                'intercept': float(model.intercept_)}
+
+    raise ValueError(f"Cannot export model {name} of type {type_name}")
+
+def export_feature_extractor(extractor_path, export_dir=EXPORT_DIR, version=None):
+    """Write the patient feature extractor as plain JSON vocabularies
+
+    Args:
+        extractor_path: Path to patient_feature_extractor.pkl
+        export_dir: Output directory
+        version: Export version added to the file name
+
+    Returns:
+        File name of the exported extractor
+    """
+    with open(extractor_path, 'rb') as f:
+        extractors = pickle.load(f)
+
+    spec = {
+        'age_mean': float(extractors['demographic_scaler'].mean_[0]),
+        'age_scale': float(extractors['demographic_scaler'].scale_[0]),
+        'diagnoses': _json_values(extractors['diagnosis_encoder'].categories_[0]),
+        'medications': _json_values(extractors['medication_encoder'].categories_[0]),
+        'allergies': _json_values(extractors['allergy_encoder'].categories_[0])
+    }
+
+    filename = f"feature_extractor.{version}.json" if version else "feature_extractor.json"
+    with open(os.path.join(export_dir, filename), 'w') as f:
+        json.dump(spec, f)
+    return filename
+
+def _manifest_files(manifest_path):
+    """Files referenced by a manifest (empty if there is none)"""
+    if not os.path.exists(manifest_path):
+        return set()
+    with open(manifest_path, 'r') as f:
+        manifest = json.load(f)
+    return {manifest['feature_extractor']} | {entry['file'] for entry in manifest['models'].values()}
+
+def _remove_stale_exports(export_dir, version, keep):
+    """Delete model and vocabulary files of exports older than version
+
+    Files in keep (those of the current and the replaced manifest) stay,
+    as do files of any newer export still being written.
+    """
+    for filename in os.listdir(export_dir):
+        if not filename.endswith(('.bin', '.npz', '.ubj', '.json')) or filename == "manifest.json" \
+                or filename in keep:
+            continue
+        file_version = filename.split('.')[-2]
+        if not file_version.isdigit() or file_version < version:
+            os.remove(os.path.join(export_dir, filename))
+
+def export_all(export_dir=EXPORT_DIR):
+    """Export the serving artifacts to a pickle-free directory
+
+    The feature extractor and medication encoder are written as JSON
+    vocabularies, sklearn tree ensembles and linear models as flat array
+    files that serving processes memory-map, and XGBoost boosters in their
+    native UBJ format. The export is verified against the pickled models.
+
+    Every export writes new, versioned files and then replaces manifest.json
+    in one rename, so a process loading at the same time sees either the old
+    export or the new one, never a mix. Files of older exports are removed,
+    except those of the export being replaced.
+
+    Args:
+        export_dir: Output directory
+
+    Returns:
+        Maximum absolute prediction difference between pickle and export
+    """
+    print("Exporting models to pickle-free format...")
+    os.makedirs(export_dir, exist_ok=True)
+    version = f"{datetime.now():%Y%m%d%H%M%S%f}"
+    manifest_path = os.path.join(export_dir, "manifest.json")
+    previous_files = _manifest_files(manifest_path)
+
+    manifest = {
+        'format_version': FORMAT_VERSION,
+        'version': version,
+        'feature_extractor': export_feature_extractor(
+            os.path.join(FEATURE_DIR, "patient_feature_extractor.pkl"), export_dir, version
+        ),
+        'models': {}
+    }
+
+    models = {}
+    for name, filename in MODEL_FILES.items():
+        with open(os.path.join(TRAINED_DIR, filename), 'rb') as f:
+            models[name] = pickle.load(f)
+        manifest['models'][name] = export_model(name, models[name], export_dir, version)
+
+    with open(os.path.join(TRAINED_DIR, "medication_encoder.pkl"), 'rb') as f:
+        manifest['medication_encoder'] = _json_values(pickle.load(f).categories_[0])
+
+    # The manifest rename publishes the export
+    with open(f"{manifest_path}.tmp", 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(f"{manifest_path}.tmp", manifest_path)
+    _remove_stale_exports(export_dir, version, _manifest_files(manifest_path) | previous_files)
+
+    # Verify the export reproduces the original predictions
+    exported = load_exported(export_dir)
+    rng = np.random.default_rng(42)
+    max_diff = 0.0
+    for name, model in models.items():
+        X = rng.random((256, model.n_features_in_))
+        X[:, 1:] = X[:, 1:] > 0.5
+        diff = float(np.max(np.abs(model.predict(X) - exported[name].predict(X))))
+        print(f"  {name}: max prediction difference {diff:.2e}")
+        max_diff = max(max_diff, diff)
+
+    print(f"Models exported to {export_dir}")
+    return max_diff
+
+def _time_subprocess(code, repeats):
+    """Time a fresh interpreter running the given code"""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], check=True, cwd=PROJECT_DIR)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+def benchmark_cold_start(repeats=5, export_dir=EXPORT_DIR):
+    """Compare cold-start load time of the pickles against the export
+
+    Each measurement runs in a fresh interpreter so import time is included.
+
+    Args:
+        repeats: Number of runs per format
+        export_dir: Export directory
+
+    Returns:
+        Dictionary with median seconds per format
+    """
+    print(f"Benchmarking cold-start load time ({repeats} runs each)...")
+    pickle_paths = [os.path.join(FEATURE_DIR, "patient_feature_extractor.pkl"),
+                    os.path.join(TRAINED_DIR, "medication_encoder.pkl")]
+    pickle_paths += [os.path.join(TRAINED_DIR, filename) for filename in MODEL_FILES.values()]
+
+    pickle_code = "import pickle\n" + "".join(
+        f"pickle.load(open({path!r}, 'rb'))\n" for path in pickle_paths
+    )
+    export_code = (
+        "from src.ml.lightweight import load_exported\n"
+        f"load_exported({export_dir!r})\n"
+    )
+
+    results = {
+        'pickle': float(np.median(_time_subprocess(pickle_code, repeats))),
+        'export': float(np.median(_time_subprocess(export_code, repeats)))
+    }
+
+    print(f"  pickle: {results['pickle']:.3f}s")
+    print(f"  export: {results['export']:.3f}s")
+    print(f"  speedup: {results['pickle'] / results['export']:.1f}x")
+    return results
+
+def _row_latency_us(model, X):
+    start = time.perf_counter()
+    for i in range(len(X)):
+        model.predict(X[i:i + 1])
+    return (time.perf_counter() - start) / len(X) * 1e6
+
+def benchmark_predict(n_rows=200, n_trees=150, seed=42):
+    """Compare single-row predict latency of the pickled models and the export
+
+    The shipped models are small, so a random forest of n_trees trees fitted
+    on random data with the recommendation model's feature count is timed
+    as well.
+
+    Args:
+        n_rows: Number of single-row predictions to time per model
+        n_trees: Trees in the synthetic random forest
+        seed: Random seed for the inputs
+
+    Returns:
+        Dictionary of model name -> {'pickle_us', 'export_us'} per row
+    """
+    from sklearn.ensemble import RandomForestRegressor
+    from .lightweight import TreeEnsemble
+
+    print(f"Benchmarking single-row predict ({n_rows} rows each)...")
+    models = {}
+    for name, filename in MODEL_FILES.items():
+        with open(os.path.join(TRAINED_DIR, filename), 'rb') as f:
+            models[name] = pickle.load(f)
+    exported = load_exported()
+
+    rng = np.random.default_rng(seed)
+    n_features = models['recommendation'].n_features_in_
+    X_fit = rng.random((2000, n_features))
+    X_fit[:, 1:] = X_fit[:, 1:] > 0.5
+    forest = RandomForestRegressor(n_estimators=n_trees, random_state=seed).fit(X_fit, rng.random(2000))
+    models[f'random_forest_{n_trees}'] = forest
+    arrays = tree_ensemble_arrays(forest)
+    exported[f'random_forest_{n_trees}'] = TreeEnsemble(
+        arrays['feature'], arrays['threshold'], arrays['left'], arrays['right'], arrays['value'],
+        arrays['roots'], float(arrays['scale']), float(arrays['base']), int(arrays['n_features'])
+    )
+
+    results = {}
+    for name, model in models.items():
+        X = rng.random((n_rows, model.n_features_in_))
+        X[:, 1:] = X[:, 1:] > 0.5
+        results[name] = {'pickle_us': _row_latency_us(model, X), 'export_us': _row_latency_us(exported[name], X)}
+        print(f"  {name} ({type(model).__name__}): pickle {results[name]['pickle_us']:.0f} us, "
+              f"export {results[name]['export_us']:.0f} us per row")
+    return results
+
+if __name__ == "__main__":
+    export_all()
+    if "--benchmark" in sys.argv:
+        benchmark_cold_start()
+        benchmark_predict()
@@ -85,7 +85,7 @@ class PatientFeatureExtractor:
                 med_encoded_list.append(med_encoded)
             # Combine multiple medications
             if med_encoded_list:
-                medication_encoded = np.max(np.vstack(med_encoded_list), axis=0)
+                medication_encoded = np.max(np.vstack(med_encoded_list), axis=0, keepdims=True)
             else:
                 medication_encoded = np.zeros((1, len(self.medication_encoder.categories_[0])))
         else:
@@ -102,7 +102,7 @@ class PatientFeatureExtractor:
                 allergy_encoded_list.append(allergy_encoded)
             # Combine multiple allergies
             if allergy_encoded_list:
-                allergy_encoded = np.max(np.vstack(allergy_encoded_list), axis=0)
+                allergy_encoded = np.max(np.vstack(allergy_encoded_list), axis=0, keepdims=True)
             else:
                 allergy_encoded = np.zeros((1, len(self.allergy_encoder.categories_[0])))
         else:
@@ -220,6 +220,19 @@ def prepare_training_data(synthetic_dir, save_extractors=True):
         suffixes=('', '_pat')  # Add explicit suffixes to avoid conflicts
     )
     
+    return build_feature_matrix(extractor, treatment_data)
+
+def build_feature_matrix(extractor, treatment_data):
+    """Build feature vectors and targets from joined treatment data
+    
+    Args:
+        extractor: Fitted PatientFeatureExtractor
+        treatment_data: DataFrame with age, gender, symptoms, name (medication)
+            and effectiveness columns
+    
+    Returns:
+        X, y: Feature matrix and targets
+    """
     # Prepare feature vectors
     X_list = []
     y_list = []
@@ -241,10 +254,10 @@ def prepare_training_data(synthetic_dir, save_extractors=True):
         y_list.append(y)
     
     # Combine all feature vectors
-    X_train = np.vstack(X_list)
-    y_train = np.array(y_list)
+    X = np.vstack(X_list)
+    y = np.array(y_list)
     
-    return X_train, y_train
+    return X, y
 
 if __name__ == "__main__":
     # Example usage
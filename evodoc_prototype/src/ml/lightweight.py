@@ -0,0 +1,291 @@
+import os
+import json
+import numpy as np
+from typing import Dict, List
+
+# Paths
+MODEL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "models")
+EXPORT_DIR = os.path.join(MODEL_DIR, "exported")
+FORMAT_VERSION = 2
+SUPPORTED_FORMAT_VERSIONS = (1, 2)
+
+# Byte alignment of every array in a flat array file
+ARRAY_ALIGNMENT = 64
+
+def write_flat_arrays(path: str, arrays: Dict) -> Dict:
+    """Write arrays back to back into one flat binary file
+
+    Args:
+        path: Output file
+        arrays: Dictionary of name -> array
+
+    Returns:
+        Layout of name -> {offset, dtype, shape} for map_flat_arrays()
+    """
+    layout = {}
+    offset = 0
+    # Written beside the target and renamed over it, so processes that still
+    # map the previous file keep reading it instead of a truncated one
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            padding = -offset % ARRAY_ALIGNMENT
+            f.write(b'\0' * padding)
+            offset += padding
+            layout[name] = {'offset': offset, 'dtype': array.dtype.str, 'shape': list(array.shape)}
+            f.write(array.tobytes())
+            offset += array.nbytes
+    os.replace(tmp_path, path)
+    return layout
+
+def map_flat_arrays(path: str, layout: Dict) -> Dict:
+    """Map a flat array file read-only
+
+    The arrays are views on one mmap of the file, so their pages live in the
+    OS page cache and are shared by every process that maps the same file
+    instead of being copied into each process's heap.
+
+    Args:
+        path: File written by write_flat_arrays()
+        layout: Layout returned by write_flat_arrays()
+
+    Returns:
+        Dictionary of name -> read-only array
+    """
+    buffer = np.memmap(path, dtype=np.uint8, mode='r')
+    return {
+        name: np.ndarray(tuple(spec['shape']), dtype=np.dtype(spec['dtype']), buffer=buffer, offset=spec['offset'])
+        for name, spec in layout.items()
+    }
+
+class OneHotVocabulary:
+    """One-hot encoder rebuilt from an exported vocabulary"""
+
+    def __init__(self, categories: List):
+        """Initialize encoder
+
+        Args:
+            categories: Ordered list of known categories
+        """
+        self.categories_ = [np.array(categories, dtype=object)]
+        self.index = {category: i for i, category in enumerate(categories)}
+
+    def transform(self, X) -> np.ndarray:
+        """One-hot encode a column of values (unknown values encode as zeros)"""
+        values = np.asarray(X, dtype=object).reshape(-1)
+        encoded = np.zeros((len(values), len(self.index)))
+        for row, value in enumerate(values):
+            column = self.index.get(value)
+            if column is not None:
+                encoded[row, column] = 1.0
+        return encoded
+
+    def encode_any(self, values: List) -> np.ndarray:
+        """Encode several values into a single multi-hot row"""
+        encoded = np.zeros((1, len(self.index)))
+        for value in values:
+            column = self.index.get(value)
+            if column is not None:
+                encoded[0, column] = 1.0
+        return encoded
+
+class LightweightFeatureExtractor:
+    """Patient feature extractor rebuilt from exported vocabularies
+
+    Produces the same vectors as PatientFeatureExtractor.transform_patient
+    without importing scikit-learn.
+    """
+
+    def __init__(self, spec: Dict):
+        """Initialize extractor
+
+        Args:
+            spec: Dictionary from feature_extractor.json
+        """
+        self.age_mean = float(spec['age_mean'])
+        self.age_scale = float(spec['age_scale'])
+        self.diagnosis_encoder = OneHotVocabulary(spec['diagnoses'])
+        self.medication_encoder = OneHotVocabulary(spec['medications'])
+        self.allergy_encoder = OneHotVocabulary(spec['allergies'])
+
+    def transform_patient(self, patient_data: Dict) -> np.ndarray:
+        """Transform patient data to feature vector
+
+        Args:
+            patient_data: Dictionary with patient information
+
+        Returns:
+            feature_vector: Numpy array with features
+        """
+        demographic = np.array([[(patient_data.get('age', 0) - self.age_mean) / self.age_scale]])
+
+        if 'diagnosis' in patient_data:
+            diagnosis_encoded = self.diagnosis_encoder.encode_any([patient_data['diagnosis']])
+        else:
+            diagnosis_encoded = self.diagnosis_encoder.encode_any([])
+
+        medication_encoded = self.medication_encoder.encode_any(patient_data.get('medications') or [])
+        allergy_encoded = self.allergy_encoder.encode_any(patient_data.get('allergies') or [])
+
+        return np.hstack([demographic, diagnosis_encoded, medication_encoded, allergy_encoded])
+
+class TreeEnsemble:
+    """Regression tree ensemble stored as flat node arrays
+
+    All trees share one set of node arrays; left/right hold global node indices
+    (-1 for leaves) and roots the first node of every tree. The prediction is
+    base + scale * sum(tree outputs), which covers random forests
+    (scale = 1 / n_trees) and gradient boosting (scale = learning rate).
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, scale, base, n_features):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.scale = scale
+        self.base = base
+        self.n_features_in_ = n_features
+
+    def apply(self, X) -> np.ndarray:
+        """Return the leaf node reached in every tree, shape (rows, trees)
+
+        All trees are walked together one level per step on a flat
+        (rows x trees) array of node ids, as review1/tree_engine.py does; only
+        entries that have not reached a leaf (left == -1) move on. The node
+        arrays are read as stored, so memory-mapped exports stay shared.
+        """
+        # Trees compare float32 features against float64 thresholds, as scikit-learn does
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_rows, n_trees = X.shape[0], len(self.roots)
+
+        node = np.tile(np.asarray(self.roots, dtype=np.intp), n_rows)
+        row_offset = np.repeat(np.arange(n_rows, dtype=np.intp) * X.shape[1], n_trees)
+        flat_X = X.ravel()
+
+        active = np.flatnonzero(self.left[node] >= 0)
+        while len(active):
+            current = node[active]
+            go_left = flat_X[row_offset[active] + self.feature[current]] <= self.threshold[current]
+            current = np.where(go_left, self.left[current], self.right[current])
+            node[active] = current
+            active = active[self.left[current] >= 0]
+
+        return node.reshape(n_rows, n_trees)
+
+    def predict(self, X) -> np.ndarray:
+        """Predict targets for a 2-D feature matrix"""
+        return self.base + self.scale * self.value[self.apply(X)].sum(axis=1)
+
+class LinearModel:
+    """Linear regression rebuilt from exported coefficients"""
+
+    def __init__(self, coef, intercept):
+        self.coef_ = np.asarray(coef, dtype=np.float64)
+        self.intercept_ = float(intercept)
+        self.n_features_in_ = len(self.coef_)
+
+    def predict(self, X) -> np.ndarray:
+        """Predict targets for a 2-D feature matrix"""
+        return np.asarray(X, dtype=np.float64) @ self.coef_ + self.intercept_
+
+class XGBoostModel:
+    """XGBoost booster loaded from its native UBJ format"""
+
+    def __init__(self, path: str):
+        import xgboost as xgb
+
+        self.booster = xgb.Booster()
+        self.booster.load_model(path)
+        self.n_features_in_ = self.booster.num_features()
+
+    def predict(self, X) -> np.ndarray:
+        """Predict targets for a 2-D feature matrix"""
+        return self.booster.inplace_predict(np.asarray(X, dtype=np.float32))
+
+def load_model(entry: Dict, export_dir: str = EXPORT_DIR):
+    """Rebuild one model from its manifest entry
+
+    Args:
+        entry: Manifest entry with type and file
+        export_dir: Export directory
+
+    Returns:
+        Model with a predict method
+    """
+    path = os.path.join(export_dir, entry['file'])
+
+    if 'arrays' in entry:
+        # Format 2: weights memory-mapped from a flat array file
+        arrays = map_flat_arrays(path, entry['arrays'])
+        if entry['type'] == 'tree_ensemble':
+            return TreeEnsemble(
+                feature=arrays['feature'],
+                threshold=arrays['threshold'],
+                left=arrays['left'],
+                right=arrays['right'],
+                value=arrays['value'],
+                roots=arrays['roots'],
+                scale=float(entry['scale']),
+                base=float(entry['base']),
+                n_features=int(entry['n_features'])
+            )
+        if entry['type'] == 'linear':
+            return LinearModel(arrays['coef'], entry['intercept'])
+
+    if entry['type'] == 'tree_ensemble':
+        with np.load(path) as arrays:
+            return TreeEnsemble(
+                feature=arrays['feature'],
+                threshold=arrays['threshold'],
+                left=arrays['left'],
+                right=arrays['right'],
+                value=arrays['value'],
+                roots=arrays['roots'],
+                scale=float(arrays['scale']),
+                base=float(arrays['base']),
+                n_features=int(arrays['n_features'])
+            )
+    if entry['type'] == 'linear':
+        with np.load(path) as arrays:
+            return LinearModel(arrays['coef'], arrays['intercept'])
+    if entry['type'] == 'xgboost':
+        return XGBoostModel(path)
+
+    raise ValueError(f"Unknown exported model type: {entry['type']}")
+
+def exported_models_available(export_dir: str = EXPORT_DIR) -> bool:
+    """Check whether an export with a supported format version exists"""
+    manifest_path = os.path.join(export_dir, "manifest.json")
+    if not os.path.exists(manifest_path):
+        return False
+    with open(manifest_path, 'r') as f:
+        return json.load(f).get('format_version') in SUPPORTED_FORMAT_VERSIONS
+
+def load_exported(export_dir: str = EXPORT_DIR) -> Dict:
+    """Load exported models and vocabularies without unpickling anything
+
+    Args:
+        export_dir: Directory written by src.ml.export
+
+    Returns:
+        Dictionary with feature_extractor, recommendation, side_effect_severity,
+        side_effect_frequency and medication_encoder entries
+    """
+    with open(os.path.join(export_dir, "manifest.json"), 'r') as f:
+        manifest = json.load(f)
+
+    if manifest.get('format_version') not in SUPPORTED_FORMAT_VERSIONS:
+        raise ValueError(f"Unsupported export format version: {manifest.get('format_version')}")
+
+    with open(os.path.join(export_dir, manifest['feature_extractor']), 'r') as f:
+        artifacts = {'feature_extractor': LightweightFeatureExtractor(json.load(f))}
+
+    for name, entry in manifest['models'].items():
+        artifacts[name] = load_model(entry, export_dir)
+
+    artifacts['medication_encoder'] = OneHotVocabulary(manifest['medication_encoder'])
+    return artifacts
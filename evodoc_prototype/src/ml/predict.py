@@ -4,6 +4,10 @@ import pandas as pd
 import pickle
 from typing import List, Dict, Tuple, Any
 
+from .lightweight import exported_models_available, load_exported
+from .registry import REGISTRY
+from ..telemetry.tracing import span, stage
+
 # Paths
 MODEL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "models")
 TRAINED_DIR = os.path.join(MODEL_DIR, "trained")
@@ -14,13 +18,21 @@ class MedicationRecommender:
     
     def __init__(self):
         """Initialize model"""
-        # Load feature extractor
-        with open(os.path.join(FEATURE_DIR, "patient_feature_extractor.pkl"), 'rb') as f:
-            self.feature_extractor = pickle.load(f)
-        
-        # Load best model
-        with open(os.path.join(TRAINED_DIR, "best_recommendation_model.pkl"), 'rb') as f:
-            self.model = pickle.load(f)
+        if exported_models_available():
+            # Pickle-free export loads without importing scikit-learn
+            exported = load_exported()
+            self.feature_extractor = exported['feature_extractor']
+            self.model = exported['recommendation']
+        else:
+            # Load feature extractor
+            from .features import PatientFeatureExtractor
+            self.feature_extractor = PatientFeatureExtractor(
+                load_from=os.path.join(FEATURE_DIR, "patient_feature_extractor.pkl")
+            )
+            
+            # Load best model
+            with open(os.path.join(TRAINED_DIR, "best_recommendation_model.pkl"), 'rb') as f:
+                self.model = pickle.load(f)
         
         # Load medication data
         self.medications = pd.read_csv(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 
@@ -101,25 +113,29 @@ class MedicationRecommender:
             Dictionary with recommendations
         """
         # Extract features
-        X = self.feature_extractor.transform_patient(patient_data)
+        with stage("feature_extraction"):
+            X = self.feature_extractor.transform_patient(patient_data)
         
         # Get all medication names
         all_medications = self.medications['name'].unique()
         
-        # Predict effectiveness for each medication
-        predictions = []
-        
+        # One feature row per candidate medication
+        rows = []
         for medication in all_medications:
             # Update patient data with this medication
             patient_data_copy = patient_data.copy()
             patient_data_copy['medications'] = [medication]
             
             # Extract features
-            X_med = self.feature_extractor.transform_patient(patient_data_copy)
-            
-            # Predict effectiveness
-            effectiveness = self.model.predict(X_med)[0]
-            
+            with stage("feature_extraction"):
+                rows.append(self.feature_extractor.transform_patient(patient_data_copy))
+        
+        # Predict effectiveness for every medication in one call
+        with stage("predict"):
+            effectiveness_scores = self.model.predict(np.vstack(rows))
+        
+        predictions = []
+        for medication, effectiveness in zip(all_medications, effectiveness_scores):
             predictions.append({
                 'medication': medication,
                 'medication_id': self.medications[self.medications['name'] == medication]['id'].iloc[0],
@@ -138,7 +154,8 @@ class MedicationRecommender:
         if patient_allergies:
             for pred in predictions:
                 # Check allergies
-                med_allergies = self.check_allergies(pred['medication_id'], patient_allergies)
+                with stage("allergy_check"):
+                    med_allergies = self.check_allergies(pred['medication_id'], patient_allergies)
                 
                 if med_allergies:
                     # Add to contraindications
@@ -180,16 +197,23 @@ class SideEffectPredictor:
     
     def __init__(self):
         """Initialize model"""
-        # Load models
-        with open(os.path.join(TRAINED_DIR, "side_effect_severity_model.pkl"), 'rb') as f:
-            self.severity_model = pickle.load(f)
-            
-        with open(os.path.join(TRAINED_DIR, "side_effect_frequency_model.pkl"), 'rb') as f:
-            self.frequency_model = pickle.load(f)
-            
-        # Load medication encoder
-        with open(os.path.join(TRAINED_DIR, "medication_encoder.pkl"), 'rb') as f:
-            self.medication_encoder = pickle.load(f)
+        if exported_models_available():
+            # Pickle-free export loads without importing scikit-learn
+            exported = load_exported()
+            self.severity_model = exported['side_effect_severity']
+            self.frequency_model = exported['side_effect_frequency']
+            self.medication_encoder = exported['medication_encoder']
+        else:
+            # Load models
+            with open(os.path.join(TRAINED_DIR, "side_effect_severity_model.pkl"), 'rb') as f:
+                self.severity_model = pickle.load(f)
+                
+            with open(os.path.join(TRAINED_DIR, "side_effect_frequency_model.pkl"), 'rb') as f:
+                self.frequency_model = pickle.load(f)
+                
+            # Load medication encoder
+            with open(os.path.join(TRAINED_DIR, "medication_encoder.pkl"), 'rb') as f:
+                self.medication_encoder = pickle.load(f)
             
         # Load side effects
         self.side_effects = pd.read_csv(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 
@@ -265,20 +289,24 @@ def recommend_treatments(patient_data: Dict, patient_allergies: List[int] = None
     Returns:
         Dictionary with recommendations and side effects
     """
-    # Initialize recommender
-    recommender = MedicationRecommender()
+    # Shared recommender (loaded once per process)
+    with span("model.load", model="recommendation"):
+        recommender = REGISTRY.get("recommender")
     
     # Get recommendations
-    recommendations = recommender.recommend(patient_data, patient_allergies)
+    with span("recommend"):
+        recommendations = recommender.recommend(patient_data, patient_allergies)
     
-    # Initialize side effect predictor
-    side_effect_predictor = SideEffectPredictor()
+    # Shared side effect predictor
+    with span("model.load", model="side_effects"):
+        side_effect_predictor = REGISTRY.get("side_effects")
     
     # Get side effects for recommended medications
-    for rec in recommendations['recommendations']:
-        rec['side_effects'] = side_effect_predictor.predict_side_effects(
-            rec['medication'], patient_data
-        )
+    with span("side_effects", medications=len(recommendations['recommendations'])):
+        for rec in recommendations['recommendations']:
+            rec['side_effects'] = side_effect_predictor.predict_side_effects(
+                rec['medication'], patient_data
+            )
     
     return recommendations
 
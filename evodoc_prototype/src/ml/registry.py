@@ -0,0 +1,154 @@
+import os
+import time
+import hashlib
+import threading
+
+# Set EVODOC_WARMUP=0 to skip background warm-up (models then load on first use)
+WARMUP_ENV = "EVODOC_WARMUP"
+
+# Models loaded by warm_up(), in order
+MODEL_NAMES = ["recommender", "side_effects"]
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "models")
+MODEL_SUBDIRS = ["exported", "trained", "feature_extractors"]
+
+def model_version(model_dir=MODEL_DIR):
+    """Short fingerprint of the model files on disk (names, sizes and mtimes)"""
+    digest = hashlib.sha1()
+    for subdir in MODEL_SUBDIRS:
+        directory = os.path.join(model_dir, subdir)
+        if not os.path.isdir(directory):
+            continue
+        for name in sorted(os.listdir(directory)):
+            stat = os.stat(os.path.join(directory, name))
+            digest.update(f"{subdir}/{name}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()[:12]
+
+def _load_model(name):
+    # Imported here so that importing the registry does not pull in pandas
+    from .predict import MedicationRecommender, SideEffectPredictor
+
+    factories = {
+        "recommender": MedicationRecommender,
+        "side_effects": SideEffectPredictor
+    }
+    return factories[name]()
+
+class ModelRegistry:
+    """Process-wide, lazily loaded model instances
+
+    Each model is loaded once, on first use or by warm_up(), and shared by
+    all requests. Importing this module is cheap; the ML stack is imported
+    the first time a model is loaded.
+    """
+
+    def __init__(self):
+        """Initialize an empty registry"""
+        self._models = {}
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._thread = None
+        self.state = "cold"
+        self.error = None
+        self.load_seconds = {}
+        self.warmup_seconds = None
+        self.version = None
+
+    @property
+    def ready(self):
+        return self._ready.is_set()
+
+    def get(self, name):
+        """Return a loaded model, loading it first if needed"""
+        model = self._models.get(name)
+        if model is not None:
+            return model
+        with self._lock:
+            if name not in self._models:
+                start = time.perf_counter()
+                self._models[name] = _load_model(name)
+                self.load_seconds[name] = time.perf_counter() - start
+            return self._models[name]
+
+    def warm_up(self):
+        """Load every model in MODEL_NAMES and mark the registry ready
+
+        Returns:
+            True if all models loaded
+        """
+        self.state = "warming"
+        start = time.perf_counter()
+        self.version = model_version()
+        try:
+            for name in MODEL_NAMES:
+                self.get(name)
+        except Exception as e:
+            self.state = "failed"
+            self.error = f"{type(e).__name__}: {e}"
+            print(f"Model warm-up failed: {self.error}")
+            return False
+        self.warmup_seconds = time.perf_counter() - start
+        self.state = "ready"
+        self._ready.set()
+        print(f"Models warmed up in {self.warmup_seconds:.2f}s")
+        return True
+
+    def start_warm_up(self):
+        """Warm up in a background thread
+
+        With EVODOC_WARMUP=0 nothing is loaded and the registry reports ready
+        straight away; models then load on first use.
+        """
+        if self._thread is not None or self.ready:
+            return None
+        if os.getenv(WARMUP_ENV, "1") == "0":
+            self.state = "lazy"
+            self._ready.set()
+            return None
+        self._thread = threading.Thread(target=self.warm_up, name="model-warm-up", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def reload(self):
+        """Load a fresh copy of every model from disk and swap them in together
+
+        Requests keep using the old models until the swap. Used to pick up a
+        new model version without restarting the process.
+
+        Returns:
+            The new model version
+        """
+        version = model_version()
+        start = time.perf_counter()
+        models, load_seconds = {}, {}
+        for name in MODEL_NAMES:
+            model_start = time.perf_counter()
+            models[name] = _load_model(name)
+            load_seconds[name] = time.perf_counter() - model_start
+        with self._lock:
+            self._models = models
+            self.load_seconds = load_seconds
+            self.version = version
+            self.state = "ready"
+            self.error = None
+        self._ready.set()
+        print(f"Models reloaded (version {version}) in {time.perf_counter() - start:.2f}s")
+        return version
+
+    def wait_ready(self, timeout=None):
+        """Block until warm-up has finished; returns whether the registry is ready"""
+        return self._ready.wait(timeout)
+
+    def status(self):
+        """Readiness details for the health endpoint"""
+        return {
+            "state": self.state,
+            "version": self.version,
+            "pid": os.getpid(),
+            "models": sorted(self._models),
+            "load_seconds": {name: round(seconds, 3) for name, seconds in self.load_seconds.items()},
+            "warmup_seconds": round(self.warmup_seconds, 3) if self.warmup_seconds is not None else None,
+            "error": self.error
+        }
+
+REGISTRY = ModelRegistry()
@@ -0,0 +1,139 @@
+import os
+import html
+import time
+import base64
+import numpy as np
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+# Report settings
+REPORT_FILE = "report.html"
+MAX_WORKERS = 4
+
+# review1/report.py is the evaluation report of the standalone review1 scripts,
+# which cannot import this package; this one only draws what training produces:
+# every candidate model scored on one shared test split.
+
+def plot_pred_vs_actual(ax, y_true, y_pred, title, limits=(0.0, 1.0)):
+    """Scatter of predicted against actual effectiveness"""
+    ax.scatter(y_true, y_pred, alpha=0.5)
+    ax.plot(limits, limits, 'r--')
+    ax.set_xlim(limits)
+    ax.set_ylim(limits)
+    ax.set_xlabel('Actual Effectiveness')
+    ax.set_ylabel('Predicted Effectiveness')
+    ax.set_title(title)
+
+PLOTTERS = {
+    "pred_vs_actual": plot_pred_vs_actual
+}
+
+def figure(kind, filename, caption, figsize=(10, 6), **data):
+    """Describe one figure to render
+
+    Args:
+        kind: Key of PLOTTERS
+        filename: PNG file name inside the report directory
+        caption: Caption shown in the report
+        figsize: Matplotlib figure size
+        **data: Arrays passed to the plotter
+
+    Returns:
+        Plain dictionary that can be sent to a worker process
+    """
+    if kind not in PLOTTERS:
+        raise ValueError(f"Unknown figure type: {kind}")
+    return {"kind": kind, "file": filename, "caption": caption, "figsize": figsize, "data": data}
+
+def model_figures(y_true, predictions, suffix):
+    """Describe one predicted-vs-actual figure per candidate model
+
+    All candidates are scored on the same test split, so the figures share
+    axis limits and can be compared side by side in the report.
+
+    Args:
+        y_true: Test targets
+        predictions: Dictionary of model name -> predictions on the test split
+        suffix: Model family used in the file names, e.g. "recommendation"
+
+    Returns:
+        List of figure() descriptions
+    """
+    values = np.concatenate([np.asarray(y_true)] + [np.asarray(y_pred) for y_pred in predictions.values()])
+    limits = (min(0.0, float(values.min())), max(1.0, float(values.max())))
+    return [
+        figure("pred_vs_actual", f"{name}_{suffix}_pred_vs_actual.png", f"{name}: predicted vs actual",
+               y_true=np.asarray(y_true), y_pred=np.asarray(y_pred),
+               title=f'{name} - Predicted vs Actual Effectiveness', limits=limits)
+        for name, y_pred in predictions.items()
+    ]
+
+def render_figure(spec, output_dir):
+    """Draw one figure with the Agg backend, save it and close it
+
+    Args:
+        spec: Figure description from figure()
+        output_dir: Directory for the PNG file
+
+    Returns:
+        Tuple of (file name, seconds)
+    """
+    start = time.perf_counter()
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=spec["figsize"])
+    try:
+        PLOTTERS[spec["kind"]](ax, **spec["data"])
+        fig.savefig(os.path.join(output_dir, spec["file"]))
+    finally:
+        plt.close(fig)
+    return spec["file"], time.perf_counter() - start
+
+def write_report(figures, tables, title, output_dir, max_workers=MAX_WORKERS):
+    """Render figures in a process pool and write a self-contained HTML report
+
+    Args:
+        figures: List of figure() descriptions
+        tables: Dictionary of section title -> DataFrame
+        title: Report title
+        output_dir: Directory for the PNG files and the report
+        max_workers: Worker processes (1 renders in this process)
+
+    Returns:
+        Path of the HTML report
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    start = time.perf_counter()
+
+    if max_workers <= 1 or len(figures) <= 1:
+        rendered = [render_figure(spec, output_dir) for spec in figures]
+    else:
+        # Set before the pool starts so the workers import matplotlib headless
+        os.environ.setdefault("MPLBACKEND", "Agg")
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(figures))) as pool:
+            rendered = list(pool.map(render_figure, figures, [output_dir] * len(figures)))
+
+    sections = [f"<h1>{html.escape(title)}</h1>",
+                f"<p>Generated {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>"]
+    for heading, table in tables.items():
+        sections.append(f"<h2>{html.escape(heading)}</h2>")
+        sections.append(table.to_html(index=False, float_format=lambda value: f"{value:.4f}"))
+    for spec in figures:
+        with open(os.path.join(output_dir, spec["file"]), "rb") as f:
+            encoded = base64.b64encode(f.read()).decode("ascii")
+        caption = html.escape(spec["caption"])
+        sections.append(f'<figure><img src="data:image/png;base64,{encoded}" alt="{caption}">'
+                        f'<figcaption>{caption}</figcaption></figure>')
+
+    report_path = os.path.join(output_dir, REPORT_FILE)
+    with open(report_path, "w") as f:
+        f.write("<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\">"
+                f"<title>{html.escape(title)}</title>"
+                "<style>body{font-family:sans-serif;margin:2em}table{border-collapse:collapse}"
+                "td,th{border:1px solid #ccc;padding:4px 8px}img{max-width:100%}</style>"
+                "</head><body>\n" + "\n".join(sections) + "\n</body></html>\n")
+
+    print(f"Rendered {len(rendered)} figures in {time.perf_counter() - start:.2f}s; report saved to {report_path}")
+    return report_path
@@ -1,14 +1,20 @@
 import os
+import sys
+import copy
+import json
+import time
 import numpy as np
 import pandas as pd
 import pickle
+from datetime import datetime
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
 from sklearn.linear_model import LinearRegression
 import xgboost as xgb
 from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
-import matplotlib.pyplot as plt
-from .features import prepare_training_data
+from .features import prepare_training_data, build_feature_matrix, PatientFeatureExtractor
+from .export import export_all
+from .report import model_figures, write_report
 
 # Paths
 DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "data")
@@ -16,9 +22,28 @@ MODEL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file_
 SYNTHETIC_DIR = os.path.join(DATA_DIR, "synthetic")
 TRAINED_DIR = os.path.join(MODEL_DIR, "trained")
 EVAL_DIR = os.path.join(MODEL_DIR, "evaluation")
+FEATURE_DIR = os.path.join(MODEL_DIR, "feature_extractors")
+WATERMARK_PATH = os.path.join(TRAINED_DIR, "recommendation_watermark.json")
 
-def train_treatment_recommendation_model():
-    """Train treatment recommendation model"""
+# Incremental training settings
+DEFAULT_EXTRA_TREES = 50
+MIN_INCREMENTAL_ROWS = 20
+# Model names used by the full training, by estimator class
+MODEL_NAMES = {
+    'RandomForestRegressor': 'random_forest',
+    'GradientBoostingRegressor': 'gradient_boosting',
+    'XGBRegressor': 'xgboost',
+    'LinearRegression': 'linear_regression'
+}
+WARM_START_MODELS = ['random_forest', 'gradient_boosting', 'xgboost']
+INCREMENTAL_COLUMNS = ['published', 'reason', 'model', 'rows', 'current_mse', 'candidate_mse', 'version', 'seconds']
+
+def train_treatment_recommendation_model(report=True):
+    """Train treatment recommendation model
+    
+    Args:
+        report: Render the prediction plots and the HTML report after training
+    """
     print("Training treatment recommendation model...")
     
     # Prepare data
@@ -48,6 +73,7 @@ def train_treatment_recommendation_model():
     }
     
     results = []
+    predictions = {}
     
     for name, model in models.items():
         print(f"Training {name}...")
@@ -75,15 +101,8 @@ def train_treatment_recommendation_model():
         with open(os.path.join(TRAINED_DIR, f"{name}_recommendation.pkl"), 'wb') as f:
             pickle.dump(model, f)
             
-        # Plot predictions vs actual
-        plt.figure(figsize=(10, 6))
-        plt.scatter(y_test, y_pred, alpha=0.5)
-        plt.plot([0, 1], [0, 1], 'r--')
-        plt.xlabel('Actual Effectiveness')
-        plt.ylabel('Predicted Effectiveness')
-        plt.title(f'{name} - Predicted vs Actual Effectiveness')
-        plt.savefig(os.path.join(EVAL_DIR, f"{name}_recommendation_pred_vs_actual.png"))
-        plt.close()
+        # Keep predictions for the predicted vs actual plots (drawn by the reporting stage)
+        predictions[name] = y_pred
     
     # Save evaluation results
     results_df = pd.DataFrame(results)
@@ -102,8 +121,26 @@ def train_treatment_recommendation_model():
     with open(os.path.join(TRAINED_DIR, "best_recommendation_model_type.txt"), 'w') as f:
         f.write(best_model_name)
     
+    # Record which feedback the model has seen so incremental runs start after it
+    feedbacks_df = pd.read_csv(os.path.join(SYNTHETIC_DIR, "treatment_feedbacks.csv"))
+    previous = load_watermark()
+    save_watermark({
+        'version': previous['version'] + 1,
+        'model_type': best_model_name,
+        'created_at': pd.to_datetime(feedbacks_df['created_at'], format='ISO8601').max().isoformat(),
+        'feedback_id': int(feedbacks_df['id'].max()),
+        'trained_at': datetime.utcnow().isoformat(),
+        'mode': 'full'
+    })
+    
     print(f"Best model: {best_model_name}")
     print("Treatment recommendation model trained successfully!")
+    
+    # Reporting stage: figures are drawn headless in worker processes
+    if report:
+        write_report(model_figures(y_test, predictions, "recommendation"), {"Recommendation models": results_df},
+                     "Treatment Recommendation Models", EVAL_DIR)
+    
     return best_model
 
 def train_side_effect_prediction_model():
@@ -129,7 +166,7 @@ def train_side_effect_prediction_model():
     
     # One-hot encode medication names
     medication_encoder = OneHotEncoder(sparse_output=False)
-    medication_encoded = medication_encoder.fit_transform(side_effect_data[['name']])
+    medication_encoded = medication_encoder.fit_transform(side_effect_data[['name_med']])
     
     # Create features and targets
     X = medication_encoded
@@ -192,15 +229,278 @@ def train_side_effect_prediction_model():
     print("Side effect prediction models trained successfully!")
     return severity_model, frequency_model
 
+def load_watermark():
+    """Load the feedback watermark of the current recommendation model
+    
+    Returns:
+        Dictionary with version, model_type, created_at and feedback_id
+    """
+    if not os.path.exists(WATERMARK_PATH):
+        return {'version': 0, 'model_type': None, 'created_at': None, 'feedback_id': 0}
+    
+    with open(WATERMARK_PATH, 'r') as f:
+        return json.load(f)
+
+def save_watermark(watermark):
+    """Save the feedback watermark of the published recommendation model
+    
+    Args:
+        watermark: Dictionary with version, model_type, created_at and feedback_id
+    """
+    os.makedirs(TRAINED_DIR, exist_ok=True)
+    with open(WATERMARK_PATH, 'w') as f:
+        json.dump(watermark, f, indent=2)
+
+def load_feedback_since(watermark, db=None):
+    """Load treatment feedback created after the watermark from the database
+    
+    Args:
+        watermark: Watermark dictionary from load_watermark
+        db: SQLAlchemy session (a new one is opened if not given)
+    
+    Returns:
+        DataFrame with feedback_id, created_at, age, gender, symptoms, name
+        and effectiveness columns, ordered by creation time
+    """
+    from sqlalchemy import or_, and_
+    from ..db.config import SessionLocal
+    from ..db.models import TreatmentFeedback, Treatment, Appointment, Medication, Patient
+    
+    close_db = db is None
+    db = db or SessionLocal()
+    
+    try:
+        query = db.query(
+            TreatmentFeedback.id.label('feedback_id'),
+            TreatmentFeedback.created_at,
+            TreatmentFeedback.effectiveness,
+            Patient.age,
+            Patient.gender,
+            Appointment.symptoms,
+            Medication.name
+        ).join(
+            Treatment, TreatmentFeedback.treatment_id == Treatment.id
+        ).join(
+            Appointment, Treatment.appointment_id == Appointment.id
+        ).join(
+            Medication, Treatment.medication_id == Medication.id
+        ).join(
+            Patient, Appointment.patient_id == Patient.id
+        ).filter(
+            TreatmentFeedback.effectiveness.isnot(None)
+        )
+        
+        # Only feedback after the watermark (ties on created_at are broken by id)
+        if watermark.get('created_at'):
+            watermark_time = datetime.fromisoformat(watermark['created_at'])
+            query = query.filter(or_(
+                TreatmentFeedback.created_at > watermark_time,
+                and_(
+                    TreatmentFeedback.created_at == watermark_time,
+                    TreatmentFeedback.id > watermark.get('feedback_id', 0)
+                )
+            ))
+        
+        query = query.order_by(TreatmentFeedback.created_at, TreatmentFeedback.id)
+        rows = query.all()
+    finally:
+        if close_db:
+            db.close()
+    
+    return pd.DataFrame(rows, columns=['feedback_id', 'created_at', 'effectiveness', 'age', 'gender', 'symptoms', 'name'])
+
+def warm_start_model(model, X, y, extra_trees=DEFAULT_EXTRA_TREES):
+    """Continue training a tree ensemble with additional trees
+    
+    Args:
+        model: Fitted XGBRegressor, GradientBoostingRegressor or RandomForestRegressor
+        X: New feature matrix
+        y: New targets
+        extra_trees: Number of trees to add
+    
+    Returns:
+        New model with the original trees plus extra_trees fitted on X, y
+    """
+    if isinstance(model, xgb.XGBRegressor):
+        # Boost from the existing booster
+        candidate = xgb.XGBRegressor(**model.get_params())
+        candidate.set_params(n_estimators=extra_trees)
+        candidate.fit(X, y, xgb_model=model.get_booster())
+        return candidate
+    
+    if isinstance(model, (GradientBoostingRegressor, RandomForestRegressor)):
+        candidate = copy.deepcopy(model)
+        candidate.set_params(warm_start=True, n_estimators=model.n_estimators + extra_trees)
+        candidate.fit(X, y)
+        return candidate
+    
+    raise ValueError(f"{type(model).__name__} does not support warm-start training")
+
+def load_warm_start_base(current_model):
+    """Pick the model to warm-start from
+    
+    The published model is used if it is a tree ensemble. Otherwise (the full
+    training picked linear_regression) the best tree model of the last full
+    training is used, and the candidate still has to beat the published model.
+    
+    Args:
+        current_model: Published recommendation model
+    
+    Returns:
+        Tuple of (model name, fitted model), or (None, None) if no tree model exists
+    """
+    name = MODEL_NAMES.get(type(current_model).__name__)
+    if name in WARM_START_MODELS:
+        return name, current_model
+    
+    results_path = os.path.join(EVAL_DIR, "recommendation_model_results.csv")
+    if not os.path.exists(results_path):
+        return None, None
+    results_df = pd.read_csv(results_path)
+    results_df = results_df[results_df['model'].isin(WARM_START_MODELS)]
+    for name in results_df.sort_values('r2', ascending=False)['model']:
+        model_path = os.path.join(TRAINED_DIR, f"{name}_recommendation.pkl")
+        if os.path.exists(model_path):
+            with open(model_path, 'rb') as f:
+                return name, pickle.load(f)
+    return None, None
+
+def record_incremental(result):
+    """Append the outcome of an incremental run to the history CSV"""
+    os.makedirs(EVAL_DIR, exist_ok=True)
+    history_path = os.path.join(EVAL_DIR, "incremental_results.csv")
+    if os.path.exists(history_path):
+        history = pd.read_csv(history_path)
+        if list(history.columns) != INCREMENTAL_COLUMNS:
+            # Older history files have no reason/model columns
+            history.reindex(columns=INCREMENTAL_COLUMNS).to_csv(history_path, index=False)
+    pd.DataFrame([result]).reindex(columns=INCREMENTAL_COLUMNS).to_csv(
+        history_path, mode='a', header=not os.path.exists(history_path), index=False
+    )
+    return result
+
+def train_incremental(extra_trees=DEFAULT_EXTRA_TREES, db=None):
+    """Warm-start the recommendation model on feedback since the last watermark
+    
+    The new feedback is split into a training part and a holdout. The warm-started
+    candidate is published as a new version only if it beats the current model
+    on the holdout. Every run, including skipped ones, is appended to
+    incremental_results.csv.
+    
+    Args:
+        extra_trees: Number of trees to add to the current model
+        db: SQLAlchemy session (optional)
+    
+    Returns:
+        Dictionary with the outcome of the run
+    """
+    print("Incrementally training treatment recommendation model...")
+    start_time = time.time()
+    
+    watermark = load_watermark()
+    best_model_path = os.path.join(TRAINED_DIR, "best_recommendation_model.pkl")
+    if watermark['version'] == 0 or not os.path.exists(best_model_path):
+        print("No published model found. Run a full training first.")
+        return record_incremental({'published': False, 'reason': 'no_model', 'version': watermark['version']})
+    
+    # Pull new feedback
+    feedback = load_feedback_since(watermark, db)
+    print(f"Found {len(feedback)} feedback rows since {watermark.get('created_at')}")
+    if len(feedback) < MIN_INCREMENTAL_ROWS:
+        print(f"Need at least {MIN_INCREMENTAL_ROWS} new feedback rows. Skipping.")
+        return record_incremental({'published': False, 'reason': 'not_enough_feedback', 'rows': len(feedback),
+                                   'version': watermark['version']})
+    
+    # Build features with the published extractor so the feature space is unchanged
+    extractor = PatientFeatureExtractor(load_from=os.path.join(FEATURE_DIR, "patient_feature_extractor.pkl"))
+    X, y = build_feature_matrix(extractor, feedback)
+    X_train, X_holdout, y_train, y_holdout = train_test_split(
+        X, y, test_size=0.2, random_state=42
+    )
+    
+    with open(best_model_path, 'rb') as f:
+        current_model = pickle.load(f)
+    
+    base_name, base_model = load_warm_start_base(current_model)
+    if base_model is None:
+        print(f"No tree model to warm-start from {type(current_model).__name__}. Run a full training instead.")
+        return record_incremental({'published': False, 'reason': 'unsupported_model', 'rows': len(feedback),
+                                   'version': watermark['version']})
+    print(f"Warm-starting {base_name}")
+    candidate = warm_start_model(base_model, X_train, y_train, extra_trees)
+    
+    # Compare on the holdout
+    current_mse = mean_squared_error(y_holdout, current_model.predict(X_holdout))
+    candidate_mse = mean_squared_error(y_holdout, candidate.predict(X_holdout))
+    published = candidate_mse < current_mse
+    
+    print(f"Holdout MSE - current: {current_mse:.4f}, candidate: {candidate_mse:.4f}")
+    
+    result = {
+        'published': published,
+        'reason': 'improved' if published else 'not_improved',
+        'model': base_name,
+        'rows': len(feedback),
+        'current_mse': current_mse,
+        'candidate_mse': candidate_mse,
+        'version': watermark['version'],
+        'seconds': None
+    }
+    
+    if published:
+        version = watermark['version'] + 1
+        
+        # Keep every published version and point the best model at the new one.
+        # The best model is replaced by a rename so a concurrent load never
+        # reads a partly written pickle.
+        with open(os.path.join(TRAINED_DIR, f"best_recommendation_model.v{version}.pkl"), 'wb') as f:
+            pickle.dump(candidate, f)
+        with open(f"{best_model_path}.tmp", 'wb') as f:
+            pickle.dump(candidate, f)
+        os.replace(f"{best_model_path}.tmp", best_model_path)
+        with open(os.path.join(TRAINED_DIR, "best_recommendation_model_type.txt"), 'w') as f:
+            f.write(base_name)
+        
+        last = feedback.iloc[-1]
+        save_watermark({
+            'version': version,
+            'model_type': base_name,
+            'created_at': pd.Timestamp(last['created_at']).isoformat(),
+            'feedback_id': int(last['feedback_id']),
+            'trained_at': datetime.utcnow().isoformat(),
+            'mode': 'incremental'
+        })
+        result['version'] = version
+        print(f"Published recommendation model version {version}")
+        
+        # Keep the pickle-free serving export in sync with the published model
+        export_all()
+    else:
+        print("Candidate did not beat the current model. Keeping the current version.")
+    
+    result['seconds'] = time.time() - start_time
+    print(f"Incremental training finished in {result['seconds']:.2f} seconds")
+    
+    # Keep a history of incremental runs
+    return record_incremental(result)
+
 def main():
     """Train all models"""
     os.makedirs(TRAINED_DIR, exist_ok=True)
     os.makedirs(EVAL_DIR, exist_ok=True)
     
-    # Train models
-    treatment_model = train_treatment_recommendation_model()
+    # Warm-start from new feedback instead of a full rebuild
+    if "--incremental" in sys.argv:
+        train_incremental()
+        return
+    
+    # Train models (--no-report skips the plots and the HTML report)
+    treatment_model = train_treatment_recommendation_model(report="--no-report" not in sys.argv)
     severity_model, frequency_model = train_side_effect_prediction_model()
     
+    # Export pickle-free copies for fast cold starts
+    export_all()
+    
     print("All models trained successfully!")
 
 if __name__ == "__main__":
@@ -0,0 +1,88 @@
+import math
+import bisect
+import threading
+
+# Histogram buckets in seconds
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+def _format_bound(bound):
+    return "+Inf" if math.isinf(bound) else repr(float(bound))
+
+class Histogram:
+    """Cumulative histogram with labels, rendered in the Prometheus text format"""
+
+    def __init__(self, name, documentation, label_names=(), buckets=DEFAULT_BUCKETS):
+        """Initialize histogram
+
+        Args:
+            name: Metric name
+            documentation: HELP text
+            label_names: Names of the labels passed to observe()
+            buckets: Upper bounds in ascending order (+Inf is added)
+        """
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        """Record one observation"""
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            series["counts"][bisect.bisect_left(self.buckets, value)] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def collect(self):
+        """Prometheus exposition lines for this histogram"""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {key: {"counts": list(s["counts"]), "sum": s["sum"], "count": s["count"]}
+                      for key, s in self._series.items()}
+        for key in sorted(series):
+            labels = list(zip(self.label_names, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets, series[key]["counts"]):
+                cumulative += count
+                bucket_labels = _format_labels(labels + [("le", _format_bound(bound))])
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {series[key]['sum']!r}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {series[key]['count']}")
+        return lines
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+REQUEST_SECONDS = Histogram(
+    "evodoc_http_request_duration_seconds",
+    "Time spent handling HTTP requests",
+    ("method", "route", "status")
+)
+STAGE_SECONDS = Histogram(
+    "evodoc_stage_duration_seconds",
+    "Time spent in each request stage (summed per request)",
+    ("stage",)
+)
+REGISTRY = [REQUEST_SECONDS, STAGE_SECONDS]
+
+def render_metrics(registry=REGISTRY):
+    """Render all metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in registry:
+        lines.extend(metric.collect())
+    return "\n".join(lines) + "\n"
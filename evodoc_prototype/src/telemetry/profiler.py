@@ -0,0 +1,214 @@
+import os
+import re
+import sys
+import time
+import random
+import asyncio
+import functools
+import threading
+from collections import Counter
+from contextvars import ContextVar
+
+# Settings (a rate of 0 disables profiling)
+SAMPLE_RATE_ENV = "EVODOC_PROFILE_RATE"
+INTERVAL_ENV = "EVODOC_PROFILE_INTERVAL_MS"
+PROFILE_DIR_ENV = "EVODOC_PROFILE_DIR"
+DEFAULT_INTERVAL_MS = 5.0
+PROFILE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "models", "profiles")
+MAX_STACK_DEPTH = 128
+
+def _frame_name(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+def collapse_stack(frame, limit=MAX_STACK_DEPTH):
+    """Collapse a frame and its callers to 'root;...;leaf' (one entry per function)"""
+    names = []
+    while frame is not None and len(names) < limit:
+        names.append(_frame_name(frame.f_code))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+# backend/core/profiling.py is the Django backend's copy of this sampler,
+# wired in as middleware. The backend is a separate deployment that does not
+# have this package on its path, so fixes to sampling belong in both files.
+class SamplingProfiler:
+    """Statistical profiler for a sampled fraction of requests
+
+    A background thread wakes every ``interval_ms`` while at least one sampled
+    request is in flight, reads the stacks of the threads serving those
+    requests from sys._current_frames() and counts collapsed stacks. Samples
+    are aggregated per endpoint when the request ends, so the profile can be
+    written as one collapsed-stack (flamegraph.pl / speedscope) file per
+    endpoint.
+
+    Only the thread serving a sampled request is read. Threaded servers
+    pass its ID to begin(); in ASGI apps, where a sync endpoint runs on a
+    threadpool worker, the endpoint is wrapped with profile_thread() and
+    attaches its worker thread to the request when it starts running.
+    """
+
+    def __init__(self, sample_rate=0.0, interval_ms=DEFAULT_INTERVAL_MS, output_dir=PROFILE_DIR):
+        """Initialize profiler
+
+        Args:
+            sample_rate: Fraction of requests to profile (0 disables)
+            interval_ms: Milliseconds between stack samples
+            output_dir: Directory for dump() files
+        """
+        self.sample_rate = sample_rate
+        self.interval = interval_ms / 1000.0
+        self.output_dir = output_dir
+        self.profiles = {}
+        self.requests = Counter()
+        self._active = {}
+        self._next_token = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    @property
+    def enabled(self):
+        return self.sample_rate > 0
+
+    def should_sample(self):
+        """Decide whether to profile the next request"""
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def begin(self, thread_id=None):
+        """Start profiling a request
+
+        Args:
+            thread_id: Thread serving the request (None until attach())
+
+        Returns:
+            Token to pass to attach() and end()
+        """
+        with self._lock:
+            self._next_token += 1
+            token = self._next_token
+            self._active[token] = {"thread_id": thread_id, "stacks": Counter()}
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+                self._thread.start()
+            self._wake.set()
+        return token
+
+    def attach(self, token, thread_id):
+        """Set (or with None, clear) the thread serving a profiled request"""
+        with self._lock:
+            entry = self._active.get(token)
+            if entry is not None:
+                entry["thread_id"] = thread_id
+
+    def end(self, token, endpoint):
+        """Stop profiling a request and add its samples to the endpoint's profile"""
+        with self._lock:
+            entry = self._active.pop(token, None)
+            if not self._active:
+                self._wake.clear()
+            if entry is None:
+                return
+            self.requests[endpoint] += 1
+            self.profiles.setdefault(endpoint, Counter()).update(entry["stacks"])
+
+    def _sample(self):
+        frames = sys._current_frames()
+        with self._lock:
+            for entry in self._active.values():
+                frame = frames.get(entry["thread_id"]) if entry["thread_id"] is not None else None
+                if frame is not None:
+                    entry["stacks"][collapse_stack(frame)] += 1
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            self._sample()
+            time.sleep(self.interval)
+
+    def collapsed(self, endpoint=None):
+        """Collapsed-stack text per endpoint
+
+        Returns:
+            Dictionary of endpoint -> 'stack count' lines
+        """
+        with self._lock:
+            profiles = {name: Counter(stacks) for name, stacks in self.profiles.items()
+                        if endpoint is None or name == endpoint}
+        return {name: "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+                for name, stacks in profiles.items()}
+
+    def dump(self, output_dir=None, endpoint=None):
+        """Write one <endpoint>.collapsed file per endpoint
+
+        Returns:
+            List of file paths
+        """
+        output_dir = output_dir or self.output_dir
+        os.makedirs(output_dir, exist_ok=True)
+        paths = []
+        for name, text in self.collapsed(endpoint).items():
+            path = os.path.join(output_dir, f"{re.sub(r'[^A-Za-z0-9]+', '_', name).strip('_') or 'root'}.collapsed")
+            with open(path, "w") as f:
+                f.write(text)
+            paths.append(path)
+        return paths
+
+    def combined(self, endpoint=None):
+        """All endpoints in one collapsed-stack text, each rooted at its endpoint name"""
+        return "".join(f"{name};{line}\n" for name, text in self.collapsed(endpoint).items()
+                       for line in text.splitlines())
+
+    def summary(self):
+        """Sampled request and stack sample counts per endpoint"""
+        with self._lock:
+            return {name: {"requests": self.requests[name], "samples": sum(stacks.values())}
+                    for name, stacks in self.profiles.items()}
+
+    def reset(self):
+        """Discard the aggregated profiles"""
+        with self._lock:
+            self.profiles.clear()
+            self.requests.clear()
+
+# (profiler, token) of the sampled request being handled, if any
+_current_request = ContextVar("profiled_request", default=None)
+
+def set_current_request(profiler, token):
+    """Mark the current context as serving a profiled request; returns a reset token"""
+    return _current_request.set((profiler, token))
+
+def reset_current_request(context_token):
+    _current_request.reset(context_token)
+
+def profile_thread(func):
+    """Wrap a sync endpoint so a sampled request is attached to the thread running it
+
+    The request context (and so the token) is copied into the threadpool
+    worker. Async endpoints share the event loop thread with every other
+    request, so they are returned unwrapped and not sampled.
+    """
+    if asyncio.iscoroutinefunction(func):
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        current = _current_request.get()
+        if current is None:
+            return func(*args, **kwargs)
+        profiler, token = current
+        profiler.attach(token, threading.get_ident())
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profiler.attach(token, None)
+    return wrapper
+
+def profiler_from_env():
+    """Build the profiler from EVODOC_PROFILE_RATE / _INTERVAL_MS / _DIR"""
+    return SamplingProfiler(
+        sample_rate=float(os.getenv(SAMPLE_RATE_ENV, "0")),
+        interval_ms=float(os.getenv(INTERVAL_ENV, DEFAULT_INTERVAL_MS)),
+        output_dir=os.getenv(PROFILE_DIR_ENV, PROFILE_DIR)
+    )
+
+PROFILER = profiler_from_env()
@@ -0,0 +1,223 @@
+import os
+import json
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+from .metrics import STAGE_SECONDS
+
+# Settings
+TRACE_FILE_ENV = "EVODOC_TRACE_FILE"
+SERVICE_NAME = "evodoc-api"
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+# Trace of the request being handled. The value is a mutable Trace, so spans
+# recorded in threadpool workers (which run in a copy of the context) land in
+# the same trace as the middleware that started it.
+_current_trace = contextvars.ContextVar("evodoc_trace", default=None)
+_current_span = contextvars.ContextVar("evodoc_span", default=None)
+
+def _new_id(n_bytes):
+    return os.urandom(n_bytes).hex()
+
+class Trace:
+    """Spans and per-stage durations collected for one request"""
+
+    def __init__(self, trace_id=None, parent_span_id=None):
+        """Initialize trace
+
+        Args:
+            trace_id: 32 hex digit trace ID to continue (default: new ID)
+            parent_span_id: Span ID of the remote caller, if any
+        """
+        self.trace_id = trace_id or _new_id(16)
+        self.parent_span_id = parent_span_id
+        self.spans = []
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def add_stage(self, stage, seconds):
+        """Add time spent in a stage (a stage may be entered many times)"""
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def add_span(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+def parse_traceparent(header):
+    """Parse a W3C traceparent header
+
+    Returns:
+        (trace_id, parent_span_id), or (None, None) if the header is invalid
+    """
+    parts = (header or "").strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None, None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None, None
+    if set(parts[1]) == {"0"} or set(parts[2]) == {"0"}:
+        return None, None
+    return parts[1], parts[2]
+
+def start_trace(traceparent=None):
+    """Start collecting spans for the current request
+
+    Returns:
+        (trace, token); pass the token to end_trace()
+    """
+    trace = Trace(*parse_traceparent(traceparent))
+    return trace, _current_trace.set(trace)
+
+def end_trace(token):
+    """Stop collecting, record the stage histograms and export the spans"""
+    trace = _current_trace.get()
+    _current_trace.reset(token)
+    if trace is None:
+        return None
+    for stage, seconds in trace.stages.items():
+        STAGE_SECONDS.observe(seconds, stage=stage)
+    if EXPORTER is not None and trace.spans:
+        EXPORTER.export(trace)
+    return trace
+
+def current_trace():
+    """Trace of the request being handled, or None outside a request"""
+    return _current_trace.get()
+
+@contextmanager
+def span(name, kind=SPAN_KIND_INTERNAL, **attributes):
+    """Time a block as a span and as a stage of the current trace
+
+    Outside a traced request this does nothing, so library code can be
+    instrumented unconditionally.
+
+    Args:
+        name: Span and stage name
+        kind: OpenTelemetry span kind
+        **attributes: Span attributes
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+
+    parent = _current_span.get()
+    record = {
+        "spanId": _new_id(8),
+        "parentSpanId": parent["spanId"] if parent else trace.parent_span_id,
+        "name": name,
+        "kind": kind,
+        "startTimeUnixNano": time.time_ns(),
+        "attributes": dict(attributes),
+        "status": STATUS_OK
+    }
+    token = _current_span.set(record)
+    start = time.perf_counter_ns()
+    try:
+        yield record
+    except BaseException:
+        record["status"] = STATUS_ERROR
+        raise
+    finally:
+        elapsed = time.perf_counter_ns() - start
+        _current_span.reset(token)
+        record["endTimeUnixNano"] = record["startTimeUnixNano"] + elapsed
+        trace.add_span(record)
+        if kind != SPAN_KIND_SERVER:
+            trace.add_stage(name, elapsed / 1e9)
+
+@contextmanager
+def stage(name):
+    """Add the time spent in a block to a stage without recording a span
+
+    For code inside loops, where one span per iteration would swamp the
+    trace; the stage total still shows up in Server-Timing and /metrics.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add_stage(name, time.perf_counter() - start)
+
+def _attribute(key, value):
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+def to_otlp(trace, service_name=SERVICE_NAME):
+    """Convert a trace to an OTLP/JSON ExportTraceServiceRequest"""
+    spans = []
+    for record in trace.spans:
+        otlp_span = {
+            "traceId": trace.trace_id,
+            "spanId": record["spanId"],
+            "name": record["name"],
+            "kind": record["kind"],
+            "startTimeUnixNano": str(record["startTimeUnixNano"]),
+            "endTimeUnixNano": str(record["endTimeUnixNano"]),
+            "attributes": [_attribute(key, value) for key, value in record["attributes"].items()],
+            "status": {"code": record["status"]}
+        }
+        if record["parentSpanId"]:
+            otlp_span["parentSpanId"] = record["parentSpanId"]
+        spans.append(otlp_span)
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [_attribute("service.name", service_name)]},
+            "scopeSpans": [{"scope": {"name": "evodoc.telemetry"}, "spans": spans}]
+        }]
+    }
+
+class FileSpanExporter:
+    """Append traces to a file as OTLP/JSON lines
+
+    This is the format the OpenTelemetry Collector's file exporter writes and
+    its otlpjsonfile receiver reads, so the file can be replayed into any
+    OTLP backend.
+    """
+
+    def __init__(self, path, service_name=SERVICE_NAME):
+        """Initialize exporter
+
+        Args:
+            path: File to append to
+            service_name: service.name resource attribute
+        """
+        self.path = path
+        self.service_name = service_name
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+    def export(self, trace):
+        line = json.dumps(to_otlp(trace, self.service_name), separators=(",", ":"))
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(line + "\n")
+
+def configure_exporter(path=None):
+    """Set the span exporter; defaults to $EVODOC_TRACE_FILE (unset disables export)"""
+    global EXPORTER
+    path = path or os.getenv(TRACE_FILE_ENV)
+    EXPORTER = FileSpanExporter(path) if path else None
+    return EXPORTER
+
+EXPORTER = None
+configure_exporter()
@@ -0,0 +1,179 @@
+import sys
+import time
+import bisect
+import numpy as np
+import pandas as pd
+
+# Separator between texts in the search corpus (never part of an allergy name)
+SEPARATOR = "\x00"
+
+class TextCorpus:
+    """Lowercased texts joined into one string, each owned by a medication
+
+    A substring search over the joined string finds every text containing the
+    needle in a single C-level scan; match offsets are mapped back to their
+    owning medication with a binary search over the text start offsets.
+    """
+
+    def __init__(self, owners, texts):
+        self.owners = []
+        self.starts = []
+        parts = []
+        offset = 0
+
+        for owner, text in zip(owners, texts):
+            if not isinstance(text, str) or not text:
+                continue
+            text = text.lower().replace(SEPARATOR, " ")
+            self.owners.append(owner)
+            self.starts.append(offset)
+            parts.append(text)
+            offset += len(text) + len(SEPARATOR)
+
+        self.text = SEPARATOR.join(parts)
+
+    def owners_containing(self, needle):
+        """Return the set of owners with at least one text containing the needle"""
+        needle = needle.lower()
+        found = set()
+        if not needle or SEPARATOR in needle:
+            return found
+
+        position = self.text.find(needle)
+        while position != -1:
+            index = bisect.bisect_right(self.starts, position) - 1
+            found.add(self.owners[index])
+
+            # Skip to the next text; one hit per text is enough
+            next_index = index + 1
+            if next_index >= len(self.starts):
+                break
+            position = self.text.find(needle, self.starts[next_index])
+
+        return found
+
+class AllergenMatcher:
+    """Allergy conflict matcher compiled once from contraindications and drug ingredients
+
+    Matching keeps the semantics of the original per-pair checks: an allergy
+    conflicts with a medication when it is a case-insensitive substring of one
+    of the medication's contraindication texts, or of one of its ingredients.
+    Contraindication text takes precedence over ingredients, and allergies are
+    considered in the order given.
+    """
+
+    def __init__(self, contraindications, drugs):
+        """Build the search corpora
+
+        Args:
+            contraindications: DataFrame with medication and contraindication columns
+            drugs: Dictionary of drug name -> drug record with an ingredients list
+        """
+        self.contraindications = TextCorpus(
+            contraindications['medication'].tolist(),
+            contraindications['contraindication'].tolist()
+        )
+
+        owners, ingredients = [], []
+        for name, drug in drugs.items():
+            for ingredient in drug.get('ingredients', []) or []:
+                owners.append(name)
+                ingredients.append(ingredient)
+        self.ingredients = TextCorpus(owners, ingredients)
+
+    def conflicts(self, allergies):
+        """Find every medication that conflicts with an allergy list
+
+        Args:
+            allergies: List of allergy names
+
+        Returns:
+            Dictionary of medication -> contraindication reason
+        """
+        reasons = {}
+        for allergy in allergies:
+            if not allergy:  # Skip empty strings
+                continue
+
+            # Earlier allergies win, so only unseen medications are added
+            for medication in self.contraindications.owners_containing(allergy):
+                reasons.setdefault(medication, f"Patient is allergic to {allergy}")
+            for medication in self.ingredients.owners_containing(allergy):
+                reasons.setdefault(medication, f"Contains {allergy} or related compounds")
+
+        return reasons
+
+def naive_reason(contraindications, drugs, medication, allergies):
+    """Reference implementation of the original per-(medication, allergy) scan"""
+    for allergy in allergies:
+        if not allergy:
+            continue
+
+        contra_matches = contraindications[
+            (contraindications['medication'] == medication) &
+            (contraindications['contraindication'].str.contains(allergy, case=False, na=False, regex=False))
+        ]
+        if not contra_matches.empty:
+            return f"Patient is allergic to {allergy}"
+
+        if medication in drugs:
+            ingredients = drugs[medication].get('ingredients', [])
+            if any(allergy.lower() in ingredient.lower() for ingredient in ingredients):
+                return f"Contains {allergy} or related compounds"
+
+    return None
+
+def benchmark(n_drugs=1000, n_allergies=30, seed=42):
+    """Compare the compiled matcher against the per-pair scan on synthetic data
+
+    Args:
+        n_drugs: Number of synthetic medications
+        n_allergies: Number of allergies in the query
+        seed: Random seed
+
+    Returns:
+        Dictionary with timings for both approaches
+    """
+    rng = np.random.default_rng(seed)
+    allergens = [f"allergen{i}" for i in range(500)]
+    medications = [f"Drug{i}" for i in range(n_drugs)]
+
+    contraindications = pd.DataFrame({
+        'medication': np.repeat(medications, 3),
+        'contraindication': [f"Hypersensitivity to {allergens[j]}" for j in rng.integers(0, len(allergens), n_drugs * 3)]
+    })
+    drugs = {
+        name: {'name': name, 'ingredients': [f"{allergens[j]} salt" for j in rng.integers(0, len(allergens), 4)]}
+        for name in medications
+    }
+    allergies = [allergens[j] for j in rng.choice(len(allergens), n_allergies, replace=False)]
+
+    start = time.perf_counter()
+    matcher = AllergenMatcher(contraindications, drugs)
+    build_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    compiled = matcher.conflicts(allergies)
+    compiled_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    naive = {}
+    for medication in medications:
+        reason = naive_reason(contraindications, drugs, medication, allergies)
+        if reason is not None:
+            naive[medication] = reason
+    naive_seconds = time.perf_counter() - start
+
+    print(f"{n_drugs} drugs x {n_allergies} allergies, {len(compiled)} conflicts")
+    print(f"  Same reasons as per-pair scan: {compiled == naive}")
+    print(f"  Matcher build: {build_seconds * 1000:.1f} ms (once at startup)")
+    print(f"  Per-pair scan: {naive_seconds:.2f} s")
+    print(f"  Compiled matcher: {compiled_seconds * 1000:.2f} ms ({naive_seconds / compiled_seconds:.0f}x)")
+
+    return {'build': build_seconds, 'compiled': compiled_seconds, 'naive': naive_seconds, 'identical': compiled == naive}
+
+if __name__ == "__main__":
+    # Usage: python allergen_matcher.py [n_drugs] [n_allergies]
+    n_drugs = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    n_allergies = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    benchmark(n_drugs, n_allergies)
@@ -0,0 +1,120 @@
+import sys
+import json
+import time
+import contextlib
+import io
+import numpy as np
+import pandas as pd
+
+from train_models import DATA_DIR, enhance_training_data
+from feature_pipeline import CONDITION_GROUPS
+
+# Constants
+DEFAULT_SIZES = [10_000, 1_000_000, 10_000_000]
+MAX_ROWWISE_ROWS = 1_000_000
+
+def enhance_training_data_rowwise(data):
+    """Original row-by-row implementation, kept as the reference for the benchmark"""
+    enhanced_data = data.copy()
+
+    first_line_file = DATA_DIR / "first_line_treatments.csv"
+    if first_line_file.exists():
+        first_line_df = pd.read_csv(first_line_file)
+        first_line_map = {}
+        for _, row in first_line_df.iterrows():
+            first_line_map.setdefault(row['condition'], []).append(row['medication'])
+
+        def is_first_line(row):
+            if row['diagnosis'] in first_line_map:
+                return 1 if row['medication'] in first_line_map[row['diagnosis']] else 0
+            return 0
+
+        enhanced_data['is_first_line'] = enhanced_data.apply(is_first_line, axis=1)
+    else:
+        high_effectiveness = enhanced_data[enhanced_data['effectiveness'] >= 8]
+        first_line_map = {}
+        for _, row in high_effectiveness.iterrows():
+            first_line_map.setdefault(row['diagnosis'], set()).add(row['medication'])
+
+        enhanced_data['is_first_line'] = enhanced_data.apply(
+            lambda row: 1 if row['medication'] in first_line_map.get(row['diagnosis'], set()) else 0,
+            axis=1
+        )
+
+    if 'age_group' not in enhanced_data.columns:
+        enhanced_data['age_group'] = pd.cut(
+            enhanced_data['age'],
+            bins=[0, 18, 40, 65, 100],
+            labels=['pediatric', 'young_adult', 'middle_age', 'elderly']
+        )
+
+    med_class_file = DATA_DIR / "drugbank_sample.json"
+    if med_class_file.exists():
+        with open(med_class_file, 'r') as f:
+            drug_data = json.load(f)
+        med_class_map = {drug['name']: drug['drug_class'] for drug in drug_data.get('drugs', [])
+                         if 'name' in drug and 'drug_class' in drug}
+        enhanced_data['med_class'] = enhanced_data['medication'].map(med_class_map).fillna('Unknown')
+
+    for group, conditions in CONDITION_GROUPS.items():
+        enhanced_data[f'group_{group}'] = enhanced_data['diagnosis'].apply(
+            lambda x: 1 if x in conditions else 0)
+
+    return enhanced_data
+
+def synthetic_treatments(n_rows, seed=42):
+    """Resample treatment_data.csv to n_rows rows"""
+    base = pd.read_csv(DATA_DIR / "treatment_data.csv")
+    rng = np.random.default_rng(seed)
+    return base.iloc[rng.integers(0, len(base), n_rows)].reset_index(drop=True)
+
+def _timed(function, data):
+    """Run an enhancement function quietly and return (result, seconds)"""
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = function(data)
+    return result, time.perf_counter() - start
+
+def benchmark(sizes=DEFAULT_SIZES, max_rowwise_rows=MAX_ROWWISE_ROWS):
+    """Time vectorized vs row-wise enhancement and verify identical output
+
+    The row-wise reference is only run up to max_rowwise_rows rows; larger
+    sizes time the vectorized version alone.
+
+    Args:
+        sizes: Row counts to benchmark
+        max_rowwise_rows: Largest size to run the row-wise reference on
+
+    Returns:
+        List of dictionaries with rows, seconds and whether outputs match
+    """
+    results = []
+    for n_rows in sizes:
+        data = synthetic_treatments(n_rows)
+        enhanced, vectorized_seconds = _timed(enhance_training_data, data)
+        result = {'rows': n_rows, 'vectorized': vectorized_seconds, 'rowwise': None, 'identical': None}
+
+        if n_rows <= max_rowwise_rows:
+            reference, result['rowwise'] = _timed(enhance_training_data_rowwise, data)
+            try:
+                pd.testing.assert_frame_equal(enhanced, reference)
+                result['identical'] = True
+            except AssertionError as e:
+                print(f"Output mismatch at {n_rows} rows: {e}")
+                result['identical'] = False
+
+        line = f"{n_rows:>12,} rows: vectorized {vectorized_seconds:8.2f}s"
+        if result['rowwise'] is not None:
+            line += (f", row-wise {result['rowwise']:8.2f}s ({result['rowwise'] / vectorized_seconds:.0f}x), "
+                     f"identical columns: {result['identical']}")
+        else:
+            line += " (row-wise reference skipped)"
+        print(line)
+        results.append(result)
+
+    return results
+
+if __name__ == "__main__":
+    # Usage: python benchmark_enhance.py [--full] [size ...]
+    sizes = [int(arg) for arg in sys.argv[1:] if arg.isdigit()] or DEFAULT_SIZES
+    benchmark(sizes, max(sizes) if "--full" in sys.argv else MAX_ROWWISE_ROWS)
@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+
+class DrugCatalog:
+    """Columnar, read-only drug metadata built once from the data files
+
+    Medications and diagnoses get integer ids; the encoder medications come
+    first so medication ids line up with the columns of the scoring matrix.
+
+    - Side effects are stored CSR-style: the rows of medication i are
+      side_effect_*[offsets[i]:offsets[i + 1]].
+    - Drug classes are an int code array into class_names ('' when unknown).
+    - First-line treatments are a (diagnosis x medication) boolean matrix.
+    """
+
+    def __init__(self, medications, diagnoses, side_effects, drugs, first_line_treatments=None):
+        """Build the catalog
+
+        Args:
+            medications: Encoder medications (first ids, in this order)
+            diagnoses: Encoder diagnoses (first ids, in this order)
+            side_effects: DataFrame with medication, side_effect, frequency, severity
+            drugs: Dictionary of drug name -> drug record with drug_class
+            first_line_treatments: Optional DataFrame with condition and medication
+        """
+        if first_line_treatments is None:
+            first_line_treatments = pd.DataFrame(columns=["condition", "medication"])
+        side_effects = side_effects.dropna(subset=['medication'])
+        first_line_treatments = first_line_treatments.dropna(subset=['condition', 'medication'])
+
+        # Medication and diagnosis ids (encoder order first, then any extras)
+        self.medications = list(dict.fromkeys(
+            list(medications) + side_effects['medication'].tolist() + list(drugs) +
+            first_line_treatments['medication'].tolist()
+        ))
+        self.medication_index = {name: i for i, name in enumerate(self.medications)}
+        self.diagnoses = list(dict.fromkeys(list(diagnoses) + first_line_treatments['condition'].tolist()))
+        self.diagnosis_index = {name: i for i, name in enumerate(self.diagnoses)}
+
+        # Side effects grouped by medication id, keeping file order within a medication
+        medication_ids = side_effects['medication'].map(self.medication_index).to_numpy(dtype=np.int64)
+        order = np.argsort(medication_ids, kind='stable')
+        counts = np.bincount(medication_ids, minlength=len(self.medications))
+        self.side_effect_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        self.side_effect_names = side_effects['side_effect'].to_numpy(dtype=object)[order]
+        self.side_effect_frequency = side_effects['frequency'].to_numpy(dtype=np.float64)[order]
+        self.side_effect_severity = side_effects['severity'].to_numpy(dtype=np.float64)[order] / 10.0
+
+        # Drug class codes (code 0 is the empty class)
+        self.class_names = ['']
+        class_index = {'': 0}
+        self.class_codes = np.zeros(len(self.medications), dtype=np.int16)
+        for name, drug in drugs.items():
+            drug_class = drug.get('drug_class', '')
+            if drug_class not in class_index:
+                class_index[drug_class] = len(self.class_names)
+                self.class_names.append(drug_class)
+            self.class_codes[self.medication_index[name]] = class_index[drug_class]
+
+        # First-line (diagnosis x medication) matrix
+        self.first_line = np.zeros((len(self.diagnoses), len(self.medications)), dtype=bool)
+        rows = first_line_treatments['condition'].map(self.diagnosis_index).to_numpy(dtype=np.int64)
+        cols = first_line_treatments['medication'].map(self.medication_index).to_numpy(dtype=np.int64)
+        self.first_line[rows, cols] = True
+
+    def side_effects(self, medication):
+        """Return the side effects of a medication as a list of dictionaries"""
+        i = self.medication_index.get(medication)
+        if i is None:
+            return []
+
+        start, end = self.side_effect_offsets[i], self.side_effect_offsets[i + 1]
+        return [
+            {'name': name, 'frequency': frequency, 'severity': severity}
+            for name, frequency, severity in zip(
+                self.side_effect_names[start:end].tolist(),
+                self.side_effect_frequency[start:end].tolist(),
+                self.side_effect_severity[start:end].tolist()
+            )
+        ]
+
+    def drug_class(self, medication):
+        """Return the drug class of a medication ('' when unknown)"""
+        i = self.medication_index.get(medication)
+        return '' if i is None else self.class_names[self.class_codes[i]]
+
+    def first_line_mask(self, diagnosis, n_medications=None):
+        """Boolean first-line flags for a diagnosis over the first n medication ids"""
+        n_medications = len(self.medications) if n_medications is None else n_medications
+        i = self.diagnosis_index.get(diagnosis)
+        if i is None:
+            return np.zeros(n_medications, dtype=bool)
+        return self.first_line[i, :n_medications]
+
+    def first_line_medications(self, diagnosis):
+        """Return the first-line medications for a diagnosis"""
+        return [self.medications[i] for i in np.flatnonzero(self.first_line_mask(diagnosis))]
+
+    def memory_usage(self):
+        """Return the bytes used by each catalog array and their total"""
+        usage = {
+            'side_effect_offsets': self.side_effect_offsets.nbytes,
+            'side_effect_names': self.side_effect_names.nbytes + sum(
+                len(name) for name in self.side_effect_names.tolist() if isinstance(name, str)),
+            'side_effect_frequency': self.side_effect_frequency.nbytes,
+            'side_effect_severity': self.side_effect_severity.nbytes,
+            'class_codes': self.class_codes.nbytes,
+            'first_line': self.first_line.nbytes
+        }
+        usage['total'] = sum(usage.values())
+        return usage
@@ -0,0 +1,260 @@
+import re
+import sys
+import time
+import numpy as np
+
+# Separator between tokens in the fragment lookup corpus
+SEPARATOR = "\x00"
+MAX_CACHED_FRAGMENTS = 10000
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+def tokenize(text):
+    """Lowercase alphanumeric tokens of a text"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+class DiagnosisIndex:
+    """Inverted token index over diagnosis names and synonyms
+
+    Built once at startup. Every token maps to a posting array of diagnosis
+    ids and a matching weight array, so ranking a query is one bincount over
+    the postings of its tokens instead of a scan over the vocabulary.
+
+    Scoring is either 'overlap' (number of distinct shared tokens, the
+    original matching rule) or 'bm25'.
+    """
+
+    def __init__(self, diagnoses, synonyms=None, scoring="overlap"):
+        """Build the index
+
+        Args:
+            diagnoses: Ordered list of diagnosis names
+            synonyms: Optional dictionary of diagnosis -> list of synonyms
+            scoring: 'overlap' or 'bm25'
+        """
+        if scoring not in ("overlap", "bm25"):
+            raise ValueError(f"Unknown scoring: {scoring}")
+
+        self.diagnoses = list(diagnoses)
+        self.scoring = scoring
+        synonyms = synonyms or {}
+
+        # Lowercased names for substring checks
+        self.lower_names = [name.lower() for name in self.diagnoses]
+
+        # Term frequencies per diagnosis (name plus synonyms)
+        postings = {}
+        lengths = np.zeros(len(self.diagnoses))
+        for i, name in enumerate(self.diagnoses):
+            tokens = tokenize(" ".join([name] + list(synonyms.get(name, []))))
+            lengths[i] = len(tokens)
+            for token in tokens:
+                counts = postings.setdefault(token, {})
+                counts[i] = counts.get(i, 0) + 1
+
+        n_docs = max(len(self.diagnoses), 1)
+        average_length = max(lengths.mean(), 1.0) if len(lengths) else 1.0
+
+        self.postings = {}
+        for token, counts in postings.items():
+            docs = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+            if scoring == "overlap":
+                weights = np.ones(len(docs))
+            else:
+                tf = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+                idf = np.log(1.0 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+                norm = BM25_K1 * (1.0 - BM25_B + BM25_B * lengths[docs] / average_length)
+                weights = idf * tf * (BM25_K1 + 1.0) / (tf + norm)
+            self.postings[token] = (docs, weights)
+
+        # Name tokens only, joined for fragment lookups in substring_match
+        name_postings = {}
+        for i, name in enumerate(self.lower_names):
+            for token in set(tokenize(name)):
+                name_postings.setdefault(token, []).append(i)
+        self.name_tokens = sorted(name_postings)
+        self.name_postings = [np.array(name_postings[token], dtype=np.int64) for token in self.name_tokens]
+        self.token_text = SEPARATOR.join(self.name_tokens)
+        self.token_starts = np.cumsum([0] + [len(token) + 1 for token in self.name_tokens[:-1]])
+        self._fragment_cache = {}
+
+    def _names_with_fragment(self, fragment):
+        """Sorted ids of names having a token that contains the fragment"""
+        if fragment in self._fragment_cache:
+            return self._fragment_cache[fragment]
+
+        hits = []
+        position = self.token_text.find(fragment)
+        while position != -1:
+            index = int(np.searchsorted(self.token_starts, position, side="right")) - 1
+            hits.append(self.name_postings[index])
+            if index + 1 >= len(self.token_starts):
+                break
+            position = self.token_text.find(fragment, self.token_starts[index + 1])
+
+        docs = np.unique(np.concatenate(hits)) if hits else np.zeros(0, dtype=np.int64)
+        if len(self._fragment_cache) >= MAX_CACHED_FRAGMENTS:
+            self._fragment_cache.clear()
+        self._fragment_cache[fragment] = docs
+        return docs
+
+    def substring_match(self, text):
+        """Return the first diagnosis whose name contains the text, or None
+
+        Every token of the text lies inside some token of a matching name, so
+        only names that have such a token for all text tokens are checked.
+        """
+        text = text.lower()
+        if not text:
+            return None
+
+        tokens = set(tokenize(text))
+        if tokens:
+            candidates = None
+            for token in sorted(tokens, key=len, reverse=True):
+                docs = self._names_with_fragment(token)
+                candidates = docs if candidates is None else np.intersect1d(candidates, docs, assume_unique=True)
+                if not len(candidates):
+                    return None
+        else:
+            candidates = range(len(self.diagnoses))
+
+        for i in candidates:
+            if text in self.lower_names[i]:
+                return self.diagnoses[i]
+        return None
+
+    def scores(self, text):
+        """Score every diagnosis against the distinct tokens of a text"""
+        matched = [self.postings[token] for token in set(tokenize(text)) if token in self.postings]
+        if not matched:
+            return np.zeros(len(self.diagnoses))
+
+        docs = np.concatenate([docs for docs, _ in matched])
+        weights = np.concatenate([weights for _, weights in matched])
+        return np.bincount(docs, weights=weights, minlength=len(self.diagnoses))
+
+    def rank(self, text, k=5):
+        """Return the top-k (diagnosis, score) pairs with a positive score
+
+        Ties keep vocabulary order.
+        """
+        scores = self.scores(text)
+        ranked = []
+        for _ in range(min(k, len(scores))):
+            # argmax returns the first maximum, which keeps vocabulary order on ties
+            i = int(np.argmax(scores))
+            if scores[i] <= 0:
+                break
+            ranked.append((self.diagnoses[i], float(scores[i])))
+            scores[i] = -np.inf
+        return ranked
+
+    def best_match(self, text):
+        """Return the best diagnosis for a text, or None
+
+        A diagnosis whose name contains the whole text wins, otherwise the
+        highest scoring diagnosis (first in vocabulary order on ties).
+        """
+        diagnosis = self.substring_match(text)
+        if diagnosis is not None:
+            return diagnosis
+
+        ranked = self.rank(text, k=1)
+        return ranked[0][0] if ranked else None
+
+def linear_match(diagnoses, text):
+    """Reference implementation of the original two-pass linear scan"""
+    for diagnosis in diagnoses:
+        if text.lower() in diagnosis.lower():
+            return diagnosis
+
+    words = set(tokenize(text))
+    best_match, best_score = None, 0
+    for diagnosis in diagnoses:
+        overlap = len(words.intersection(tokenize(diagnosis)))
+        if overlap > best_score:
+            best_score = overlap
+            best_match = diagnosis
+    return best_match
+
+def synthetic_vocabulary(n_terms=70000, seed=42):
+    """Generate an ICD-10-scale list of unique diagnosis names"""
+    rng = np.random.default_rng(seed)
+    qualifiers = ["acute", "chronic", "recurrent", "unspecified", "severe", "mild", "congenital", "secondary",
+                  "primary", "bilateral", "left", "right", "juvenile", "allergic", "viral", "bacterial"]
+    sites = ["lung", "kidney", "liver", "heart", "skin", "bone", "joint", "stomach", "colon", "bladder",
+             "brain", "spine", "eye", "ear", "throat", "sinus", "pancreas", "thyroid", "artery", "vein"]
+    conditions = ["infection", "inflammation", "failure", "disorder", "syndrome", "neoplasm", "injury",
+                  "obstruction", "hemorrhage", "ulcer", "stenosis", "insufficiency", "dysplasia", "fibrosis"]
+
+    names = set()
+    while len(names) < n_terms:
+        q = rng.integers(0, len(qualifiers), n_terms)
+        s = rng.integers(0, len(sites), n_terms)
+        c = rng.integers(0, len(conditions), n_terms)
+        code = rng.integers(0, 10000, n_terms)
+        for i in range(n_terms):
+            names.add(f"{qualifiers[q[i]].title()} {sites[s[i]]} {conditions[c[i]]} type {code[i]}")
+            if len(names) >= n_terms:
+                break
+    return sorted(names)
+
+def benchmark(n_terms=70000, n_queries=200, seed=42):
+    """Time index build and queries on a synthetic vocabulary
+
+    Args:
+        n_terms: Vocabulary size
+        n_queries: Number of queries to time
+        seed: Random seed
+
+    Returns:
+        Dictionary with build seconds and per-query milliseconds
+    """
+    diagnoses = synthetic_vocabulary(n_terms, seed)
+    rng = np.random.default_rng(seed)
+    words = sorted({token for name in diagnoses[:2000] for token in tokenize(name) if not token.isdigit()})
+    queries = []
+    for i in range(n_queries):
+        if i % 4 == 0:
+            # Fragment of a real name exercises the substring path
+            name = diagnoses[rng.integers(0, len(diagnoses))].lower()
+            queries.append(" ".join(name.split()[1:3]))
+        else:
+            queries.append(" ".join(rng.choice(words, rng.integers(1, 4))) + " pain")
+
+    results = {}
+    for scoring in ("overlap", "bm25"):
+        start = time.perf_counter()
+        index = DiagnosisIndex(diagnoses, scoring=scoring)
+        results[f"{scoring}_build_s"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for query in queries:
+            index.best_match(query)
+            index.rank(query, k=5)
+        results[f"{scoring}_query_ms"] = (time.perf_counter() - start) / n_queries * 1000
+
+    # The linear scan is slow, so only time a handful of queries
+    index = DiagnosisIndex(diagnoses)
+    sample = queries[:10]
+    start = time.perf_counter()
+    linear = [linear_match(diagnoses, query) for query in sample]
+    results["linear_query_ms"] = (time.perf_counter() - start) / len(sample) * 1000
+    results["identical"] = linear == [index.best_match(query) for query in sample]
+
+    print(f"{n_terms} diagnoses, {n_queries} queries")
+    print(f"  Same matches as linear scan: {results['identical']}")
+    print(f"  Linear scan: {results['linear_query_ms']:.1f} ms/query")
+    for scoring in ("overlap", "bm25"):
+        print(f"  Index ({scoring}): build {results[f'{scoring}_build_s']:.2f}s, "
+              f"{results[f'{scoring}_query_ms']:.3f} ms/query (best match + top 5)")
+
+    return results
+
+if __name__ == "__main__":
+    # Usage: python diagnosis_index.py [n_terms]
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 70000)
@@ -9,7 +9,7 @@ from pathlib import Path
 DATA_DIR = Path("./data")
 DATA_DIR.mkdir(exist_ok=True)
 
-def download_datasets(force=False):
+def download_datasets(force=False, n_patients=200):
     """Download all required medical datasets once"""
     print("===== EvoDoc Dataset Downloader =====")
     
@@ -41,7 +41,7 @@ def download_datasets(force=False):
     
     # 4. Create improved MIMIC-like treatment data with stronger correlations
     print("Creating enhanced clinical data...")
-    create_enhanced_mimic_data()
+    create_enhanced_mimic_data(n_patients)
     
     # Create flag file to indicate download is complete
     with open(DATA_DIR / "download_complete.flag", "w") as f:
@@ -279,24 +279,27 @@ def create_enhanced_drugbank_data():
     print(f"Created enhanced database with {len(drug_data['drugs'])} medications, " 
           f"{len(contraindications)} contraindications, and {len(first_line_treatments)} first-line treatments")
 
-def create_enhanced_mimic_data():
-    """Create synthetic clinical treatment data with strong realistic correlations"""
+def create_enhanced_mimic_data(n_patients=200):
+    """Create synthetic clinical treatment data with strong realistic correlations
+
+    Every step samples whole columns with NumPy instead of looping over
+    patients, diagnoses and treatments in Python.
+    """
     # Set random seed for reproducibility
-    np.random.seed(42)
+    rng = np.random.default_rng(42)
     
     # Generate synthetic patients
-    n_patients = 200  # Increased from 100
     patient_ids = np.arange(1, n_patients + 1)
     
     # More balanced gender distribution
-    genders = np.random.choice(['M', 'F'], size=n_patients, p=[0.5, 0.5])
+    genders = rng.choice(['M', 'F'], size=n_patients, p=[0.5, 0.5])
     
     # More realistic age distribution
     ages = np.concatenate([
-        np.random.normal(30, 8, size=n_patients//4),    # Young adults
-        np.random.normal(45, 10, size=n_patients//4),   # Middle-aged
-        np.random.normal(65, 8, size=n_patients//4),    # Senior
-        np.random.uniform(18, 85, size=n_patients//4)   # Mix
+        rng.normal(30, 8, size=n_patients//4),    # Young adults
+        rng.normal(45, 10, size=n_patients//4),   # Middle-aged
+        rng.normal(65, 8, size=n_patients//4),    # Senior
+        rng.uniform(18, 85, size=n_patients - 3*(n_patients//4))   # Mix
     ])
     ages = np.clip(ages, 18, 95).astype(int)
     
@@ -307,7 +310,6 @@ def create_enhanced_mimic_data():
     })
     
     # Generate synthetic diagnoses with comorbidity patterns
-    diagnoses = []
     common_diagnoses = [
         "Hypertension", "Type 2 Diabetes", "Asthma", "COPD", 
         "Pneumonia", "Bronchitis", "Common Cold", "Influenza",
@@ -322,58 +324,28 @@ def create_enhanced_mimic_data():
         ["Depression", "Anxiety"],                              # Mental health cluster
         ["COPD", "Bronchitis"]                                  # Respiratory cluster
     ]
-    
-    for patient_id in patient_ids:
-        # Get patient age for age-related conditions
-        patient_age = patients[patients['subject_id'] == patient_id]['age'].values[0]
-        
-        # Determine number of diagnoses (older patients tend to have more)
-        if patient_age > 65:
-            n_diagnoses = np.random.randint(2, 6)  # More conditions for elderly
-        elif patient_age > 40:
-            n_diagnoses = np.random.randint(1, 4)  # Some conditions for middle-aged
-        else:
-            n_diagnoses = np.random.randint(1, 3)  # Fewer for young
-            
-        # Randomly choose whether to use a comorbidity group
-        use_comorbidity = np.random.random() < 0.7  # 70% chance
-        
-        if use_comorbidity and n_diagnoses >= 2:
-            # Select a random comorbidity group
-            selected_group = np.random.choice(len(comorbidity_groups))
-            # Take a subset of conditions from the group
-            n_from_group = min(n_diagnoses, len(comorbidity_groups[selected_group]))
-            selected_conditions = np.random.choice(comorbidity_groups[selected_group], 
-                                                  size=n_from_group, replace=False)
-            
-            # Add these diagnoses
-            for diagnosis in selected_conditions:
-                diagnoses.append({
-                    'subject_id': patient_id,
-                    'diagnosis': diagnosis
-                })
-                
-            # If we need more conditions, select from the common list
-            remaining = n_diagnoses - n_from_group
-            if remaining > 0:
-                remaining_conditions = [d for d in common_diagnoses 
-                                        if d not in comorbidity_groups[selected_group]]
-                additional = np.random.choice(remaining_conditions, size=remaining, replace=False)
-                for diagnosis in additional:
-                    diagnoses.append({
-                        'subject_id': patient_id,
-                        'diagnosis': diagnosis
-                    })
-        else:
-            # Just select random diagnoses
-            selected_conditions = np.random.choice(common_diagnoses, size=n_diagnoses, replace=False)
-            for diagnosis in selected_conditions:
-                diagnoses.append({
-                    'subject_id': patient_id,
-                    'diagnosis': diagnosis
-                })
-    
-    diagnoses_df = pd.DataFrame(diagnoses)
+    in_group = np.array([[diagnosis in group for diagnosis in common_diagnoses] for group in comorbidity_groups])
+    
+    # Determine number of diagnoses (older patients tend to have more):
+    # 2-5 for the elderly, 1-3 for the middle-aged, 1-2 for the young
+    n_diagnoses = rng.integers(np.where(ages > 65, 2, 1), np.where(ages > 65, 6, np.where(ages > 40, 4, 3)))
+    
+    # 70% of patients with several conditions draw them from a comorbidity group
+    use_comorbidity = (rng.random(n_patients) < 0.7) & (n_diagnoses >= 2)
+    selected_group = rng.integers(0, len(comorbidity_groups), n_patients)
+    
+    # Rank the conditions of each patient in random order, with the selected
+    # group's conditions first; the first n_diagnoses are the diagnoses. This
+    # takes a random subset of the group and fills up from the other conditions.
+    ranking = rng.random((n_patients, len(common_diagnoses)))
+    ranking -= use_comorbidity[:, None] & in_group[selected_group]
+    order = np.argsort(ranking, axis=1)
+    chosen = np.arange(len(common_diagnoses)) < n_diagnoses[:, None]
+    
+    diagnoses_df = pd.DataFrame({
+        'subject_id': np.repeat(patient_ids, n_diagnoses),
+        'diagnosis': np.array(common_diagnoses, dtype=object)[order[chosen]]
+    })
     
     # Define more realistic diagnosis-medication mappings with efficacy
     diagnosis_medications = {
@@ -423,78 +395,61 @@ def create_enhanced_mimic_data():
             ("Loratadine", 0.85), ("Cetirizine", 0.85), ("Fluticasone", 0.8)
         ]
     }
+    medication_names = np.array([[med for med, _ in diagnosis_medications[d]] for d in common_diagnoses], dtype=object)
+    base_effectiveness = np.array([[eff for _, eff in diagnosis_medications[d]] for d in common_diagnoses])
+    
+    # Generate synthetic treatments with realistic effectiveness patterns:
+    # 1-3 distinct medications per diagnosis
+    diagnosis_index = order[chosen]
+    n_diagnosis_rows = len(diagnosis_index)
+    n_meds = rng.integers(1, medication_names.shape[1] + 1, n_diagnosis_rows)
+    med_order = np.argsort(rng.random((n_diagnosis_rows, medication_names.shape[1])), axis=1)
+    med_chosen = np.arange(medication_names.shape[1]) < n_meds[:, None]
+    
+    row = np.repeat(np.arange(n_diagnosis_rows), n_meds)
+    treatment_diagnosis = diagnosis_index[row]
+    treatment_med = med_order[med_chosen]
+    treatment_subject = diagnoses_df['subject_id'].to_numpy()[row]
+    treatment_age = ages[treatment_subject - 1]
+    
+    # Apply age-based adjustments: elderly patients often have reduced
+    # effectiveness, young adults may respond differently and middle-aged
+    # patients match the clinical trial demographic
+    age_factor = rng.uniform(
+        np.where(treatment_age > 70, 0.8, np.where(treatment_age < 25, 0.9, 0.95)),
+        np.where(treatment_age > 70, 0.95, 1.05)
+    )
     
-    # Generate synthetic treatments with realistic effectiveness patterns
-    treatments = []
+    # Apply some random variation, but maintain the relationship
+    # between appropriate meds and conditions, clamped to the valid range
+    effectiveness = np.round(10 * base_effectiveness[treatment_diagnosis, treatment_med] * age_factor
+                             * rng.uniform(0.85, 1.15, len(row)))
+    effectiveness = np.clip(effectiveness, 1, 10).astype(int)
+    
+    treatments_df = pd.DataFrame({
+        'subject_id': treatment_subject,
+        'diagnosis': np.array(common_diagnoses, dtype=object)[treatment_diagnosis],
+        'medication': medication_names[treatment_diagnosis, treatment_med],
+        'effectiveness': effectiveness
+    })
     
-    for _, row in diagnoses_df.iterrows():
-        patient_id = row['subject_id']
-        diagnosis = row['diagnosis']
-        patient_age = patients[patients['subject_id'] == patient_id]['age'].values[0]
-        
-        medications = diagnosis_medications.get(diagnosis, [("Ibuprofen", 0.6), ("Acetaminophen", 0.6)])
-        
-        # Select 1-3 medications based on diagnosis
-        n_meds = np.random.randint(1, min(4, len(medications) + 1))
-        selected_meds = np.random.choice(range(len(medications)), size=n_meds, replace=False)
-        
-        for med_idx in selected_meds:
-            medication, base_effectiveness = medications[med_idx]
-            
-            # Apply age-based adjustments
-            if patient_age > 70:
-                # Elderly patients often have reduced effectiveness or more side effects
-                age_factor = np.random.uniform(0.8, 0.95)
-            elif patient_age < 25:
-                # Young adults may respond differently
-                age_factor = np.random.uniform(0.9, 1.05)
-            else:
-                # Middle-aged patients (the clinical trial demographic)
-                age_factor = np.random.uniform(0.95, 1.05)
-            
-            # Apply some random variation, but maintain the relationship
-            # between appropriate meds and conditions
-            effectiveness = int(round(10 * base_effectiveness * age_factor * np.random.uniform(0.85, 1.15)))
-            # Clamp to valid range
-            effectiveness = max(1, min(10, effectiveness))
-            
-            treatments.append({
-                'subject_id': patient_id,
-                'diagnosis': diagnosis,
-                'medication': medication,
-                'effectiveness': effectiveness
-            })
+    # Add some inappropriate treatments with low effectiveness (about 15% of the total)
+    n_inappropriate = int(len(treatments_df) * 0.15)
+    all_meds = np.array(sorted(set(medication_names.ravel())), dtype=object)
+    inappropriate = np.array([~np.isin(all_meds, names) for names in medication_names])
     
-    # Add some inappropriate treatments with low effectiveness
-    for i in range(int(len(treatments) * 0.15)):  # About 15% of the total treatments
-        patient_id = np.random.choice(patient_ids)
-        patient_age = patients[patients['subject_id'] == patient_id]['age'].values[0]
-        
-        # Get a random diagnosis and an inappropriate medication for it
-        diagnosis = np.random.choice(common_diagnoses)
-        
-        # Get medications that are NOT indicated for this diagnosis
-        appropriate_meds = [med for med, _ in diagnosis_medications.get(diagnosis, [])]
-        all_meds = set()
-        for med_list in diagnosis_medications.values():
-            for med, _ in med_list:
-                all_meds.add(med)
-                
-        inappropriate_meds = list(all_meds - set(appropriate_meds))
-        
-        if inappropriate_meds:
-            medication = np.random.choice(inappropriate_meds)
-            # Inappropriate medications have low effectiveness
-            effectiveness = np.random.randint(1, 5)  # 1-4 out of 10
-            
-            treatments.append({
-                'subject_id': patient_id,
-                'diagnosis': diagnosis,
-                'medication': medication,
-                'effectiveness': effectiveness
-            })
+    # Get a random diagnosis and a uniformly drawn medication NOT indicated for it
+    wrong_diagnosis = rng.integers(0, len(common_diagnoses), n_inappropriate)
+    wrong_med = np.argmax(np.where(inappropriate[wrong_diagnosis],
+                                   rng.random((n_inappropriate, len(all_meds))), -1), axis=1)
     
-    treatments_df = pd.DataFrame(treatments)
+    treatments_df = pd.concat([treatments_df, pd.DataFrame({
+        'subject_id': rng.choice(patient_ids, n_inappropriate),
+        'diagnosis': np.array(common_diagnoses, dtype=object)[wrong_diagnosis],
+        'medication': all_meds[wrong_med],
+        # Inappropriate medications have low effectiveness
+        'effectiveness': rng.integers(1, 5, n_inappropriate)  # 1-4 out of 10
+    })], ignore_index=True)
     
     # Save synthetic data
     patients.to_csv(DATA_DIR / "patients.csv", index=False)
@@ -509,12 +464,12 @@ def create_enhanced_mimic_data():
     )
     
     # Add domain knowledge features
-    treatment_data['is_appropriate'] = treatment_data.apply(
-        lambda row: 1 if any(row['medication'] == med 
-                            for med, _ in diagnosis_medications.get(row['diagnosis'], []))
-                   else 0,
-        axis=1
+    appropriate_pairs = pd.MultiIndex.from_tuples(
+        [(diagnosis, med) for diagnosis, meds in diagnosis_medications.items() for med, _ in meds]
     )
+    treatment_data['is_appropriate'] = pd.MultiIndex.from_frame(
+        treatment_data[['diagnosis', 'medication']]
+    ).isin(appropriate_pairs).astype(int)
     
     # Age category feature
     treatment_data['age_group'] = pd.cut(
@@ -530,5 +485,11 @@ def create_enhanced_mimic_data():
 if __name__ == "__main__":
     import sys
     force = "--force" in sys.argv
-    download_datasets(force)
+    
+    # Optional target size, e.g. --patients 100000
+    n_patients = 200
+    if "--patients" in sys.argv:
+        n_patients = int(sys.argv[sys.argv.index("--patients") + 1])
+    
+    download_datasets(force, n_patients)
     print("Dataset download complete. Next, run train_models.py")
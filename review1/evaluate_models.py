@@ -1,13 +1,17 @@
 import os
+import io
+import sys
+import time
 import pickle
+import contextlib
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 from sklearn.model_selection import train_test_split, cross_val_score
 from sklearn.metrics import mean_squared_error, r2_score, precision_score, recall_score
-from sklearn.preprocessing import StandardScaler, OneHotEncoder
 from pathlib import Path
+from feature_pipeline import pipeline_for
+from scenario_eval import SCENARIOS_FILE, load_scenarios, evaluate_scenarios, print_summary
+from report import figure, write_report
 
 # Constants
 DATA_DIR = Path("./data")
@@ -15,8 +19,13 @@ MODELS_DIR = Path("./models")
 EVAL_DIR = Path("./evaluation")
 EVAL_DIR.mkdir(exist_ok=True)
 
-def evaluate_models():
-    """Evaluate model performance using cross-validation and test data"""
+def evaluate_models(n_patients=200, report=True):
+    """Evaluate model performance using cross-validation and test data
+    
+    Args:
+        n_patients: Number of synthetic evaluation patients
+        report: Render the figures and the HTML report after evaluating
+    """
     print("===== EvoDoc Model Evaluation =====")
     
     # Check if data exists
@@ -39,183 +48,142 @@ def evaluate_models():
     
     # Create evaluation dataset
     print("Generating evaluation datasets...")
-    treatment_data, treatment_test = generate_evaluation_data()
+    treatment_data, treatment_test = generate_evaluation_data(n_patients)
     
     # Evaluate recommendation model
     print("\nEvaluating treatment recommendation model...")
-    evaluate_recommendation_model(models, encoders, treatment_data, treatment_test)
+    metrics, figures = evaluate_recommendation_model(models, encoders, treatment_data, treatment_test)
     
     # Evaluate on specific clinical scenarios
     print("\nEvaluating on specific clinical scenarios...")
-    evaluate_clinical_scenarios(models, encoders)
+    scenario_summary = evaluate_clinical_scenarios(models, encoders)
+    
+    # Reporting stage: figures are drawn headless in worker processes
+    if report:
+        print("\nRendering evaluation report...")
+        write_report(figures, {
+            "Recommendation model": pd.DataFrame([metrics]),
+            "Clinical scenarios": pd.DataFrame([scenario_summary])
+        })
     
     print("\nEvaluation complete! Results saved to the 'evaluation' directory.")
 
-def generate_evaluation_data():
-    """Generate a more comprehensive evaluation dataset"""
+def _effectiveness_table(base_treatment_data):
+    """Mean effectiveness per diagnosis x medication (3.0 where never observed)
+    
+    Returns:
+        (diagnoses, medications, table) with diagnoses and medications in
+        order of first appearance
+    """
+    all_diagnoses = base_treatment_data['diagnosis'].unique()
+    all_medications = base_treatment_data['medication'].unique()
+    
+    table = (base_treatment_data.groupby(['diagnosis', 'medication'])['effectiveness'].mean()
+             .unstack()
+             .reindex(index=all_diagnoses, columns=all_medications)
+             .fillna(3.0))
+    return all_diagnoses, all_medications, table.to_numpy(dtype=np.float64)
+
+def generate_evaluation_data(n_patients=200, seed=100, save=True):
+    """Generate a more comprehensive evaluation dataset
+    
+    Each patient gets 1-3 distinct diagnoses; each diagnosis contributes its
+    2 most and (with more than 3 medications) 2 least effective medications,
+    with noisy effectiveness. All sampling is vectorized over patients.
+    
+    Args:
+        n_patients: Number of synthetic patients
+        seed: Random seed (different from the training data)
+        save: Write the dataset to data/evaluation_data.csv
+    
+    Returns:
+        (base treatment data, evaluation data)
+    """
     print("Loading base training data...")
     
     # Load existing treatment data
     base_treatment_data = pd.read_csv(DATA_DIR / "treatment_data.csv")
     
     # Create a larger, more diverse test set
-    print("Generating synthetic test data with diverse patient profiles...")
-    
-    # Generate synthetic patients with diverse demographics
-    np.random.seed(100)  # Different seed than training data
-    n_patients = 200  # Double the size
+    print(f"Generating synthetic test data for {n_patients} patients with diverse profiles...")
+    rng = np.random.default_rng(seed)
     
     patient_ids = np.arange(1000, 1000 + n_patients)  # Different range than training data
     
-    # More diverse age distribution
+    # More diverse age distribution: young adults, middle-aged, elderly, uniform spread
+    sizes = [len(part) for part in np.array_split(np.arange(n_patients), 4)]
     ages = np.concatenate([
-        np.random.normal(30, 10, size=n_patients//4),  # Young adults
-        np.random.normal(50, 10, size=n_patients//4),  # Middle-aged
-        np.random.normal(70, 10, size=n_patients//4),  # Elderly
-        np.random.uniform(18, 90, size=n_patients//4)   # Uniform spread
+        rng.normal(30, 10, size=sizes[0]),
+        rng.normal(50, 10, size=sizes[1]),
+        rng.normal(70, 10, size=sizes[2]),
+        rng.uniform(18, 90, size=sizes[3])
     ])
     ages = np.clip(ages, 18, 95).astype(int)
     
     # More balanced gender distribution
-    genders = np.random.choice(['M', 'F'], size=n_patients, p=[0.5, 0.5])
-    
-    patients = pd.DataFrame({
-        'subject_id': patient_ids,
-        'gender': genders,
-        'age': ages
-    })
-    
-    # Get all unique diagnoses and medications from the base dataset
-    all_diagnoses = base_treatment_data['diagnosis'].unique()
-    all_medications = base_treatment_data['medication'].unique()
+    genders = rng.choice(np.array(['M', 'F'], dtype=object), size=n_patients, p=[0.5, 0.5])
     
     # Calculate medication effectiveness for each diagnosis from the base data
-    diag_med_effectiveness = {}
-    for diagnosis in all_diagnoses:
-        diag_data = base_treatment_data[base_treatment_data['diagnosis'] == diagnosis]
-        diag_med_effectiveness[diagnosis] = {}
-        
-        for medication in all_medications:
-            med_data = diag_data[diag_data['medication'] == medication]
-            if len(med_data) > 0:
-                diag_med_effectiveness[diagnosis][medication] = med_data['effectiveness'].mean()
-            else:
-                # If no data for this combination, use a low effectiveness
-                diag_med_effectiveness[diagnosis][medication] = 3.0
-    
-    # Generate synthetic treatments for evaluation
-    treatments = []
-    
-    # Assign diagnoses to patients
-    for patient_id in patient_ids:
-        n_diagnoses = np.random.randint(1, 4)
-        diagnoses = np.random.choice(all_diagnoses, size=n_diagnoses, replace=False)
-        
-        for diagnosis in diagnoses:
-            # Get the effectiveness dict for this diagnosis
-            med_effectiveness = diag_med_effectiveness.get(diagnosis, {})
-            
-            # Sort medications by their effectiveness for this diagnosis
-            sorted_meds = sorted(med_effectiveness.items(), key=lambda x: x[1], reverse=True)
-            
-            # Select some effective and some ineffective treatments
-            if len(sorted_meds) > 0:
-                # Top medications
-                for medication, base_eff in sorted_meds[:2]:  # 2 most effective
-                    # Add some noise to effectiveness
-                    effectiveness = min(10, max(1, int(round(
-                        base_eff + np.random.normal(0, 1)
-                    ))))
-                    
-                    treatments.append({
-                        'subject_id': patient_id,
-                        'diagnosis': diagnosis,
-                        'medication': medication,
-                        'effectiveness': effectiveness
-                    })
-                
-                # Bottom medications
-                if len(sorted_meds) > 3:
-                    for medication, base_eff in sorted_meds[-2:]:  # 2 least effective
-                        # Add some noise to effectiveness
-                        effectiveness = min(10, max(1, int(round(
-                            base_eff + np.random.normal(0, 1)
-                        ))))
-                        
-                        treatments.append({
-                            'subject_id': patient_id,
-                            'diagnosis': diagnosis,
-                            'medication': medication,
-                            'effectiveness': effectiveness
-                        })
-    
-    treatments_df = pd.DataFrame(treatments)
+    all_diagnoses, all_medications, effectiveness_table = _effectiveness_table(base_treatment_data)
+    n_diagnosis_types, n_medication_types = effectiveness_table.shape
+    
+    # Per diagnosis: 2 most effective and, with more than 3 medications, 2 least effective
+    ranked = np.argsort(-effectiveness_table, axis=1, kind='stable')
+    slots = list(range(min(2, n_medication_types)))
+    if n_medication_types > 3:
+        slots += [n_medication_types - 2, n_medication_types - 1]
+    selected_medications = ranked[:, slots]
+    selected_effectiveness = np.take_along_axis(effectiveness_table, selected_medications, axis=1)
+    
+    # Assign 1-3 distinct diagnoses per patient (a random permutation per row)
+    n_diagnoses = np.minimum(rng.integers(1, 4, size=n_patients), n_diagnosis_types)
+    permutations = np.argsort(rng.random((n_patients, n_diagnosis_types), dtype=np.float32), axis=1)
+    max_diagnoses = min(3, n_diagnosis_types)
+    keep = np.arange(max_diagnoses) < n_diagnoses[:, None]
+    patient_rows = np.repeat(np.arange(n_patients), max_diagnoses).reshape(n_patients, max_diagnoses)[keep]
+    diagnosis_codes = permutations[:, :max_diagnoses][keep]
+    
+    # Expand every (patient, diagnosis) pair into its selected medications
+    n_slots = len(slots)
+    treatment_patients = np.repeat(patient_rows, n_slots)
+    treatment_diagnoses = np.repeat(diagnosis_codes, n_slots)
+    medication_codes = selected_medications[diagnosis_codes].reshape(-1)
+    base_effectiveness = selected_effectiveness[diagnosis_codes].reshape(-1)
+    
+    # Add some noise to effectiveness
+    effectiveness = np.clip(np.round(base_effectiveness + rng.normal(0, 1, size=len(base_effectiveness))), 1, 10)
     
     # Create final evaluation dataset
-    test_data = pd.merge(
-        treatments_df,
-        patients,
-        on="subject_id"
-    )
+    test_data = pd.DataFrame({
+        'subject_id': patient_ids[treatment_patients],
+        'diagnosis': all_diagnoses[treatment_diagnoses],
+        'medication': all_medications[medication_codes],
+        'effectiveness': effectiveness.astype(np.int64),
+        'gender': genders[treatment_patients],
+        'age': ages[treatment_patients]
+    })
+    print(f"Generated {len(test_data)} evaluation treatments.")
     
     # Save evaluation data
-    test_data.to_csv(DATA_DIR / "evaluation_data.csv", index=False)
+    if save:
+        test_data.to_csv(DATA_DIR / "evaluation_data.csv", index=False)
     
     return base_treatment_data, test_data
 
+def benchmark_generation(sizes=(200, 100_000, 1_000_000)):
+    """Time generate_evaluation_data (without saving) for several patient counts"""
+    results = {}
+    for n_patients in sizes:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            _, test_data = generate_evaluation_data(n_patients, save=False)
+        results[n_patients] = time.perf_counter() - start
+        print(f"{n_patients:>10,} patients: {len(test_data):>11,} rows in {results[n_patients]:.2f}s")
+    return results
+
 def prepare_features(data, encoders):
-    """Prepare features for model evaluation"""
-    # Prepare numerical features
-    numerical_features = ['age']
-    if 'is_first_line' in data.columns:
-        numerical_features.append('is_first_line')
-    
-    # Add group features if they exist
-    group_features = [col for col in data.columns if col.startswith('group_')]
-    numerical_features.extend(group_features)
-    
-    # Fill missing numerical values with 0
-    numerical_data = data[numerical_features].copy().fillna(0)
-    
-    try:
-        X_numerical = encoders['age'].transform(numerical_data)
-    except:
-        # If there's an error with the full matrix, try just using age
-        X_numerical = encoders['age'].transform(data[['age']])
-    
-    # Transform categorical features
-    X_gender = encoders['gender'].transform(data[['gender']])
-    
-    try:
-        X_diagnosis = encoders['diagnosis'].transform(data[['diagnosis']])
-    except:
-        # Handle unknown diagnoses
-        diagnosis_categories = encoders['diagnosis'].categories_[0]
-        X_diagnosis = np.zeros((len(data), len(diagnosis_categories)))
-    
-    try:
-        X_medication = encoders['medication'].transform(data[['medication']])
-    except:
-        # Handle unknown medications
-        medication_categories = encoders['medication'].categories_[0]
-        X_medication = np.zeros((len(data), len(medication_categories)))
-    
-    # Start with basic features
-    feature_parts = [X_numerical, X_gender, X_diagnosis, X_medication]
-    
-    # Add optional features if available
-    for feature in ['med_class', 'age_group']:
-        if feature in encoders and feature in data.columns:
-            try:
-                X_feature = encoders[feature].transform(data[[feature]])
-                feature_parts.append(X_feature)
-            except:
-                # Skip if there's an issue with this feature
-                pass
-    
-    # Combine all features
-    X = np.hstack(feature_parts)
-    return X
+    """Prepare features for model evaluation with the model's feature pipeline"""
+    return pipeline_for(encoders, DATA_DIR).transform(data)
 
 def evaluate_recommendation_model(models, encoders, training_data, test_data):
     """Evaluate the treatment recommendation model"""
@@ -264,35 +232,17 @@ def evaluate_recommendation_model(models, encoders, training_data, test_data):
     cv_rmse = np.sqrt(-cv_scores)
     print(f"Cross-validation RMSE: {cv_rmse.mean():.4f} (±{cv_rmse.std():.4f})")
     
-    # Generate visualizations
-    # 1. Predicted vs Actual Effectiveness
-    plt.figure(figsize=(10, 6))
-    plt.scatter(y_test, y_pred, alpha=0.3)
-    plt.plot([0, 1], [0, 1], 'r--')
-    plt.xlabel('Actual Effectiveness')
-    plt.ylabel('Predicted Effectiveness')
-    plt.title('Predicted vs Actual Treatment Effectiveness')
-    plt.tight_layout()
-    plt.savefig(EVAL_DIR / "pred_vs_actual.png")
-    
-    # 2. Prediction Error Distribution
-    plt.figure(figsize=(10, 6))
-    errors = y_pred - y_test
-    sns.histplot(errors, kde=True)
-    plt.xlabel('Prediction Error')
-    plt.ylabel('Frequency')
-    plt.title('Distribution of Prediction Errors')
-    plt.tight_layout()
-    plt.savefig(EVAL_DIR / "error_distribution.png")
-    
-    # 3. Effectiveness by Medication (top 10)
-    plt.figure(figsize=(12, 8))
+    # Describe the visualizations; they are drawn later by the reporting stage
     medication_effectiveness = test_data.groupby('medication')['effectiveness'].mean().sort_values(ascending=False).head(10)
-    sns.barplot(x=medication_effectiveness.values, y=medication_effectiveness.index)
-    plt.xlabel('Average Effectiveness')
-    plt.title('Top 10 Most Effective Medications')
-    plt.tight_layout()
-    plt.savefig(EVAL_DIR / "top_medications.png")
+    figures = [
+        figure("pred_vs_actual", "pred_vs_actual.png", "Predicted vs actual effectiveness",
+               y_true=y_test, y_pred=y_pred),
+        figure("error_distribution", "error_distribution.png", "Distribution of prediction errors",
+               errors=y_pred - y_test),
+        figure("top_medications", "top_medications.png", "Top 10 most effective medications",
+               figsize=(12, 8), medications=medication_effectiveness.index.to_numpy(),
+               effectiveness=medication_effectiveness.to_numpy())
+    ]
     
     # Save evaluation metrics
     metrics = {
@@ -306,132 +256,37 @@ def evaluate_recommendation_model(models, encoders, training_data, test_data):
     }
     
     pd.DataFrame([metrics]).to_csv(EVAL_DIR / "metrics.csv", index=False)
+    
+    return metrics, figures
 
-def evaluate_clinical_scenarios(models, encoders):
-    """Evaluate model on specific clinical scenarios"""
+def evaluate_clinical_scenarios(models, encoders, scenarios_file=SCENARIOS_FILE):
+    """Evaluate model on specific clinical scenarios (scored in one batch)"""
     model = models["recommendation"]
+    pipeline = pipeline_for(encoders, DATA_DIR)
     
-    # Define some clinical scenarios
-    scenarios = [
-        {
-            "name": "Elderly Patient with Hypertension",
-            "age": 78,
-            "gender": "F",
-            "diagnosis": "Hypertension",
-            "expected_medications": ["Lisinopril", "Amlodipine", "Hydrochlorothiazide"]
-        },
-        {
-            "name": "Young Adult with Respiratory Infection",
-            "age": 22,
-            "gender": "M",
-            "diagnosis": "Bronchitis",
-            "expected_medications": ["Azithromycin", "Amoxicillin", "Doxycycline"]
-        },
-        {
-            "name": "Middle-aged Patient with Diabetes",
-            "age": 52,
-            "gender": "M",
-            "diagnosis": "Type 2 Diabetes",
-            "expected_medications": ["Metformin", "Glipizide", "Sitagliptin"]
-        },
-        {
-            "name": "Child with Allergies",
-            "age": 12,
-            "gender": "F",
-            "diagnosis": "Allergic Rhinitis",
-            "expected_medications": ["Cetirizine", "Loratadine", "Fluticasone"]
-        },
-        {
-            "name": "Adult with Mental Health Issues",
-            "age": 35,
-            "gender": "F",
-            "diagnosis": "Anxiety",
-            "expected_medications": ["Sertraline", "Citalopram", "Escitalopram"]
-        }
-    ]
-    
-    # Available medications for prediction
-    try:
-        available_medications = list(encoders["medication"].categories_[0])
-    except:
-        print("Warning: Could not get medication list from encoder.")
-        available_medications = ["Amoxicillin", "Azithromycin", "Lisinopril", "Metformin", "Ibuprofen", "Loratadine"]
-    
-    # Evaluate each scenario
-    scenario_results = []
-    
-    for scenario in scenarios:
-        # Prepare features
-        # Age
-        age_scaled = encoders["age"].transform([[scenario["age"]]])
-        
-        # Gender
-        try:
-            gender_encoded = encoders["gender"].transform([[scenario["gender"]]])
-        except:
-            gender_encoded = np.array([[1, 0]]) if scenario["gender"] == "M" else np.array([[0, 1]])
-        
-        # Diagnosis
-        try:
-            diagnosis_encoded = encoders["diagnosis"].transform([[scenario["diagnosis"]]])
-        except:
-            # If diagnosis not in encoder, use zeros
-            diagnosis_encoded = np.zeros((1, len(encoders["diagnosis"].categories_[0])))
-        
-        # Evaluate each medication
-        predictions = []
-        
-        for medication in available_medications:
-            # Create medication feature
-            med_feature = np.zeros((1, len(available_medications)))
-            try:
-                med_idx = np.where(available_medications == medication)[0][0]
-                med_feature[0, med_idx] = 1
-            except:
-                continue
-            
-            # Combine features
-            X = np.hstack([
-                age_scaled,
-                gender_encoded,
-                diagnosis_encoded,
-                med_feature
-            ])
-            
-            # Predict effectiveness
-            try:
-                effectiveness = float(model.predict(X)[0])
-                predictions.append((medication, effectiveness))
-            except:
-                continue
-        
-        # Sort by effectiveness
-        predictions.sort(key=lambda x: x[1], reverse=True)
-        
-        # Get top 3 medications
-        top_medications = [p[0] for p in predictions[:3]]
-        
-        # Check if top predictions include expected medications
-        match_count = sum(1 for med in scenario["expected_medications"] if med in top_medications)
-        match_percentage = match_count / len(scenario["expected_medications"]) if scenario["expected_medications"] else 0
-        
-        scenario_results.append({
-            "scenario": scenario["name"],
-            "top_predictions": top_medications,
-            "expected_medications": scenario["expected_medications"],
-            "match_percentage": match_percentage
-        })
+    # Load the clinical scenarios and rank every medication for all of them
+    scenarios = load_scenarios(scenarios_file)
+    scenario_results, summary = evaluate_scenarios(model, pipeline, scenarios)
     
     # Save results
-    pd.DataFrame(scenario_results).to_csv(EVAL_DIR / "scenario_evaluation.csv", index=False)
+    scenario_results.to_csv(EVAL_DIR / "scenario_evaluation.csv", index=False)
     
     # Print results
-    for result in scenario_results:
+    for result in scenario_results.to_dict('records'):
         print(f"\nScenario: {result['scenario']}")
         print(f"Top Recommendations: {', '.join(result['top_predictions'])}")
         print(f"Expected Medications: {', '.join(result['expected_medications'])}")
         print(f"Match Percentage: {result['match_percentage']:.0%}")
+    print_summary(summary)
+    
+    return summary
 
 if __name__ == "__main__":
-    evaluate_models()
-    print("\nNow run recommend.py to use the model for treatment recommendations")
+    # --patients N sets the evaluation set size; --benchmark times the data generator;
+    # --no-report skips the figures and the HTML report
+    if "--benchmark" in sys.argv:
+        benchmark_generation()
+    else:
+        n_patients = int(sys.argv[sys.argv.index("--patients") + 1]) if "--patients" in sys.argv else 200
+        evaluate_models(n_patients, report="--no-report" not in sys.argv)
+        print("\nNow run recommend.py to use the model for treatment recommendations")
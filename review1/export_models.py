@@ -0,0 +1,157 @@
+import os
+import sys
+import json
+import time
+import pickle
+import subprocess
+import numpy as np
+from pathlib import Path
+
+from lightweight_models import FORMAT_VERSION, load_exported
+from tree_engine import tree_ensemble_arrays
+from feature_pipeline import FeaturePipeline
+
+# Constants
+MODELS_DIR = Path("./models")
+EXPORT_DIR = MODELS_DIR / "export"
+
+def _json_values(values):
+    """Convert an array of categories to JSON-friendly Python values"""
+    return [value.item() if isinstance(value, np.generic) else value for value in values]
+
+def export_encoder(encoder):
+    """Describe a fitted encoder as plain JSON data"""
+    if isinstance(encoder, list):
+        return {"type": "list", "values": encoder}
+    if isinstance(encoder, FeaturePipeline):
+        return {"type": "pipeline", "schema": encoder.to_dict()}
+    if hasattr(encoder, "categories_"):
+        return {"type": "onehot", "categories": _json_values(encoder.categories_[0])}
+    if hasattr(encoder, "mean_") and hasattr(encoder, "scale_"):
+        return {"type": "scaler", "mean": encoder.mean_.tolist(), "scale": encoder.scale_.tolist()}
+
+    raise ValueError(f"Cannot export encoder of type {type(encoder).__name__}")
+
+def export_model(name, model, export_dir):
+    """Write one model in a pickle-free format and return its manifest entry"""
+    type_name = type(model).__name__
+
+    if type_name == "AveragedModel":
+        members = [export_model(f"{name}_{i}", member, export_dir) for i, member in enumerate(model.members)]
+        return {"type": "averaged", "members": members, "source": type_name}
+
+    if type_name in ("XGBRegressor", "Booster"):
+        booster = model.get_booster() if hasattr(model, "get_booster") else model
+        filename = f"{name}.ubj"
+        booster.save_model(str(export_dir / filename))
+        return {"type": "xgboost", "file": filename, "source": type_name}
+
+    if type_name in ("RandomForestRegressor", "GradientBoostingRegressor"):
+        filename = f"{name}.npz"
+        np.savez(export_dir / filename, **tree_ensemble_arrays(model))
+        return {"type": "tree_ensemble", "file": filename, "source": type_name}
+
+    if type_name == "LinearRegression":
+        filename = f"{name}.npz"
+        np.savez(export_dir / filename, coef=model.coef_, intercept=np.float64(model.intercept_))
+        return {"type": "linear", "file": filename, "source": type_name}
+
+    raise ValueError(f"Cannot export model {name} of type {type_name}")
+
+def export_models(models_dir=MODELS_DIR, export_dir=EXPORT_DIR):
+    """Export models.pkl and encoders.pkl to a pickle-free directory
+
+    Encoders are written as JSON vocabularies, sklearn tree ensembles as flat
+    NumPy node arrays and XGBoost boosters in their native UBJ format. The
+    export is verified by comparing predictions of both versions.
+
+    Args:
+        models_dir: Directory with models.pkl and encoders.pkl
+        export_dir: Output directory
+
+    Returns:
+        Maximum absolute prediction difference between pickle and export
+    """
+    print("Exporting models to pickle-free format...")
+    models_dir = Path(models_dir)
+    export_dir = Path(export_dir)
+    export_dir.mkdir(parents=True, exist_ok=True)
+
+    with open(models_dir / "models.pkl", "rb") as f:
+        models = pickle.load(f)
+    with open(models_dir / "encoders.pkl", "rb") as f:
+        encoders = pickle.load(f)
+
+    manifest = {"format_version": FORMAT_VERSION, "models": {}, "model_encoders": {}}
+    for name, model in models.items():
+        if hasattr(model, "predict"):
+            manifest["models"][name] = export_model(name, model, export_dir)
+        else:
+            manifest["model_encoders"][name] = export_encoder(model)
+        print(f"  Exported {name}")
+
+    with open(export_dir / "encoders.json", "w") as f:
+        json.dump({name: export_encoder(encoder) for name, encoder in encoders.items()}, f)
+
+    with open(export_dir / "manifest.json", "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    # Verify the export reproduces the original predictions
+    exported_models, _ = load_exported(export_dir)
+    rng = np.random.default_rng(42)
+    max_diff = 0.0
+    for name in manifest["models"]:
+        X = rng.random((256, models[name].n_features_in_))
+        X[:, 1:] = X[:, 1:] > 0.5
+        diff = np.max(np.abs(models[name].predict(X) - exported_models[name].predict(X)))
+        print(f"  {name}: max prediction difference {diff:.2e}")
+        max_diff = max(max_diff, diff)
+
+    print(f"Models exported to {export_dir}")
+    return max_diff
+
+def _time_subprocess(code, repeats):
+    """Time a fresh interpreter running the given code"""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], check=True, cwd=os.getcwd())
+        timings.append(time.perf_counter() - start)
+    return timings
+
+def benchmark_cold_start(repeats=5):
+    """Compare cold-start load time of the pickles against the export
+
+    Each measurement runs in a fresh interpreter so import time is included.
+
+    Args:
+        repeats: Number of runs per format
+
+    Returns:
+        Dictionary with median seconds per format
+    """
+    print(f"Benchmarking cold-start load time ({repeats} runs each)...")
+    pickle_code = (
+        "import pickle\n"
+        f"pickle.load(open({str(MODELS_DIR / 'models.pkl')!r}, 'rb'))\n"
+        f"pickle.load(open({str(MODELS_DIR / 'encoders.pkl')!r}, 'rb'))\n"
+    )
+    export_code = (
+        "from lightweight_models import load_exported\n"
+        f"load_exported({str(EXPORT_DIR)!r})\n"
+    )
+
+    results = {
+        "pickle": float(np.median(_time_subprocess(pickle_code, repeats))),
+        "export": float(np.median(_time_subprocess(export_code, repeats)))
+    }
+
+    print(f"  pickle: {results['pickle']:.3f}s")
+    print(f"  export: {results['export']:.3f}s")
+    print(f"  speedup: {results['pickle'] / results['export']:.1f}x")
+    return results
+
+if __name__ == "__main__":
+    export_models()
+    if "--benchmark" in sys.argv:
+        benchmark_cold_start()
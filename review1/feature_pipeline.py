@@ -0,0 +1,440 @@
+import sys
+import json
+import time
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+# Constants
+DATA_DIR = Path("./data")
+MODELS_DIR = Path("./models")
+UNKNOWN_CLASS = "Unknown"
+
+# Condition groups used for the group_* features
+CONDITION_GROUPS = {
+    "respiratory": ["Pneumonia", "Bronchitis", "Asthma", "COPD", "Allergic Rhinitis"],
+    "cardiovascular": ["Hypertension", "Heart failure"],
+    "metabolic": ["Type 2 Diabetes", "Obesity"],
+    "mental_health": ["Depression", "Anxiety"],
+    "pain": ["Migraine", "Osteoarthritis", "Pain"],
+    "infection": ["Pneumonia", "Urinary Tract Infection", "Bronchitis"]
+}
+AGE_GROUP_BINS = [0, 18, 40, 65, 100]
+AGE_GROUP_LABELS = ['pediatric', 'young_adult', 'middle_age', 'elderly']
+
+# Raw columns every record needs; everything else can be derived
+INPUT_COLUMNS = ['age', 'gender', 'diagnosis', 'medication']
+# One-hot blocks in feature matrix order (after the numerical block)
+CATEGORICAL_FEATURES = ['gender', 'diagnosis', 'medication', 'med_class', 'age_group']
+
+def load_first_line_pairs(data_dir=DATA_DIR):
+    """Return first-line (condition, medication) pairs as a DataFrame, or None"""
+    path = Path(data_dir) / "first_line_treatments.csv"
+    if not path.exists():
+        return None
+    return pd.read_csv(path)[['condition', 'medication']].dropna().drop_duplicates()
+
+def load_med_classes(data_dir=DATA_DIR):
+    """Return a dictionary of medication -> drug class, or None"""
+    path = Path(data_dir) / "drugbank_sample.json"
+    if not path.exists():
+        return None
+    with open(path, 'r') as f:
+        drug_data = json.load(f)
+    return {drug['name']: drug['drug_class'] for drug in drug_data.get('drugs', [])
+            if 'name' in drug and 'drug_class' in drug}
+
+def pair_membership(diagnosis, medication, pairs):
+    """Flag rows whose (diagnosis, medication) pair appears in pairs (0/1 int64)
+
+    Args:
+        diagnosis: (codes, uniques) from pd.factorize of the diagnosis column
+        medication: (codes, uniques) from pd.factorize of the medication column
+        pairs: DataFrame whose first two columns are diagnosis and medication
+    """
+    (diagnosis_codes, diagnosis_uniques), (medication_codes, medication_uniques) = diagnosis, medication
+
+    # Boolean lookup table over the distinct diagnoses x medications
+    table = np.zeros((len(diagnosis_uniques), len(medication_uniques)), dtype=bool)
+    rows = pd.Index(diagnosis_uniques).get_indexer(pairs.iloc[:, 0])
+    cols = pd.Index(medication_uniques).get_indexer(pairs.iloc[:, 1])
+    known = (rows >= 0) & (cols >= 0)
+    table[rows[known], cols[known]] = True
+
+    return table[diagnosis_codes, medication_codes].astype(np.int64)
+
+def condition_group_flags(diagnosis, condition_groups=CONDITION_GROUPS):
+    """Return {group_<name>: 0/1 int64 array} for factorized diagnoses"""
+    diagnosis_codes, diagnosis_uniques = diagnosis
+    uniques = np.asarray(diagnosis_uniques, dtype=object)
+    return {
+        f'group_{group}': np.isin(uniques, conditions)[diagnosis_codes].astype(np.int64)
+        for group, conditions in condition_groups.items()
+    }
+
+def age_groups(ages):
+    """Bin ages into the age_group labels"""
+    return pd.cut(ages, bins=AGE_GROUP_BINS, labels=AGE_GROUP_LABELS)
+
+def age_group(age):
+    """Age group label of a single age (None outside the bins)"""
+    for low, high, label in zip(AGE_GROUP_BINS[:-1], AGE_GROUP_BINS[1:], AGE_GROUP_LABELS):
+        if low < age <= high:
+            return label
+    return None
+
+def _json_values(values):
+    """Convert category values to JSON-friendly Python values"""
+    return [value.item() if isinstance(value, np.generic) else value for value in values]
+
+class FeaturePipeline:
+    """The recommendation model's feature transform, shared by training,
+    evaluation and serving
+
+    The feature matrix is a scaled numerical block (age, is_first_line and the
+    group_* flags) followed by one-hot blocks in CATEGORICAL_FEATURES order.
+    Derived columns missing from the input (is_first_line, group_*, med_class,
+    age_group) are computed from the domain tables stored in the pipeline, so
+    raw (age, gender, diagnosis, medication) records are enough.
+
+    - transform: batch DataFrame -> matrix
+    - transform_row: one record -> (1, n_features), no pandas
+    - transform_candidates: one patient x every medication, no pandas
+    """
+
+    def __init__(self, numerical_columns, mean, scale, categories, first_line=None, med_classes=None,
+                 condition_groups=None):
+        """Build the pipeline
+
+        Args:
+            numerical_columns: Names of the scaled numerical columns, in order
+            mean: Scaler mean per numerical column
+            scale: Scaler scale per numerical column
+            categories: Dictionary of categorical feature -> ordered categories
+            first_line: Iterable of first-line (diagnosis, medication) pairs
+            med_classes: Dictionary of medication -> drug class
+            condition_groups: Dictionary of group name -> diagnoses
+        """
+        self.numerical_columns = list(numerical_columns)
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        if len(self.mean) != len(self.numerical_columns):
+            raise ValueError(f"Scaler has {len(self.mean)} columns, schema has {len(self.numerical_columns)}")
+
+        self.categories = {name: list(categories[name]) for name in CATEGORICAL_FEATURES if name in categories}
+        self.first_line = sorted({(diagnosis, medication) for diagnosis, medication in (first_line or [])})
+        self.med_classes = dict(med_classes or {})
+        self.condition_groups = dict(condition_groups or CONDITION_GROUPS)
+
+        # Column offsets of every block
+        self.offsets = {}
+        offset = len(self.numerical_columns)
+        for name, values in self.categories.items():
+            self.offsets[name] = offset
+            offset += len(values)
+        self.n_features = offset
+
+        self._build_lookups()
+
+    def _build_lookups(self):
+        """Precompute the dictionaries and per-medication blocks of the fast paths"""
+        self.index = {name: {value: i for i, value in enumerate(values)} for name, values in self.categories.items()}
+        self.medications = list(self.categories.get('medication', []))
+        n_medications = len(self.medications)
+        medication_index = self.index.get('medication', {})
+
+        self.first_line_pairs = set(self.first_line)
+        self.first_line_masks = {}
+        for diagnosis, medication in self.first_line:
+            if medication in medication_index:
+                mask = self.first_line_masks.setdefault(diagnosis, np.zeros(n_medications, dtype=bool))
+                mask[medication_index[medication]] = True
+
+        # Medication-dependent one-hot blocks for transform_candidates
+        self.medication_blocks = {}
+        if 'medication' in self.categories:
+            self.medication_blocks['medication'] = np.eye(n_medications)
+        if 'med_class' in self.categories:
+            block = np.zeros((n_medications, len(self.categories['med_class'])))
+            for row, medication in enumerate(self.medications):
+                column = self.index['med_class'].get(self.med_classes.get(medication, UNKNOWN_CLASS))
+                if column is not None:
+                    block[row, column] = 1.0
+            self.medication_blocks['med_class'] = block
+
+    @classmethod
+    def from_encoders(cls, encoders, numerical_columns=None, first_line=None, med_classes=None):
+        """Build a pipeline from fitted encoders (sklearn or exported)
+
+        Without numerical_columns the names are inferred from the scaler
+        width: age, is_first_line, then the group_* flags.
+        """
+        scaler = encoders['age']
+        if numerical_columns is None:
+            default = ['age', 'is_first_line'] + [f'group_{group}' for group in CONDITION_GROUPS]
+            numerical_columns = default[:len(scaler.mean_)]
+
+        categories = {name: _json_values(encoders[name].categories_[0])
+                      for name in CATEGORICAL_FEATURES if name in encoders}
+        if first_line is not None and hasattr(first_line, 'itertuples'):
+            first_line = first_line.iloc[:, :2].itertuples(index=False, name=None)
+
+        return cls(numerical_columns, scaler.mean_, scaler.scale_, categories, first_line, med_classes)
+
+    def to_dict(self):
+        """Describe the pipeline as plain JSON data"""
+        return {
+            "numerical_columns": self.numerical_columns,
+            "mean": self.mean.tolist(),
+            "scale": self.scale.tolist(),
+            "categories": self.categories,
+            "first_line": [list(pair) for pair in self.first_line],
+            "med_classes": self.med_classes,
+            "condition_groups": self.condition_groups
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild a pipeline from to_dict output"""
+        return cls(data["numerical_columns"], data["mean"], data["scale"], data["categories"],
+                   [tuple(pair) for pair in data["first_line"]], data["med_classes"], data["condition_groups"])
+
+    def __getstate__(self):
+        # Pickle only the schema and tables; the lookups are rebuilt on load
+        return self.to_dict()
+
+    def __setstate__(self, state):
+        self.__dict__.update(FeaturePipeline.from_dict(state).__dict__)
+
+    @property
+    def columns(self):
+        """Feature names in matrix column order"""
+        names = list(self.numerical_columns)
+        for name, values in self.categories.items():
+            names.extend(f'{name}_{value}' for value in values)
+        return names
+
+    @property
+    def schema(self):
+        """Input, derived and output columns of the pipeline"""
+        return {
+            "inputs": list(INPUT_COLUMNS),
+            "derived": [column for column in self.numerical_columns + list(self.categories)
+                        if column not in INPUT_COLUMNS],
+            "features": self.columns
+        }
+
+    def validate(self, data):
+        """Raise ValueError if a record DataFrame lacks required input columns"""
+        missing = [column for column in INPUT_COLUMNS if column not in data.columns]
+        if missing:
+            raise ValueError(f"Missing feature columns: {', '.join(missing)}")
+
+    def derive(self, data):
+        """Return data with any missing derived columns added"""
+        self.validate(data)
+        missing = [column for column in self.schema["derived"] if column not in data.columns]
+        if not missing:
+            return data
+
+        data = data.copy()
+        diagnosis = pd.factorize(data['diagnosis'], use_na_sentinel=False)
+
+        if 'is_first_line' in missing:
+            medication = pd.factorize(data['medication'], use_na_sentinel=False)
+            pairs = pd.DataFrame(self.first_line, columns=['diagnosis', 'medication'])
+            data['is_first_line'] = pair_membership(diagnosis, medication, pairs)
+
+        groups = {f'group_{group}': conditions for group, conditions in self.condition_groups.items()
+                  if f'group_{group}' in missing}
+        if groups:
+            flags = condition_group_flags(diagnosis, {column[len('group_'):]: conditions
+                                                      for column, conditions in groups.items()})
+            for column, values in flags.items():
+                data[column] = values
+
+        if 'med_class' in missing:
+            data['med_class'] = data['medication'].map(self.med_classes).fillna(UNKNOWN_CLASS)
+        if 'age_group' in missing:
+            data['age_group'] = age_groups(data['age'])
+
+        return data
+
+    def transform(self, data):
+        """Transform a DataFrame of records into the feature matrix"""
+        data = self.derive(data)
+        X = np.zeros((len(data), self.n_features))
+
+        numerical = data[self.numerical_columns].fillna(0).to_numpy(dtype=np.float64)
+        X[:, :len(self.numerical_columns)] = (numerical - self.mean) / self.scale
+
+        for name, values in self.categories.items():
+            # Unknown values (code -1) encode as all zeros
+            codes = pd.Index(values).get_indexer(np.asarray(data[name], dtype=object))
+            rows = np.flatnonzero(codes >= 0)
+            X[rows, self.offsets[name] + codes[rows]] = 1.0
+
+        return X
+
+    def _numerical_row(self, age, diagnosis, is_first_line):
+        """Unscaled numerical features of one record"""
+        values = {'age': age, 'is_first_line': float(is_first_line)}
+        for group, conditions in self.condition_groups.items():
+            values[f'group_{group}'] = 1.0 if diagnosis in conditions else 0.0
+        return np.array([values.get(column, 0.0) for column in self.numerical_columns], dtype=np.float64)
+
+    def transform_row(self, age, gender, diagnosis, medication, is_first_line=None):
+        """Transform one record into a (1, n_features) matrix without pandas"""
+        if is_first_line is None:
+            is_first_line = (diagnosis, medication) in self.first_line_pairs
+
+        X = np.zeros((1, self.n_features))
+        X[0, :len(self.numerical_columns)] = (self._numerical_row(age, diagnosis, is_first_line) - self.mean) / self.scale
+
+        values = {
+            'gender': gender,
+            'diagnosis': diagnosis,
+            'medication': medication,
+            'med_class': self.med_classes.get(medication, UNKNOWN_CLASS),
+            'age_group': age_group(age)
+        }
+        for name in self.categories:
+            column = self.index[name].get(values[name])
+            if column is not None:
+                X[0, self.offsets[name] + column] = 1.0
+        return X
+
+    def transform_candidates(self, age, gender, diagnosis, is_first_line=None):
+        """Feature matrix with one row per medication for one patient
+
+        Patient columns are tiled and the medication columns come from the
+        precomputed per-medication blocks.
+
+        Args:
+            age: Patient age
+            gender: Patient gender
+            diagnosis: Diagnosis to score the medications against
+            is_first_line: Optional first-line flags per medication (defaults
+                to the pipeline's first-line table)
+        """
+        n_medications = len(self.medications)
+        if is_first_line is None:
+            is_first_line = self.first_line_masks.get(diagnosis, np.zeros(n_medications, dtype=bool))
+
+        numerical = np.tile(self._numerical_row(age, diagnosis, 0.0), (n_medications, 1))
+        if 'is_first_line' in self.numerical_columns:
+            numerical[:, self.numerical_columns.index('is_first_line')] = is_first_line
+
+        X = np.zeros((n_medications, self.n_features))
+        X[:, :len(self.numerical_columns)] = (numerical - self.mean) / self.scale
+
+        values = {'gender': gender, 'diagnosis': diagnosis, 'age_group': age_group(age)}
+        for name in self.categories:
+            offset = self.offsets[name]
+            if name in self.medication_blocks:
+                block = self.medication_blocks[name]
+                X[:, offset:offset + block.shape[1]] = block
+            else:
+                column = self.index[name].get(values[name])
+                if column is not None:
+                    X[:, offset + column] = 1.0
+        return X
+
+def pipeline_for(encoders, data_dir=DATA_DIR):
+    """Return the pipeline saved with the encoders, or rebuild it from them
+
+    Encoders from before the pipeline was saved get their first-line and
+    drug class tables from the data files.
+    """
+    if 'pipeline' in encoders:
+        return encoders['pipeline']
+    return FeaturePipeline.from_encoders(encoders, first_line=load_first_line_pairs(data_dir),
+                                         med_classes=load_med_classes(data_dir))
+
+def _legacy_transform(encoders, data):
+    """The hand-built matrix train_models.evaluate_model used, kept for the benchmark"""
+    numerical_features = ['age', 'is_first_line'] + [col for col in data.columns if col.startswith('group_')]
+    feature_parts = [
+        encoders['age'].transform(data[numerical_features].fillna(0)),
+        encoders['gender'].transform(data[['gender']]),
+        encoders['diagnosis'].transform(data[['diagnosis']]),
+        encoders['medication'].transform(data[['medication']])
+    ]
+    for feature in ['med_class', 'age_group']:
+        if feature in encoders:
+            feature_parts.append(encoders[feature].transform(data[[feature]]))
+    return np.hstack(feature_parts)
+
+def benchmark(n_rows=10000, n_single=1000, models_dir=MODELS_DIR, data_dir=DATA_DIR):
+    """Time the batch and single-row paths against the hand-built sklearn transforms
+
+    Args:
+        n_rows: Rows in the batch transform
+        n_single: Number of single-row transforms to time
+        models_dir: Directory with encoders.pkl
+        data_dir: Directory with treatment_data.csv
+
+    Returns:
+        Dictionary of timings and maximum differences
+    """
+    import io
+    import pickle
+    import contextlib
+    from train_models import enhance_training_data
+
+    with open(Path(models_dir) / "encoders.pkl", "rb") as f:
+        encoders = pickle.load(f)
+    pipeline = pipeline_for(encoders, data_dir)
+
+    base = pd.read_csv(Path(data_dir) / "treatment_data.csv")
+    rng = np.random.default_rng(42)
+    with contextlib.redirect_stdout(io.StringIO()):
+        data = enhance_training_data(base.iloc[rng.integers(0, len(base), n_rows)].reset_index(drop=True))
+    raw = data[INPUT_COLUMNS]
+    results = {}
+
+    start = time.perf_counter()
+    legacy = _legacy_transform(encoders, data)
+    results['legacy_batch_s'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    X = pipeline.transform(data)
+    results['batch_s'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    X_raw = pipeline.transform(raw)
+    results['raw_batch_s'] = time.perf_counter() - start
+
+    results['batch_diff'] = float(np.max(np.abs(X - legacy)))
+    results['raw_batch_diff'] = float(np.max(np.abs(X_raw - legacy)))
+
+    records = data.iloc[:n_single]
+    start = time.perf_counter()
+    for i in range(len(records)):
+        _legacy_transform(encoders, records.iloc[i:i + 1])
+    results['legacy_row_us'] = (time.perf_counter() - start) / len(records) * 1e6
+
+    rows = list(records[INPUT_COLUMNS].itertuples(index=False, name=None))
+    start = time.perf_counter()
+    single = [pipeline.transform_row(*row) for row in rows]
+    results['row_us'] = (time.perf_counter() - start) / len(rows) * 1e6
+    results['row_diff'] = float(np.max(np.abs(np.vstack(single) - legacy[:len(rows)])))
+
+    start = time.perf_counter()
+    for age, gender, diagnosis, _ in rows[:100]:
+        pipeline.transform_candidates(age, gender, diagnosis)
+    results['candidates_us'] = (time.perf_counter() - start) / min(len(rows), 100) * 1e6
+
+    print(f"Feature pipeline: {pipeline.n_features} features, {len(pipeline.medications)} medications")
+    print(f"  Batch ({n_rows} rows): hand-built {results['legacy_batch_s'] * 1000:.1f} ms, "
+          f"pipeline {results['batch_s'] * 1000:.1f} ms (raw records {results['raw_batch_s'] * 1000:.1f} ms)")
+    print(f"  Single row: hand-built {results['legacy_row_us']:.0f} us, pipeline {results['row_us']:.1f} us")
+    print(f"  One patient x all medications: {results['candidates_us']:.1f} us")
+    print(f"  Max difference vs hand-built: batch {results['batch_diff']:.1e}, "
+          f"raw {results['raw_batch_diff']:.1e}, single row {results['row_diff']:.1e}")
+
+    return results
+
+if __name__ == "__main__":
+    # Usage: python feature_pipeline.py [n_rows]
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
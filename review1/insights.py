@@ -0,0 +1,254 @@
+import re
+import sys
+import json
+import time
+import hashlib
+import threading
+import requests
+from pathlib import Path
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from requests.adapters import HTTPAdapter
+
+# Constants
+DEFAULT_MODEL = "anthropic/claude-3-sonnet"
+CONNECT_TIMEOUT = 3.05
+READ_TIMEOUT = 30
+MAX_WORKERS = 4
+MAX_CACHED_INSIGHTS = 1024
+KEY_PATTERN = re.compile(r"[0-9a-f]{64}")
+UNAVAILABLE_MESSAGE = "AI insights not available at this time."
+PENDING_MESSAGE = "AI insights are being generated."
+
+def prompt_key(model, prompt):
+    """Content address of a prompt: SHA-256 of the model and prompt text"""
+    return hashlib.sha256(f"{model}\n{prompt}".encode("utf-8")).hexdigest()
+
+class InsightsClient:
+    """Asynchronous, cached client for the chat completions API
+
+    Requests run on a small thread pool over one pooled HTTP session, so
+    callers get a key back immediately and collect the text later. Results
+    are cached by prompt key in memory and, optionally, as JSON files in
+    cache_dir so repeated prompts never hit the network.
+    """
+
+    def __init__(self, api_url, api_key, model=DEFAULT_MODEL, cache_dir=None,
+                 timeout=(CONNECT_TIMEOUT, READ_TIMEOUT), max_workers=MAX_WORKERS):
+        """Initialize client
+
+        Args:
+            api_url: Chat completions endpoint
+            api_key: Bearer token
+            model: Model name sent with every request
+            cache_dir: Optional directory for the on-disk cache
+            timeout: (connect, read) timeout in seconds for each request
+            max_workers: Maximum concurrent requests
+        """
+        self.api_url = api_url
+        self.model = model
+        self.timeout = timeout
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        if self.cache_dir:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        self.session = requests.Session()
+        self.session.headers.update({
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        })
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="insights")
+        self.cache = OrderedDict()
+        self.pending = {}
+        self.lock = threading.Lock()
+
+    def _cache_path(self, key):
+        # Keys may come from clients, so only well-formed hashes map to files
+        if not self.cache_dir or not KEY_PATTERN.fullmatch(key):
+            return None
+        return self.cache_dir / f"{key}.json"
+
+    def cached(self, key):
+        """Return cached insights for a key, or None"""
+        with self.lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                return self.cache[key]
+
+        path = self._cache_path(key)
+        if path and path.exists():
+            with open(path, "r") as f:
+                content = json.load(f)["content"]
+            self._store(key, content, persist=False)
+            return content
+        return None
+
+    def _store(self, key, content, persist=True):
+        with self.lock:
+            self.cache[key] = content
+            self.cache.move_to_end(key)
+            while len(self.cache) > MAX_CACHED_INSIGHTS:
+                self.cache.popitem(last=False)
+
+        path = self._cache_path(key)
+        if persist and path:
+            with open(path, "w") as f:
+                json.dump({"model": self.model, "content": content}, f)
+
+    def _request(self, key, prompt):
+        """Call the API and cache the answer (runs on the thread pool)"""
+        try:
+            response = self.session.post(self.api_url, json={
+                "model": self.model,
+                "messages": [{"role": "user", "content": prompt}]
+            }, timeout=self.timeout)
+            result = response.json()
+
+            if 'choices' in result and len(result['choices']) > 0:
+                content = result['choices'][0]['message']['content']
+                self._store(key, content)
+                return content
+
+            print(f"Unexpected API response format: {result}")
+            return None
+        except Exception as e:
+            print(f"Error getting AI insights: {e}")
+            return None
+        finally:
+            with self.lock:
+                self.pending.pop(key, None)
+
+    def submit(self, prompt):
+        """Start fetching insights for a prompt without waiting
+
+        Returns:
+            Prompt key to pass to result()
+        """
+        key = prompt_key(self.model, prompt)
+        if self.cached(key) is not None:
+            return key
+
+        with self.lock:
+            # Another caller may have started (or already finished and cached)
+            # the same request since the lookup above; reuse it
+            if key not in self.pending and key not in self.cache:
+                self.pending[key] = self.executor.submit(self._request, key, prompt)
+        return key
+
+    def status(self, key):
+        """Return 'ready', 'pending' or 'unavailable' for a prompt key"""
+        if self.cached(key) is not None:
+            return "ready"
+        with self.lock:
+            return "pending" if key in self.pending else "unavailable"
+
+    def result(self, key, timeout=0):
+        """Return insights for a key, waiting up to timeout seconds
+
+        Returns:
+            Insight text, or None if not ready in time or the request failed
+
+        Raises:
+            ValueError: if timeout is negative or NaN
+        """
+        if not timeout >= 0:
+            raise ValueError(f"timeout must be a non-negative number of seconds, got {timeout!r}")
+
+        content = self.cached(key)
+        if content is not None:
+            return content
+
+        with self.lock:
+            future = self.pending.get(key)
+        if future is None:
+            # The request may have finished (and been cached) since the lookup above
+            return self.cached(key)
+
+        try:
+            return future.result(timeout=timeout)
+        except Exception:
+            return None
+
+    def close(self):
+        """Stop the worker threads and close pooled connections"""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
+
+class MockCompletionsHandler(BaseHTTPRequestHandler):
+    """Local stand-in for the chat completions API
+
+    Replies after `delay` seconds with the prompt length in the content and
+    counts the requests it served.
+    """
+
+    delay = 0.0
+    requests_served = 0
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length))
+        time.sleep(self.delay)
+        type(self).requests_served += 1
+
+        prompt = payload["messages"][0]["content"]
+        body = json.dumps({
+            "choices": [{"message": {"content": f"Mock insights for a {len(prompt)}-character prompt"}}]
+        }).encode("utf-8")
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except BrokenPipeError:
+            # The client gave up (read timeout) before the reply was ready
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+def start_mock_server(delay=0.0):
+    """Start a mock completions server on a free local port
+
+    Returns:
+        (server, url, handler class); call server.shutdown() when done
+    """
+    handler = type("MockHandler", (MockCompletionsHandler,), {"delay": delay, "requests_served": 0})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/api/v1/chat/completions", handler
+
+def self_check(delay=0.5):
+    """Exercise the client against a local mock server (no network needed)"""
+    server, url, handler = start_mock_server(delay)
+    client = InsightsClient(url, "test-key", timeout=(1, delay + 1))
+
+    try:
+        start = time.perf_counter()
+        key = client.submit("Explain the treatment plan")
+        submit_ms = (time.perf_counter() - start) * 1000
+        print(f"submit returned in {submit_ms:.1f} ms (upstream delay {delay:.1f}s), status {client.status(key)}")
+
+        print(f"result with 0s timeout: {client.result(key, timeout=0)!r}")
+        print(f"result with 5s timeout: {client.result(key, timeout=5)!r}")
+
+        start = time.perf_counter()
+        client.submit("Explain the treatment plan")
+        print(f"cached result in {(time.perf_counter() - start) * 1000:.2f} ms, "
+              f"upstream requests served: {handler.requests_served}")
+
+        slow = InsightsClient(url, "test-key", timeout=(1, delay / 10))
+        slow_key = slow.submit("Another prompt")
+        print(f"read timeout shorter than upstream: {slow.result(slow_key, timeout=5)!r}")
+        slow.close()
+    finally:
+        client.close()
+        server.shutdown()
+
+if __name__ == "__main__":
+    self_check(float(sys.argv[1]) if len(sys.argv) > 1 else 0.5)
@@ -0,0 +1,155 @@
+import json
+import numpy as np
+from pathlib import Path
+
+from tree_engine import CompiledEnsemble
+from feature_pipeline import FeaturePipeline
+
+# Constants
+MODELS_DIR = Path("./models")
+EXPORT_DIR = MODELS_DIR / "export"
+FORMAT_VERSION = 1
+
+class OneHotVocabulary:
+    """One-hot encoder rebuilt from an exported vocabulary
+
+    Mirrors the parts of sklearn's OneHotEncoder(handle_unknown='ignore') that
+    the recommender uses: ``categories_`` and ``transform``.
+    """
+
+    def __init__(self, categories):
+        self.categories_ = [np.array(categories, dtype=object)]
+        self.index = {category: i for i, category in enumerate(categories)}
+
+    def transform(self, X):
+        """One-hot encode a column of values (unknown values encode as zeros)"""
+        values = np.asarray(X, dtype=object).reshape(-1)
+        encoded = np.zeros((len(values), len(self.index)))
+        for row, value in enumerate(values):
+            column = self.index.get(value)
+            if column is not None:
+                encoded[row, column] = 1.0
+        return encoded
+
+class Scaler:
+    """Standard scaler rebuilt from exported mean and scale vectors"""
+
+    def __init__(self, mean, scale):
+        self.mean_ = np.asarray(mean, dtype=np.float64)
+        self.scale_ = np.asarray(scale, dtype=np.float64)
+
+    def transform(self, X):
+        """Standardize features"""
+        return (np.asarray(X, dtype=np.float64) - self.mean_) / self.scale_
+
+class LinearModel:
+    """Linear regression rebuilt from exported coefficients"""
+
+    def __init__(self, coef, intercept):
+        self.coef_ = np.asarray(coef, dtype=np.float64)
+        self.intercept_ = float(intercept)
+        self.n_features_in_ = len(self.coef_)
+
+    def predict(self, X):
+        """Predict targets for a 2-D feature matrix"""
+        return np.asarray(X, dtype=np.float64) @ self.coef_ + self.intercept_
+
+class XGBoostModel:
+    """XGBoost booster loaded from its native UBJ/JSON format"""
+
+    def __init__(self, path):
+        import xgboost as xgb
+
+        self.booster = xgb.Booster()
+        self.booster.load_model(str(path))
+        self.n_features_in_ = self.booster.num_features()
+
+    def predict(self, X):
+        """Predict targets for a 2-D feature matrix"""
+        return self.booster.inplace_predict(np.asarray(X, dtype=np.float32))
+
+class AveragedModel:
+    """Mean prediction of several models, e.g. the fold models of a cross-validation"""
+
+    def __init__(self, members):
+        self.members = list(members)
+        self.n_features_in_ = self.members[0].n_features_in_
+
+    @property
+    def feature_importances_(self):
+        """Mean feature importances of the members"""
+        if not all(hasattr(member, "feature_importances_") for member in self.members):
+            raise AttributeError("feature_importances_")
+        return np.mean([member.feature_importances_ for member in self.members], axis=0)
+
+    def predict(self, X):
+        """Predict targets for a 2-D feature matrix"""
+        return np.mean([member.predict(X) for member in self.members], axis=0)
+
+def load_tree_ensemble(path):
+    """Load a compiled tree ensemble from an exported .npz file"""
+    with np.load(path) as arrays:
+        return CompiledEnsemble.from_arrays(arrays)
+
+def load_model(entry, export_dir=EXPORT_DIR):
+    """Rebuild one model from its manifest entry"""
+    model_type = entry["type"]
+    if model_type == "averaged":
+        return AveragedModel([load_model(member, export_dir) for member in entry["members"]])
+
+    path = Path(export_dir) / entry["file"]
+    if model_type == "tree_ensemble":
+        return load_tree_ensemble(path)
+    if model_type == "linear":
+        with np.load(path) as arrays:
+            return LinearModel(arrays["coef"], arrays["intercept"])
+    if model_type == "xgboost":
+        return XGBoostModel(path)
+
+    raise ValueError(f"Unknown exported model type: {model_type}")
+
+def load_encoder(entry):
+    """Rebuild one encoder from its exported description"""
+    if entry["type"] == "onehot":
+        return OneHotVocabulary(entry["categories"])
+    if entry["type"] == "scaler":
+        return Scaler(entry["mean"], entry["scale"])
+    if entry["type"] == "list":
+        return entry["values"]
+    if entry["type"] == "pipeline":
+        return FeaturePipeline.from_dict(entry["schema"])
+
+    raise ValueError(f"Unknown exported encoder type: {entry['type']}")
+
+def exported_models_available(export_dir=EXPORT_DIR):
+    """Check whether an export with a supported format version exists"""
+    manifest_path = Path(export_dir) / "manifest.json"
+    if not manifest_path.exists():
+        return False
+    with open(manifest_path, "r") as f:
+        return json.load(f).get("format_version") == FORMAT_VERSION
+
+def load_exported(export_dir=EXPORT_DIR):
+    """Load exported models and encoders without unpickling anything
+
+    Args:
+        export_dir: Directory written by export_models.py
+
+    Returns:
+        (models, encoders) dictionaries shaped like models.pkl and encoders.pkl
+    """
+    export_dir = Path(export_dir)
+    with open(export_dir / "manifest.json", "r") as f:
+        manifest = json.load(f)
+
+    if manifest.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported export format version: {manifest.get('format_version')}")
+
+    models = {name: load_model(entry, export_dir) for name, entry in manifest["models"].items()}
+    for name, entry in manifest.get("model_encoders", {}).items():
+        models[name] = load_encoder(entry)
+
+    with open(export_dir / "encoders.json", "r") as f:
+        encoders = {name: load_encoder(entry) for name, entry in json.load(f).items()}
+
+    return models, encoders
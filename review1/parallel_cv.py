@@ -0,0 +1,161 @@
+import sys
+import time
+import tempfile
+import contextlib
+import io
+import numpy as np
+from pathlib import Path
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.model_selection import KFold
+from sklearn.metrics import r2_score
+
+from lightweight_models import AveragedModel
+
+# Constants
+N_SPLITS = 5
+# The candidate models are tree ensembles, which convert features to float32
+# before fitting; storing folds in that dtype lets fit() use them uncopied
+FOLD_DTYPE = np.float32
+
+def shared_folds(X, splits, directory, dtype=FOLD_DTYPE):
+    """Write every fold's train rows and test rows as contiguous blocks of one
+    .npy file and reopen it read-only memory-mapped
+
+    joblib passes memory-mapped arrays to its worker processes by file name,
+    so every worker reads the same pages instead of receiving a pickled copy.
+    Indexing a memmap with an index array copies the rows into the worker, so
+    each fold is laid out in advance and workers only take slices (views).
+
+    Returns:
+        Tuple of (memory-mapped matrix, list of (train slice, test slice))
+    """
+    path = Path(directory) / "folds.npy"
+    n_rows = sum(len(train_index) + len(test_index) for train_index, test_index in splits)
+    folds = np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=(n_rows, X.shape[1]))
+    slices = []
+    start = 0
+    for train_index, test_index in splits:
+        train = slice(start, start + len(train_index))
+        test = slice(train.stop, train.stop + len(test_index))
+        np.take(X, train_index, axis=0, out=folds[train])
+        np.take(X, test_index, axis=0, out=folds[test])
+        slices.append((train, test))
+        start = test.stop
+    folds.flush()
+    del folds
+    return np.load(path, mmap_mode="r"), slices
+
+def _fit_fold(name, fold, estimator, X_folds, y, train_index, test_index, train, test, keep_model):
+    """Fit and score one model on one fold (runs in a joblib worker)"""
+    start = time.perf_counter()
+    model = clone(estimator)
+    model.fit(X_folds[train], y[train_index])
+    fit_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    score = r2_score(y[test_index], model.predict(X_folds[test]))
+    score_seconds = time.perf_counter() - start
+
+    return {
+        "name": name,
+        "fold": fold,
+        "r2": score,
+        "fit_seconds": fit_seconds,
+        "score_seconds": score_seconds,
+        "model": model if keep_model else None
+    }
+
+def cross_validate_models(models, X, y, n_splits=N_SPLITS, n_jobs=-1, keep_models=False):
+    """Cross-validate several models in parallel over models x folds
+
+    The fold splits are computed once and shared by all models. They are the
+    same unshuffled KFold splits cross_val_score(cv=n_splits) uses for
+    regressors, with the rows in the same order, so the scores match the
+    serial version.
+
+    Args:
+        models: Dictionary of name -> unfitted estimator
+        X: Feature matrix
+        y: Target vector
+        n_splits: Number of folds
+        n_jobs: joblib worker count (-1 uses all cores)
+        keep_models: Return the fitted fold models (needed to average them)
+
+    Returns:
+        Dictionary of name -> {'mean_r2', 'std_r2', 'fold_r2', 'fold_seconds',
+        'fold_models'}
+    """
+    splits = list(KFold(n_splits=n_splits).split(X))
+    X = np.asarray(X)
+    y = np.asarray(y)
+
+    with tempfile.TemporaryDirectory(prefix="cv_") as directory:
+        X_folds, slices = shared_folds(X, splits, directory)
+        fold_results = Parallel(n_jobs=n_jobs)(
+            delayed(_fit_fold)(name, fold, model, X_folds, y, train_index, test_index, train, test, keep_models)
+            for name, model in models.items()
+            for fold, ((train_index, test_index), (train, test)) in enumerate(zip(splits, slices))
+        )
+        del X_folds
+
+    results = {}
+    for name in models:
+        folds = sorted((r for r in fold_results if r["name"] == name), key=lambda r: r["fold"])
+        scores = np.array([r["r2"] for r in folds])
+        results[name] = {
+            "mean_r2": scores.mean(),
+            "std_r2": scores.std(),
+            "fold_r2": scores.tolist(),
+            "fold_seconds": [r["fit_seconds"] + r["score_seconds"] for r in folds],
+            "fold_models": [r["model"] for r in folds] if keep_models else None
+        }
+    return results
+
+def print_fold_timings(results):
+    """Print per-fold R² and seconds for every model"""
+    for name, result in results.items():
+        folds = ", ".join(f"{score:.3f} ({seconds:.1f}s)"
+                          for score, seconds in zip(result["fold_r2"], result["fold_seconds"]))
+        print(f"  {name} folds: {folds}")
+
+def average_fold_models(result):
+    """Build one model that averages the fold models of a cross-validation result"""
+    if not result.get("fold_models"):
+        raise ValueError("Cross-validation was run without keep_models=True")
+    return AveragedModel(result["fold_models"])
+
+def benchmark(n_jobs=-1):
+    """Time serial cross_val_score against the parallel version on the training data
+
+    Returns:
+        Dictionary with serial and parallel seconds and whether the scores match
+    """
+    from sklearn.model_selection import cross_val_score
+    from train_models import DATA_DIR, enhance_training_data, build_training_matrix, candidate_models
+    import pandas as pd
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        data = enhance_training_data(pd.read_csv(DATA_DIR / "treatment_data.csv"))
+        X, y, _ = build_training_matrix(data)
+    models = candidate_models()
+    print(f"Feature matrix {X.shape}, {len(models)} models x {N_SPLITS} folds")
+
+    start = time.perf_counter()
+    serial = {name: cross_val_score(model, X, y, cv=N_SPLITS, scoring='r2') for name, model in models.items()}
+    serial_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    parallel = cross_validate_models(models, X, y, n_jobs=n_jobs)
+    parallel_seconds = time.perf_counter() - start
+
+    identical = all(np.allclose(serial[name], parallel[name]["fold_r2"]) for name in models)
+    print(f"  Serial cross_val_score: {serial_seconds:.2f}s")
+    print(f"  Parallel (n_jobs={n_jobs}): {parallel_seconds:.2f}s, same fold scores: {identical}")
+    print_fold_timings(parallel)
+
+    return {"serial_seconds": serial_seconds, "parallel_seconds": parallel_seconds, "identical": identical}
+
+if __name__ == "__main__":
+    # Usage: python parallel_cv.py [n_jobs]
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else -1)
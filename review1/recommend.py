@@ -1,11 +1,18 @@
 import os
+import sys
 import pickle
 import json
 import numpy as np
 import pandas as pd
-import requests
 from pathlib import Path
 from dotenv import load_dotenv
+from lightweight_models import exported_models_available, load_exported
+from tree_engine import compile_models
+from allergen_matcher import AllergenMatcher
+from diagnosis_index import DiagnosisIndex
+from catalog import DrugCatalog
+from feature_pipeline import pipeline_for
+from insights import InsightsClient, PENDING_MESSAGE, UNAVAILABLE_MESSAGE
 
 # Load environment variables (for API key)
 load_dotenv()
@@ -13,24 +20,52 @@ load_dotenv()
 # Constants
 DATA_DIR = Path("./data")
 MODELS_DIR = Path("./models")
+EXPORT_DIR = MODELS_DIR / "export"
 KIMI_API_KEY = os.getenv("KIMI_API_KEY", "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")
-KIMI_API_URL = "https://openrouter.ai/api/v1/chat/completions"
+KIMI_API_URL = os.getenv("KIMI_API_URL", "https://openrouter.ai/api/v1/chat/completions")
+INSIGHTS_CACHE_DIR = DATA_DIR / "insights_cache"
+INSIGHTS_TIMEOUT = 60
+
+# Fallback symptom keywords when no diagnosis name matches
+SYMPTOM_KEYWORDS = {
+    'fever': ['Influenza', 'Pneumonia', 'Common Cold'],
+    'cough': ['Bronchitis', 'Pneumonia', 'Common Cold', 'COPD'],
+    'headache': ['Migraine', 'Hypertension', 'Common Cold'],
+    'pain': ['Osteoarthritis', 'Migraine'],
+    'rash': ['Allergic Rhinitis', 'Urticaria'],
+    'breath': ['Asthma', 'COPD', 'Heart failure'],
+    'chest': ['Heart failure', 'Pneumonia'],
+    'blood pressure': ['Hypertension'],
+    'sugar': ['Type 2 Diabetes'],
+    'nausea': ['Gastroenteritis'],
+    'diarrhea': ['Gastroenteritis'],
+    'anxiety': ['Anxiety'],
+    'depression': ['Depression'],
+    'sad': ['Depression']
+}
 
 class TreatmentRecommender:
     def __init__(self):
         """Initialize the treatment recommender system"""
         # Check if models exist
-        if not os.path.exists(MODELS_DIR / "models.pkl") or not os.path.exists(MODELS_DIR / "encoders.pkl"):
+        use_export = exported_models_available(EXPORT_DIR)
+        if not use_export and (not os.path.exists(MODELS_DIR / "models.pkl") or not os.path.exists(MODELS_DIR / "encoders.pkl")):
             print("Error: Model files not found. Please run train_models.py first.")
             exit(1)
             
-        # Load models and encoders
+        # Load models and encoders (the pickle-free export loads faster when present)
         try:
-            with open(MODELS_DIR / "models.pkl", "rb") as f:
-                self.models = pickle.load(f)
-            
-            with open(MODELS_DIR / "encoders.pkl", "rb") as f:
-                self.encoders = pickle.load(f)
+            if use_export:
+                self.models, self.encoders = load_exported(EXPORT_DIR)
+            else:
+                with open(MODELS_DIR / "models.pkl", "rb") as f:
+                    self.models = pickle.load(f)
+                
+                # Single-row predictions are much faster on the compiled ensembles
+                self.models = compile_models(self.models)
+                
+                with open(MODELS_DIR / "encoders.pkl", "rb") as f:
+                    self.encoders = pickle.load(f)
                 
             print("Models and encoders loaded successfully.")
         except Exception as e:
@@ -69,21 +104,38 @@ class TreatmentRecommender:
         try:
             self.first_line_treatments = pd.read_csv(DATA_DIR / "first_line_treatments.csv")
             print(f"Loaded {len(self.first_line_treatments)} first-line treatment records.")
-            
-            # Create a mapping for easy lookup
-            self.first_line_map = {}
-            for _, row in self.first_line_treatments.iterrows():
-                condition = row['condition']
-                medication = row['medication']
-                if condition not in self.first_line_map:
-                    self.first_line_map[condition] = []
-                self.first_line_map[condition].append(medication)
         except:
             print("First-line treatment data not available.")
             self.first_line_treatments = None
-            self.first_line_map = {}
         
-    def get_recommendations(self, patient_info):
+        # Feature pipeline saved with the model (precomputes the per-medication blocks)
+        self.pipeline = pipeline_for(self.encoders, DATA_DIR)
+        self.all_medications = self.pipeline.medications
+        print(f"Found {len(self.all_medications)} medications in encoder.")
+        
+        # Columnar side-effect, drug class and first-line lookups
+        try:
+            diagnoses = list(self.encoders['diagnosis'].categories_[0])
+        except Exception:
+            diagnoses = []
+        self.catalog = DrugCatalog(self.all_medications, diagnoses, self.side_effects, self.drugs,
+                                   self.first_line_treatments)
+        print(f"Built drug catalog ({self.catalog.memory_usage()['total'] / 1024:.1f} KiB).")
+        
+        # Pooled, cached client for AI insights
+        self.insights = InsightsClient(KIMI_API_URL, KIMI_API_KEY, cache_dir=INSIGHTS_CACHE_DIR)
+        
+        # Index diagnosis names for symptom matching
+        try:
+            self.diagnosis_index = DiagnosisIndex(self.encoders['diagnosis'].categories_[0])
+        except Exception as e:
+            print(f"Error indexing diagnoses: {e}")
+            self.diagnosis_index = DiagnosisIndex([])
+        
+        # Compile contraindication and ingredient text for allergy matching
+        self.allergen_matcher = AllergenMatcher(self.contraindications, self.drugs)
+        
+    def get_recommendations(self, patient_info, include_insights=True):
         """Generate treatment recommendations based on patient information"""
         # Extract patient data
         age = patient_info["age"]
@@ -102,112 +154,53 @@ class TreatmentRecommender:
         print(f"Matched symptoms to diagnosis: {diagnosis}")
         
         # Check for first-line treatments for this diagnosis
-        first_line_options = []
-        if diagnosis in self.first_line_map:
-            first_line_options = self.first_line_map[diagnosis]
+        all_medications = self.all_medications
+        is_first_line = self.catalog.first_line_mask(diagnosis, len(all_medications))
+        first_line_options = self.catalog.first_line_medications(diagnosis)
+        if first_line_options:
             print(f"Found {len(first_line_options)} first-line treatments for {diagnosis}")
         
-        # Prepare features for prediction
-        patient_features = self._prepare_patient_features(age, gender, diagnosis)
-        
-        # Get available medications for prediction
+        # Score every medication in one predict call
         try:
-            all_medications = list(self.encoders["medication"].categories_[0])
-            print(f"Found {len(all_medications)} medications in encoder.")
+            X = self.pipeline.transform_candidates(age, gender, diagnosis, is_first_line)
+            scores = np.asarray(self.models['recommendation'].predict(X), dtype=np.float64)
         except Exception as e:
-            print(f"Error getting medications from encoder: {e}")
-            # Fallback to a default list of common medications
-            all_medications = ["Amoxicillin", "Lisinopril", "Azithromycin", "Ibuprofen", "Loratadine", 
-                             "Metformin", "Citalopram", "Cetirizine"]
-            print(f"Using fallback list of {len(all_medications)} medications.")
+            print(f"Error scoring medications: {e}")
+            all_medications = []
+            is_first_line = np.zeros(0, dtype=bool)
+            scores = np.zeros(0)
+        
+        # Apply first-line treatment bonus (15%, capped at 1.0)
+        effectiveness = np.where(is_first_line, np.minimum(1.0, scores * 1.15), scores)
+        
+        # Check for contraindications based on allergies
+        conflicts = self.allergen_matcher.conflicts(allergies)
+        reasons = [conflicts.get(medication) for medication in all_medications]
+        contraindicated = np.array([reason is not None for reason in reasons], dtype=bool)
+        
+        # Sort by effectiveness (contraindicated meds at the bottom, stable for ties)
+        order = np.lexsort((-effectiveness, contraindicated))
         
-        # Predict effectiveness for each medication
         predictions = []
+        for i in order:
+            medication = all_medications[i]
+            predictions.append({
+                'medication': medication,
+                'drug_class': self.catalog.drug_class(medication),
+                'effectiveness': float(effectiveness[i]),
+                'is_first_line': bool(is_first_line[i]),
+                'contraindicated': bool(contraindicated[i]),
+                'contraindication_reason': reasons[i],
+                'interaction_warning': None,
+                'side_effects': None
+            })
         
-        for medication in all_medications:
-            try:
-                # Check medication details from drug database
-                med_info = self.drugs.get(medication, {})
-                med_class = med_info.get('drug_class', '')
-                
-                # Create medication feature
-                med_feature = np.zeros((1, len(all_medications)))
-                med_idx = np.where(np.array(all_medications) == medication)[0]
-                
-                if len(med_idx) > 0:
-                    med_feature[0, med_idx[0]] = 1
-                else:
-                    print(f"Warning: Medication '{medication}' not found in encoder index.")
-                    continue
-                
-                # Combine features
-                X = np.hstack([
-                    patient_features[:, :1],  # age
-                    patient_features[:, 1:3],  # gender
-                    patient_features[:, 3:],  # diagnosis
-                    med_feature
-                ])
-                
-                # Predict effectiveness
-                effectiveness = float(self.models['recommendation'].predict(X)[0])
-                
-                # Apply first-line treatment bonus
-                is_first_line = medication in first_line_options
-                if is_first_line:
-                    effectiveness = min(1.0, effectiveness * 1.15)  # 15% bonus for first-line
-                
-                # Check for contraindications based on allergies
-                contraindicated = False
-                contraindication_reason = None
-                
-                for allergy in allergies:
-                    if not allergy:  # Skip empty strings
-                        continue
-                        
-                    # Check if medication is contraindicated for this allergy
-                    contra_matches = self.contraindications[
-                        (self.contraindications['medication'] == medication) & 
-                        (self.contraindications['contraindication'].str.contains(allergy, case=False, na=False))
-                    ]
-                    
-                    if not contra_matches.empty:
-                        contraindicated = True
-                        contraindication_reason = f"Patient is allergic to {allergy}"
-                        break
-                    
-                    # Also check if medication contains the allergen in its ingredients
-                    if medication in self.drugs:
-                        ingredients = self.drugs[medication].get('ingredients', [])
-                        if any(allergy.lower() in ingredient.lower() for ingredient in ingredients):
-                            contraindicated = True
-                            contraindication_reason = f"Contains {allergy} or related compounds"
-                            break
-                
-                # Check for drug interactions with current medications
-                interaction_warning = None
-                for current_med in current_medications:
-                    # This is a simplified check - in a real system, you'd use a drug interaction database
-                    if medication == "Citalopram" and current_med in ["Sertraline", "Escitalopram", "Fluoxetine"]:
-                        interaction_warning = f"Potential serotonin syndrome risk with {current_med}"
-                    elif medication == "Ibuprofen" and current_med in ["Aspirin", "Naproxen", "Warfarin"]:
-                        interaction_warning = f"Increased bleeding risk with {current_med}"
-                
-                # Get side effects for this medication
-                side_effects = self._get_side_effects(medication)
-                
-                predictions.append({
-                    'medication': medication,
-                    'drug_class': med_class,
-                    'effectiveness': effectiveness,
-                    'is_first_line': is_first_line,
-                    'contraindicated': contraindicated,
-                    'contraindication_reason': contraindication_reason,
-                    'interaction_warning': interaction_warning,
-                    'side_effects': side_effects
-                })
-            except Exception as e:
-                print(f"Error processing medication '{medication}': {e}")
-                continue
+        # Interaction warnings and side effects are only needed for the rows that are returned
+        safe_predictions = [pred for pred in predictions if not pred['contraindicated']]
+        for pred in safe_predictions[:5] + predictions[:3]:
+            if pred['side_effects'] is None:
+                pred['interaction_warning'] = self._interaction_warning(pred['medication'], current_medications)
+                pred['side_effects'] = self._get_side_effects(pred['medication'])
         
         # If no predictions were made, return an error message
         if not predictions:
@@ -215,12 +208,10 @@ class TreatmentRecommender:
                 'diagnosis': diagnosis,
                 'recommendations': [],
                 'contraindications': [],
-                'ai_insights': "No recommendations could be generated. The model may need to be retrained."
+                'ai_insights': "No recommendations could be generated. The model may need to be retrained.",
+                'insights_key': None
             }
         
-        # Sort by effectiveness (contraindicated meds at the bottom)
-        predictions.sort(key=lambda x: (x['contraindicated'], -x['effectiveness']))
-        
         # Separate recommendations and contraindications
         recommendations = []
         contraindications = []
@@ -242,63 +233,34 @@ class TreatmentRecommender:
                     'side_effects': pred['side_effects']
                 })
         
-        # Get AI insights for the top recommendations
-        ai_insights = self._get_kimi_insights(symptoms, diagnosis, allergies, current_medications, predictions[:3])
+        # Request AI insights in the background (returned at once when cached)
+        if include_insights:
+            insights_key = self._get_kimi_insights(symptoms, diagnosis, allergies, current_medications, predictions[:3])
+            ai_insights = self.get_insights(insights_key)
+        else:
+            insights_key = None
+            ai_insights = "AI insights not requested."
         
         return {
             'diagnosis': diagnosis,
             'recommendations': recommendations[:5],  # Top 5 safe recommendations
             'contraindications': contraindications,
-            'ai_insights': ai_insights
+            'ai_insights': ai_insights,
+            'insights_key': insights_key
         }
     
     def _find_matching_diagnosis(self, symptoms):
         """Find the most likely diagnosis based on symptoms"""
         try:
-            # Get all possible diagnoses from the encoder
-            all_diagnoses = list(self.encoders['diagnosis'].categories_[0])
-            
-            # Search for exact matches first
-            for diagnosis in all_diagnoses:
-                if symptoms.lower() in diagnosis.lower():
-                    return diagnosis
-            
-            # Search for partial word matches
-            symptom_words = set(symptoms.lower().split())
-            best_match = None
-            best_score = -1
+            # Substring match first, then the best token overlap
+            match = self.diagnosis_index.best_match(symptoms)
+            if match is not None:
+                return match
             
-            for diagnosis in all_diagnoses:
-                diagnosis_words = set(diagnosis.lower().split())
-                # Count word overlap
-                overlap = len(symptom_words.intersection(diagnosis_words))
-                if overlap > best_score:
-                    best_score = overlap
-                    best_match = diagnosis
-            
-            if best_score > 0:
-                return best_match
-            
-            # If no match, use common symptom-condition mappings
-            symptom_map = {
-                'fever': ['Influenza', 'Pneumonia', 'Common Cold'],
-                'cough': ['Bronchitis', 'Pneumonia', 'Common Cold', 'COPD'],
-                'headache': ['Migraine', 'Hypertension', 'Common Cold'],
-                'pain': ['Osteoarthritis', 'Migraine'],
-                'rash': ['Allergic Rhinitis', 'Urticaria'],
-                'breath': ['Asthma', 'COPD', 'Heart failure'],
-                'chest': ['Heart failure', 'Pneumonia'],
-                'blood pressure': ['Hypertension'],
-                'sugar': ['Type 2 Diabetes'],
-                'nausea': ['Gastroenteritis'],
-                'diarrhea': ['Gastroenteritis'],
-                'anxiety': ['Anxiety'],
-                'depression': ['Depression'],
-                'sad': ['Depression']
-            }
+            all_diagnoses = self.diagnosis_index.diagnoses
             
             # Look for symptom keywords
-            for keyword, possible_diagnoses in symptom_map.items():
+            for keyword, possible_diagnoses in SYMPTOM_KEYWORDS.items():
                 if keyword in symptoms.lower():
                     # Return the first diagnosis that exists in our encoder
                     for diag in possible_diagnoses:
@@ -312,132 +274,78 @@ class TreatmentRecommender:
             print(f"Error matching diagnosis: {e}")
             return "Common Cold"  # Default fallback
     
-    def _prepare_patient_features(self, age, gender, diagnosis):
-        """Prepare patient features for prediction"""
-        # Scale age
-        try:
-            age_scaled = self.encoders['age'].transform([[age]])
-        except Exception as e:
-            print(f"Error scaling age: {e}")
-            # Fallback to unscaled age as a simple column vector
-            age_scaled = np.array([[age]]) / 100.0  # Simple scaling
-        
-        # Encode gender
-        try:
-            gender_encoded = self.encoders['gender'].transform([[gender]])
-        except Exception as e:
-            print(f"Error encoding gender: {e}")
-            # Fallback to simple one-hot encoding
-            gender_encoded = np.array([[1, 0]]) if gender == 'M' else np.array([[0, 1]])
-        
-        # Find most relevant diagnosis
-        try:
-            # Encode diagnosis
-            diagnosis_encoded = self.encoders['diagnosis'].transform([[diagnosis]])
-        except Exception as e:
-            print(f"Error processing diagnosis: {e}")
-            # Create a zero vector as fallback
-            try:
-                diagnosis_encoded = np.zeros((1, len(self.encoders['diagnosis'].categories_[0])))
-            except:
-                diagnosis_encoded = np.zeros((1, 10))  # Arbitrary size if we can't get the actual size
-        
-        # Combine features
-        features = np.hstack([age_scaled, gender_encoded, diagnosis_encoded])
-        return features
+    def _interaction_warning(self, medication, current_medications):
+        """Return a drug interaction warning for the current medications, or None"""
+        interaction_warning = None
+        for current_med in current_medications:
+            # This is a simplified check - in a real system, you'd use a drug interaction database
+            if medication == "Citalopram" and current_med in ["Sertraline", "Escitalopram", "Fluoxetine"]:
+                interaction_warning = f"Potential serotonin syndrome risk with {current_med}"
+            elif medication == "Ibuprofen" and current_med in ["Aspirin", "Naproxen", "Warfarin"]:
+                interaction_warning = f"Increased bleeding risk with {current_med}"
+        return interaction_warning
     
     def _get_side_effects(self, medication):
         """Get side effects for a medication"""
-        # Check if we have side effects data for this medication
-        try:
-            med_side_effects = self.side_effects[self.side_effects['medication'] == medication]
-            
-            if not med_side_effects.empty:
-                # Return actual side effects
-                side_effects = []
-                for _, row in med_side_effects.iterrows():
-                    side_effects.append({
-                        'name': row['side_effect'],
-                        'frequency': row['frequency'],
-                        'severity': row['severity'] / 10.0  # Normalize to 0-1
-                    })
-                return side_effects
-            else:
-                # Return empty list if no side effects data
-                return []
-        except Exception as e:
-            print(f"Error getting side effects for {medication}: {e}")
-            return []
+        return self.catalog.side_effects(medication)
     
     def _get_kimi_insights(self, symptoms, diagnosis, allergies, current_medications, top_recommendations):
-        """Get additional insights from KimiAI via OpenRouter"""
-        try:
-            # Prepare top recommendations as text
-            rec_text = ""
-            for i, r in enumerate(top_recommendations[:3]):
-                if not r['contraindicated']:
-                    rec_text += f"- {r['medication']} ({r['drug_class']}): Effectiveness {r['effectiveness']:.0%}"
-                    if r['is_first_line']:
-                        rec_text += " (First-line treatment)"
-                    rec_text += "\n"
+        """Start an AI insights request via OpenRouter without waiting for it
+        
+        Returns:
+            Prompt key; pass it to get_insights to collect the text
+        """
+        # Prepare top recommendations as text
+        rec_text = ""
+        for i, r in enumerate(top_recommendations[:3]):
+            if not r['contraindicated']:
+                rec_text += f"- {r['medication']} ({r['drug_class']}): Effectiveness {r['effectiveness']:.0%}"
+                if r['is_first_line']:
+                    rec_text += " (First-line treatment)"
+                rec_text += "\n"
+                
+                if r['interaction_warning']:
+                    rec_text += f"  Warning: {r['interaction_warning']}\n"
                     
-                    if r['interaction_warning']:
-                        rec_text += f"  Warning: {r['interaction_warning']}\n"
-                        
-                    if r['side_effects']:
-                        rec_text += "  Common side effects: "
-                        rec_text += ", ".join(f"{se['name']} ({se['frequency']:.0%} frequency)" 
-                                             for se in r['side_effects'][:3])
-                        rec_text += "\n"
-            
-            if not rec_text:
-                rec_text = "No suitable medications found."
-            
-            # Construct prompt
-            prompt = f"""
-            Based on the following patient information, provide a brief analysis of the treatment recommendations:
-            
-            PATIENT SYMPTOMS: {symptoms}
-            DIAGNOSED CONDITION: {diagnosis}
-            ALLERGIES: {', '.join(allergies) if allergies else 'None reported'}
-            CURRENT MEDICATIONS: {', '.join(current_medications) if current_medications else 'None'}
-            
-            TOP RECOMMENDED TREATMENTS:
-            {rec_text}
-            
-            Please provide:
-            1. A brief explanation of why these medications are suitable for the diagnosed condition
-            2. Any potential medication interactions with current medications
-            3. Any lifestyle recommendations that would complement the treatment
-            4. Important monitoring considerations or warning signs the patient should be aware of
-            """
-            
-            # Make API request to KimiAI
-            headers = {
-                "Authorization": f"Bearer {KIMI_API_KEY}",
-                "Content-Type": "application/json"
-            }
-            
-            data = {
-                "model": "anthropic/claude-3-sonnet",
-                "messages": [
-                    {"role": "user", "content": prompt}
-                ]
-            }
-            
-            print("Requesting AI insights...")
-            response = requests.post(KIMI_API_URL, headers=headers, json=data)
-            result = response.json()
-            
-            # Extract the response
-            if 'choices' in result and len(result['choices']) > 0:
-                return result['choices'][0]['message']['content']
-            else:
-                print(f"Unexpected API response format: {result}")
-                return "AI insights not available at this time."
-        except Exception as e:
-            print(f"Error getting AI insights: {e}")
-            return "AI insights not available at this time."
+                if r['side_effects']:
+                    rec_text += "  Common side effects: "
+                    rec_text += ", ".join(f"{se['name']} ({se['frequency']:.0%} frequency)" 
+                                         for se in r['side_effects'][:3])
+                    rec_text += "\n"
+        
+        if not rec_text:
+            rec_text = "No suitable medications found."
+        
+        # Construct prompt
+        prompt = f"""
+        Based on the following patient information, provide a brief analysis of the treatment recommendations:
+        
+        PATIENT SYMPTOMS: {symptoms}
+        DIAGNOSED CONDITION: {diagnosis}
+        ALLERGIES: {', '.join(allergies) if allergies else 'None reported'}
+        CURRENT MEDICATIONS: {', '.join(current_medications) if current_medications else 'None'}
+        
+        TOP RECOMMENDED TREATMENTS:
+        {rec_text}
+        
+        Please provide:
+        1. A brief explanation of why these medications are suitable for the diagnosed condition
+        2. Any potential medication interactions with current medications
+        3. Any lifestyle recommendations that would complement the treatment
+        4. Important monitoring considerations or warning signs the patient should be aware of
+        """
+        
+        print("Requesting AI insights...")
+        return self.insights.submit(prompt)
+    
+    def get_insights(self, insights_key, timeout=0):
+        """Return AI insights for a request key, waiting up to timeout seconds"""
+        content = self.insights.result(insights_key, timeout=timeout)
+        if content is not None:
+            return content
+        if self.insights.status(insights_key) == "pending":
+            return PENDING_MESSAGE
+        return UNAVAILABLE_MESSAGE
 
 def main():
     """Main entry point for recommendation system"""
@@ -527,9 +435,16 @@ def main():
     else:
         print("\nNo contraindicated medications identified.")
     
-    # Show AI insights
+    # Show AI insights (requested in the background while results were shown)
     print("\n===== MEDICAL INSIGHTS =====\n")
+    if results.get('insights_key'):
+        results['ai_insights'] = recommender.get_insights(results['insights_key'], timeout=INSIGHTS_TIMEOUT)
     print(results['ai_insights'])
 
 if __name__ == "__main__":
-    main()
+    # Server and batch modes keep one recommender loaded for many patients
+    if "--serve" in sys.argv or "--batch" in sys.argv:
+        from recommend_service import main as service_main
+        service_main(sys.argv[1:])
+    else:
+        main()
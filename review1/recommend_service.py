@@ -0,0 +1,301 @@
+import os
+import sys
+import json
+import math
+import time
+import argparse
+import socketserver
+import numpy as np
+from pathlib import Path
+from urllib.parse import urlsplit, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from recommend import TreatmentRecommender
+
+# Constants
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MAX_REQUEST_BYTES = 10 * 1024 * 1024
+MAX_INSIGHTS_WAIT = 30
+
+def _split_list(value):
+    """Accept either a list or a comma separated string"""
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [item.strip() for item in value.split(',') if item.strip()]
+    return [str(item).strip() for item in value if str(item).strip()]
+
+def normalize_patient(record):
+    """Validate a JSON patient record and fill in optional fields
+
+    Args:
+        record: Dictionary with age, gender, symptoms and optionally name,
+            allergies and current_medications
+
+    Returns:
+        patient_info dictionary in the shape get_recommendations expects
+    """
+    if not isinstance(record, dict):
+        raise ValueError("Patient record must be a JSON object")
+
+    try:
+        age = int(record["age"])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("Field 'age' must be an integer")
+    if not 0 < age < 120:
+        raise ValueError("Field 'age' must be between 1 and 119")
+
+    gender = str(record.get("gender", "")).upper()
+    if gender not in ("M", "F"):
+        raise ValueError("Field 'gender' must be M or F")
+
+    symptoms = record.get("symptoms")
+    if isinstance(symptoms, list):
+        symptoms = ", ".join(str(s) for s in symptoms)
+    if not symptoms or not str(symptoms).strip():
+        raise ValueError("Field 'symptoms' is required")
+
+    return {
+        "name": str(record.get("name", "Unknown")),
+        "age": age,
+        "gender": gender,
+        "symptoms": str(symptoms),
+        "allergies": _split_list(record.get("allergies")),
+        "current_medications": _split_list(record.get("current_medications", record.get("medications")))
+    }
+
+def _json_default(value):
+    """Serialize NumPy scalars and arrays"""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def to_json(data):
+    """Encode a result as JSON"""
+    return json.dumps(data, default=_json_default)
+
+def recommend_record(recommender, record, include_insights=True, insights_timeout=0):
+    """Run one patient record through the recommender
+
+    Args:
+        recommender: Loaded TreatmentRecommender
+        record: Patient record
+        include_insights: Whether to request AI insights
+        insights_timeout: Seconds to wait for the insights (0 returns at once)
+
+    Returns:
+        Result dictionary, or a dictionary with an 'error' key for invalid input
+    """
+    try:
+        patient_info = normalize_patient(record)
+    except ValueError as e:
+        return {"error": str(e)}
+
+    result = recommender.get_recommendations(patient_info, include_insights=include_insights)
+    if result.get('insights_key') and insights_timeout:
+        result['ai_insights'] = recommender.get_insights(result['insights_key'], timeout=insights_timeout)
+    return result
+
+def run_batch(recommender, input_path, output_path=None, include_insights=True, insights_timeout=MAX_INSIGHTS_WAIT):
+    """Process a JSONL file of patient records with a single warm recommender
+
+    Each output line holds the input line number, the patient name and either
+    the recommendation result or an error.
+
+    Args:
+        recommender: Loaded TreatmentRecommender
+        input_path: JSONL file with one patient record per line
+        output_path: Output JSONL file (defaults to <input>.results.jsonl)
+        include_insights: Whether to request AI insights for every patient
+        insights_timeout: Seconds to wait for each patient's insights
+
+    Returns:
+        Dictionary with processed, failed and seconds
+    """
+    input_path = Path(input_path)
+    output_path = Path(output_path) if output_path else input_path.with_suffix(".results.jsonl")
+
+    processed = 0
+    failed = 0
+    start_time = time.time()
+
+    with open(input_path, "r") as src, open(output_path, "w") as dst:
+        for line_number, line in enumerate(src, start=1):
+            if not line.strip():
+                continue
+
+            try:
+                record = json.loads(line)
+                result = recommend_record(recommender, record, include_insights, insights_timeout)
+            except json.JSONDecodeError as e:
+                record, result = {}, {"error": f"Invalid JSON: {e}"}
+            except Exception as e:
+                result = {"error": f"Recommendation failed: {e}"}
+
+            if "error" in result:
+                failed += 1
+            processed += 1
+
+            name = record.get("name") if isinstance(record, dict) else None
+            dst.write(to_json({"line": line_number, "name": name, "result": result}) + "\n")
+
+    seconds = time.time() - start_time
+    print(f"\nProcessed {processed} patients ({failed} failed) in {seconds:.2f} seconds")
+    print(f"Results saved to {output_path}")
+
+    return {"processed": processed, "failed": failed, "seconds": seconds}
+
+class RecommendationHandler(BaseHTTPRequestHandler):
+    """HTTP handler that serves recommendations from a warm recommender
+
+    GET  /health          -> {"status": "ok"}
+    POST /recommend       -> recommendation for a patient record, or a list of
+                             results when the body is a JSON array; AI insights
+                             are requested in the background
+    GET  /insights/<key>  -> insights for the insights_key of a result;
+                             ?wait=N waits up to N seconds for them
+    """
+
+    recommender = None
+    include_insights = True
+
+    def _send_json(self, status, data):
+        body = to_json(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == "/health":
+            self._send_json(200, {"status": "ok"})
+        elif url.path.startswith("/insights/"):
+            self._send_insights(url.path[len("/insights/"):], parse_qs(url.query))
+        else:
+            self._send_json(404, {"error": "Not found"})
+
+    def _send_insights(self, key, query):
+        try:
+            wait = float(query.get("wait", ["0"])[0])
+        except ValueError:
+            wait = math.nan
+        if not math.isfinite(wait) or wait < 0:
+            self._send_json(400, {"error": "Parameter 'wait' must be a non-negative number of seconds"})
+            return
+        wait = min(wait, MAX_INSIGHTS_WAIT)
+
+        insights = self.recommender.get_insights(key, timeout=wait)
+        status = self.recommender.insights.status(key)
+        self._send_json(404 if status == "unavailable" else 200, {
+            "insights_key": key,
+            "status": status,
+            "ai_insights": insights
+        })
+
+    def do_POST(self):
+        if self.path != "/recommend":
+            self._send_json(404, {"error": "Not found"})
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        if length > MAX_REQUEST_BYTES:
+            self._send_json(413, {"error": "Request body too large"})
+            return
+
+        try:
+            payload = json.loads(self.rfile.read(length) or b"null")
+        except json.JSONDecodeError as e:
+            self._send_json(400, {"error": f"Invalid JSON: {e}"})
+            return
+
+        try:
+            if isinstance(payload, list):
+                results = [recommend_record(self.recommender, record, self.include_insights) for record in payload]
+                self._send_json(200, results)
+            else:
+                result = recommend_record(self.recommender, payload, self.include_insights)
+                self._send_json(400 if "error" in result else 200, result)
+        except Exception as e:
+            self._send_json(500, {"error": f"Recommendation failed: {e}"})
+
+    def address_string(self):
+        # Unix socket peers have no (host, port) address
+        return self.client_address[0] if self.client_address else "unix"
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Threaded HTTP server listening on a Unix domain socket"""
+    daemon_threads = True
+
+def create_server(recommender, host=DEFAULT_HOST, port=DEFAULT_PORT, socket_path=None, include_insights=True):
+    """Create an HTTP server bound to a TCP port or a Unix socket
+
+    Args:
+        recommender: Loaded TreatmentRecommender shared by all requests
+        host: TCP host
+        port: TCP port
+        socket_path: Unix socket path (takes precedence over host/port)
+        include_insights: Whether to request AI insights for every patient
+
+    Returns:
+        Server instance (call serve_forever to start)
+    """
+    handler = type("BoundRecommendationHandler", (RecommendationHandler,), {
+        "recommender": recommender,
+        "include_insights": include_insights
+    })
+
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        return UnixHTTPServer(socket_path, handler)
+
+    return ThreadingHTTPServer((host, port), handler)
+
+def serve(recommender, host=DEFAULT_HOST, port=DEFAULT_PORT, socket_path=None, include_insights=True):
+    """Serve recommendations until interrupted"""
+    server = create_server(recommender, host, port, socket_path, include_insights)
+    address = f"unix:{socket_path}" if socket_path else f"http://{host}:{port}"
+    print(f"\nServing recommendations on {address} (POST /recommend, GET /health)")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down...")
+    finally:
+        server.server_close()
+        if socket_path and os.path.exists(socket_path):
+            os.remove(socket_path)
+
+def main(argv=None):
+    """Command line entry point for the server and batch modes"""
+    parser = argparse.ArgumentParser(description="Serve or batch-process treatment recommendations")
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--serve", action="store_true", help="Run a long-lived HTTP server")
+    mode.add_argument("--batch", metavar="FILE", help="Process a JSONL file of patient records")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="Server host")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Server port")
+    parser.add_argument("--socket", help="Serve on a Unix socket instead of TCP")
+    parser.add_argument("--output", help="Batch output JSONL file")
+    parser.add_argument("--no-insights", action="store_true", help="Skip AI insights requests")
+    parser.add_argument("--insights-timeout", type=float, default=MAX_INSIGHTS_WAIT,
+                        help="Seconds to wait for each patient's insights in batch mode")
+    args = parser.parse_args(argv)
+    if not math.isfinite(args.insights_timeout) or args.insights_timeout < 0:
+        parser.error("--insights-timeout must be a non-negative number of seconds")
+
+    # All models and data files are loaded once here
+    recommender = TreatmentRecommender()
+    include_insights = not args.no_insights
+
+    if args.batch:
+        run_batch(recommender, args.batch, args.output, include_insights, args.insights_timeout)
+    else:
+        serve(recommender, args.host, args.port, args.socket, include_insights)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
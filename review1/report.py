@@ -0,0 +1,131 @@
+import os
+import html
+import time
+import base64
+import pandas as pd
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+# Constants
+EVAL_DIR = Path("./evaluation")
+REPORT_FILE = "report.html"
+MAX_WORKERS = 4
+
+# evodoc_prototype/src/ml/report.py renders the prototype's training figures
+# the same way; the two apps ship separately and share no code, so the
+# rendering and HTML layout are kept in step by hand. This one draws the
+# evaluation of a single model: errors, scenarios and per-medication results.
+
+def _pyplot():
+    """Import pyplot with the non-interactive Agg backend"""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
+
+def plot_pred_vs_actual(ax, y_true, y_pred, title='Predicted vs Actual Treatment Effectiveness'):
+    """Scatter of predicted against actual effectiveness"""
+    ax.scatter(y_true, y_pred, alpha=0.3)
+    ax.plot([0, 1], [0, 1], 'r--')
+    ax.set_xlabel('Actual Effectiveness')
+    ax.set_ylabel('Predicted Effectiveness')
+    ax.set_title(title)
+
+def plot_error_distribution(ax, errors):
+    """Histogram of prediction errors"""
+    import seaborn as sns
+    sns.histplot(errors, kde=True, ax=ax)
+    ax.set_xlabel('Prediction Error')
+    ax.set_ylabel('Frequency')
+    ax.set_title('Distribution of Prediction Errors')
+
+def plot_top_medications(ax, medications, effectiveness):
+    """Bar chart of average effectiveness per medication"""
+    import seaborn as sns
+    sns.barplot(x=effectiveness, y=medications, ax=ax)
+    ax.set_xlabel('Average Effectiveness')
+    ax.set_title('Top 10 Most Effective Medications')
+
+PLOTTERS = {
+    "pred_vs_actual": plot_pred_vs_actual,
+    "error_distribution": plot_error_distribution,
+    "top_medications": plot_top_medications
+}
+
+def figure(kind, filename, caption, figsize=(10, 6), **data):
+    """Describe one figure to render (plain data, so it can go to a worker process)"""
+    if kind not in PLOTTERS:
+        raise ValueError(f"Unknown figure type: {kind}")
+    return {"kind": kind, "file": filename, "caption": caption, "figsize": figsize, "data": data}
+
+def render_figure(spec, output_dir):
+    """Draw one figure to a PNG file and close it (runs in a worker process)
+
+    Returns:
+        (file name, seconds)
+    """
+    start = time.perf_counter()
+    plt = _pyplot()
+    fig, ax = plt.subplots(figsize=spec["figsize"])
+    try:
+        PLOTTERS[spec["kind"]](ax, **spec["data"])
+        fig.tight_layout()
+        fig.savefig(Path(output_dir) / spec["file"])
+    finally:
+        plt.close(fig)
+    return spec["file"], time.perf_counter() - start
+
+def _image_tag(path, caption):
+    with open(path, "rb") as f:
+        encoded = base64.b64encode(f.read()).decode("ascii")
+    return (f'<figure><img src="data:image/png;base64,{encoded}" alt="{html.escape(caption)}">'
+            f'<figcaption>{html.escape(caption)}</figcaption></figure>')
+
+def write_report(figures, tables=None, title="EvoDoc Evaluation Report", output_dir=EVAL_DIR,
+                 max_workers=MAX_WORKERS):
+    """Render figures in a process pool and write one self-contained HTML report
+
+    Every figure is also kept as a PNG next to the report.
+
+    Args:
+        figures: List of figure() specs
+        tables: Dictionary of section title -> DataFrame
+        title: Report title
+        output_dir: Directory for the PNG files and the report
+        max_workers: Worker processes (1 renders in this process)
+
+    Returns:
+        Path of the HTML report
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    start = time.perf_counter()
+
+    if max_workers <= 1 or len(figures) <= 1:
+        rendered = [render_figure(spec, output_dir) for spec in figures]
+    else:
+        # Workers inherit MPLBACKEND so no GUI backend is ever loaded
+        os.environ.setdefault("MPLBACKEND", "Agg")
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(figures))) as pool:
+            rendered = list(pool.map(render_figure, figures, [output_dir] * len(figures)))
+
+    sections = [f"<h1>{html.escape(title)}</h1>",
+                f"<p>Generated {pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S')}</p>"]
+    for heading, table in (tables or {}).items():
+        sections.append(f"<h2>{html.escape(heading)}</h2>")
+        sections.append(table.to_html(index=False, float_format=lambda value: f"{value:.4f}"))
+    if figures:
+        sections.append("<h2>Figures</h2>")
+        sections.extend(_image_tag(output_dir / spec["file"], spec["caption"]) for spec in figures)
+
+    report_path = output_dir / REPORT_FILE
+    with open(report_path, "w") as f:
+        f.write("<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\">"
+                f"<title>{html.escape(title)}</title>"
+                "<style>body{font-family:sans-serif;margin:2em}table{border-collapse:collapse}"
+                "td,th{border:1px solid #ccc;padding:4px 8px}img{max-width:100%}</style>"
+                "</head><body>\n" + "\n".join(sections) + "\n</body></html>\n")
+
+    seconds = time.perf_counter() - start
+    print(f"Rendered {len(rendered)} figures in {seconds:.2f}s; report saved to {report_path}")
+    return report_path
@@ -0,0 +1,226 @@
+import sys
+import json
+import time
+import pickle
+import argparse
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+from feature_pipeline import pipeline_for
+
+# Constants
+DATA_DIR = Path("./data")
+MODELS_DIR = Path("./models")
+SCENARIOS_FILE = DATA_DIR / "clinical_scenarios.json"
+DEFAULT_K = 3
+REQUIRED_FIELDS = ["age", "gender", "diagnosis", "expected_medications"]
+
+def load_scenarios(path=SCENARIOS_FILE):
+    """Load clinical scenarios from a JSON or YAML file
+
+    The file holds either a list of scenarios or {"scenarios": [...]}; each
+    scenario has age, gender, diagnosis, expected_medications and optionally
+    a name. YAML files need PyYAML.
+
+    Returns:
+        List of scenario dictionaries
+    """
+    path = Path(path)
+    with open(path, "r") as f:
+        if path.suffix.lower() in (".yaml", ".yml"):
+            import yaml
+            data = yaml.safe_load(f)
+        else:
+            data = json.load(f)
+
+    scenarios = data.get("scenarios", []) if isinstance(data, dict) else data
+    for i, scenario in enumerate(scenarios):
+        missing = [field for field in REQUIRED_FIELDS if field not in scenario]
+        if missing:
+            raise ValueError(f"Scenario {i} in {path} is missing {', '.join(missing)}")
+        scenario.setdefault("name", f"Scenario {i + 1}")
+    return scenarios
+
+def synthetic_scenarios(pipeline, n_scenarios, seed=42):
+    """Random scenarios whose expected medications are the first-line treatments
+
+    Only diagnoses with at least one first-line medication in the model's
+    vocabulary are used.
+    """
+    diagnoses = [diagnosis for diagnosis, mask in pipeline.first_line_masks.items() if mask.any()]
+    if not diagnoses:
+        raise ValueError("The feature pipeline has no first-line treatments to build scenarios from")
+
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, len(diagnoses), n_scenarios)
+    ages = rng.integers(1, 95, n_scenarios)
+    genders = rng.choice(["M", "F"], n_scenarios)
+    return [
+        {
+            "name": f"Synthetic {i + 1}",
+            "age": int(ages[i]),
+            "gender": str(genders[i]),
+            "diagnosis": diagnoses[picks[i]],
+            "expected_medications": [pipeline.medications[j]
+                                     for j in np.flatnonzero(pipeline.first_line_masks[diagnoses[picks[i]]])]
+        }
+        for i in range(n_scenarios)
+    ]
+
+def score_scenarios(model, pipeline, scenarios):
+    """Score every scenario x medication pair in one predict call
+
+    Returns:
+        (n_scenarios, n_medications) matrix of predicted effectiveness,
+        columns in pipeline.medications order
+    """
+    medications = pipeline.medications
+    frame = pd.DataFrame({
+        "age": np.repeat([scenario["age"] for scenario in scenarios], len(medications)),
+        "gender": np.repeat([scenario["gender"] for scenario in scenarios], len(medications)),
+        "diagnosis": np.repeat([scenario["diagnosis"] for scenario in scenarios], len(medications)),
+        "medication": np.tile(medications, len(scenarios))
+    })
+    scores = np.asarray(model.predict(pipeline.transform(frame)), dtype=np.float64)
+    return scores.reshape(len(scenarios), len(medications))
+
+def ranking_metrics(scores, relevant, n_expected, k=DEFAULT_K):
+    """Per-scenario ranking metrics with binary relevance
+
+    Args:
+        scores: (n_scenarios, n_medications) predicted effectiveness
+        relevant: Boolean matrix of the same shape marking expected medications
+        n_expected: Expected medications per scenario (including any the
+            model cannot rank because they are not in its vocabulary)
+        k: Cutoff for hit rate, recall and NDCG
+
+    Returns:
+        Dictionary of arrays: order (medication indices best first), hit,
+        recall, mrr, ndcg
+    """
+    n_scenarios, n_medications = scores.shape
+    k = min(k, n_medications)
+
+    # Highest score first; ties keep vocabulary order
+    order = np.argsort(-scores, axis=1, kind="stable")
+    ranked_relevant = np.take_along_axis(relevant, order, axis=1)
+
+    hits_at_k = ranked_relevant[:, :k].sum(axis=1)
+    any_hit = ranked_relevant.any(axis=1)
+    first_hit = ranked_relevant.argmax(axis=1)
+
+    discounts = 1.0 / np.log2(np.arange(2, k + 2))
+    dcg = ranked_relevant[:, :k] @ discounts
+    ideal_hits = np.minimum(n_expected, k)
+    idcg = np.cumsum(discounts)[np.maximum(ideal_hits - 1, 0)] * (ideal_hits > 0)
+
+    return {
+        "order": order,
+        "hit": (hits_at_k > 0).astype(np.float64),
+        "recall": np.divide(hits_at_k, n_expected, out=np.zeros(n_scenarios), where=n_expected > 0),
+        "mrr": np.where(any_hit, 1.0 / (first_hit + 1), 0.0),
+        "ndcg": np.divide(dcg, idcg, out=np.zeros(n_scenarios), where=idcg > 0)
+    }
+
+def evaluate_scenarios(model, pipeline, scenarios, k=DEFAULT_K):
+    """Rank all medications for every scenario and compute the metrics
+
+    Returns:
+        (per-scenario DataFrame, summary dictionary)
+    """
+    medication_index = {medication: i for i, medication in enumerate(pipeline.medications)}
+    relevant = np.zeros((len(scenarios), len(pipeline.medications)), dtype=bool)
+    n_expected = np.zeros(len(scenarios), dtype=np.int64)
+    for row, scenario in enumerate(scenarios):
+        expected = set(scenario["expected_medications"])
+        n_expected[row] = len(expected)
+        for medication in expected:
+            if medication in medication_index:
+                relevant[row, medication_index[medication]] = True
+
+    start = time.perf_counter()
+    scores = score_scenarios(model, pipeline, scenarios)
+    metrics = ranking_metrics(scores, relevant, n_expected, k)
+    seconds = time.perf_counter() - start
+
+    medications = np.array(pipeline.medications, dtype=object)
+    top = medications[metrics["order"][:, :k]]
+    results = pd.DataFrame({
+        "scenario": [scenario["name"] for scenario in scenarios],
+        "top_predictions": [list(row) for row in top],
+        "expected_medications": [list(scenario["expected_medications"]) for scenario in scenarios],
+        "match_percentage": metrics["recall"],
+        f"hit@{k}": metrics["hit"],
+        "mrr": metrics["mrr"],
+        f"ndcg@{k}": metrics["ndcg"]
+    })
+    summary = {
+        "scenarios": len(scenarios),
+        "k": k,
+        f"hit@{k}": float(metrics["hit"].mean()) if len(scenarios) else 0.0,
+        f"recall@{k}": float(metrics["recall"].mean()) if len(scenarios) else 0.0,
+        "mrr": float(metrics["mrr"].mean()) if len(scenarios) else 0.0,
+        f"ndcg@{k}": float(metrics["ndcg"].mean()) if len(scenarios) else 0.0,
+        "seconds": seconds
+    }
+    return results, summary
+
+def print_summary(summary):
+    """Print the aggregate scenario metrics"""
+    k = summary["k"]
+    print(f"\n{summary['scenarios']} scenarios scored in {summary['seconds']:.3f}s")
+    print(f"  Hit rate@{k}: {summary[f'hit@{k}']:.3f}")
+    print(f"  Recall@{k}:   {summary[f'recall@{k}']:.3f}")
+    print(f"  MRR:        {summary['mrr']:.3f}")
+    print(f"  NDCG@{k}:     {summary[f'ndcg@{k}']:.3f}")
+
+def check_thresholds(summary, min_hit=None, min_mrr=None, min_ndcg=None):
+    """Return a list of failed regression gates (empty when all pass)"""
+    k = summary["k"]
+    failures = []
+    for metric, minimum in ((f"hit@{k}", min_hit), ("mrr", min_mrr), (f"ndcg@{k}", min_ndcg)):
+        if minimum is not None and summary[metric] < minimum:
+            failures.append(f"{metric} {summary[metric]:.3f} < {minimum:.3f}")
+    return failures
+
+def load_model_and_pipeline(models_dir=MODELS_DIR):
+    """Load the recommendation model and its feature pipeline"""
+    with open(Path(models_dir) / "models.pkl", "rb") as f:
+        models = pickle.load(f)
+    with open(Path(models_dir) / "encoders.pkl", "rb") as f:
+        encoders = pickle.load(f)
+    return models["recommendation"], pipeline_for(encoders, DATA_DIR)
+
+def main(argv=None):
+    """Command line entry point; exits with status 1 when a gate fails"""
+    parser = argparse.ArgumentParser(description="Evaluate the recommendation model on clinical scenarios")
+    parser.add_argument("--scenarios", default=str(SCENARIOS_FILE), help="JSON or YAML scenario file")
+    parser.add_argument("--synthetic", type=int, help="Use N random first-line scenarios instead of a file")
+    parser.add_argument("--k", type=int, default=DEFAULT_K, help="Cutoff for hit rate, recall and NDCG")
+    parser.add_argument("--output", help="Per-scenario results CSV")
+    parser.add_argument("--min-hit", type=float, help="Fail if hit rate@k is below this")
+    parser.add_argument("--min-mrr", type=float, help="Fail if MRR is below this")
+    parser.add_argument("--min-ndcg", type=float, help="Fail if NDCG@k is below this")
+    args = parser.parse_args(argv)
+
+    model, pipeline = load_model_and_pipeline()
+    if args.synthetic:
+        scenarios = synthetic_scenarios(pipeline, args.synthetic)
+    else:
+        scenarios = load_scenarios(args.scenarios)
+
+    results, summary = evaluate_scenarios(model, pipeline, scenarios, args.k)
+    print_summary(summary)
+
+    if args.output:
+        results.to_csv(args.output, index=False)
+        print(f"Per-scenario results saved to {args.output}")
+
+    failures = check_thresholds(summary, args.min_hit, args.min_mrr, args.min_ndcg)
+    for failure in failures:
+        print(f"FAILED: {failure}")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
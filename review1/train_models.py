@@ -4,10 +4,13 @@ import numpy as np
 import pandas as pd
 from sklearn.preprocessing import StandardScaler, OneHotEncoder
 from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
-from sklearn.model_selection import train_test_split, cross_val_score
+from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_squared_error, r2_score
 import xgboost as xgb
 from pathlib import Path
+from parallel_cv import cross_validate_models, average_fold_models, print_fold_timings
+from feature_pipeline import (CONDITION_GROUPS, FeaturePipeline, pipeline_for, load_first_line_pairs,
+                              load_med_classes, pair_membership, condition_group_flags, age_groups)
 import time
 import sys
 
@@ -16,7 +19,7 @@ DATA_DIR = Path("./data")
 MODELS_DIR = Path("./models")
 MODELS_DIR.mkdir(exist_ok=True)
 
-def train_models(force=False):
+def train_models(force=False, n_jobs=-1, refit=True):
     """Train treatment recommendation and side effect prediction models"""
     print("===== EvoDoc Model Trainer =====")
     
@@ -77,7 +80,7 @@ def train_models(force=False):
     # Train recommendation model
     print("\nTraining improved treatment recommendation model...")
     start_time = time.time()
-    recommendation_model, encoders = train_recommendation_model(train_data)
+    recommendation_model, encoders = train_recommendation_model(train_data, n_jobs=n_jobs, refit=refit)
     training_time = time.time() - start_time
     print(f"Recommendation model training completed in {training_time:.2f} seconds.")
     
@@ -113,6 +116,13 @@ def train_models(force=False):
         print(f"Error saving models: {e}")
         return
     
+    # Export pickle-free copies for serving
+    try:
+        from export_models import export_models
+        export_models()
+    except Exception as e:
+        print(f"Error exporting models: {e}")
+    
     # Create flag file to indicate training is complete
     with open(MODELS_DIR / "training_complete.flag", "w") as f:
         f.write("Training completed on " + pd.Timestamp.now().strftime("%Y-%m-%d %H:%M:%S"))
@@ -124,65 +134,30 @@ def enhance_training_data(data):
     print("Adding medical domain knowledge features...")
     enhanced_data = data.copy()
     
+    # Integer codes for the distinct diagnoses and medications; per-row
+    # features become lookups into small per-category tables
+    diagnosis = pd.factorize(enhanced_data['diagnosis'], use_na_sentinel=False)
+    medication = pd.factorize(enhanced_data['medication'], use_na_sentinel=False)
+    
     # 1. Load first-line treatment data if available
-    first_line_file = DATA_DIR / "first_line_treatments.csv"
-    if first_line_file.exists():
-        first_line_df = pd.read_csv(first_line_file)
-        
-        # Create first-line indicator
-        first_line_map = {}
-        for _, row in first_line_df.iterrows():
-            condition = row['condition']
-            medication = row['medication']
-            if condition not in first_line_map:
-                first_line_map[condition] = []
-            first_line_map[condition].append(medication)
-        
-        # Add first-line indicator
-        def is_first_line(row):
-            if row['diagnosis'] in first_line_map:
-                return 1 if row['medication'] in first_line_map[row['diagnosis']] else 0
-            return 0
-            
-        enhanced_data['is_first_line'] = enhanced_data.apply(is_first_line, axis=1)
+    first_line_df = load_first_line_pairs(DATA_DIR)
+    if first_line_df is not None:
+        # Add first-line indicator with one pair lookup over all rows
+        enhanced_data['is_first_line'] = pair_membership(diagnosis, medication, first_line_df)
     else:
         # Fallback to use the high effectiveness treatments as first-line
         print("First-line treatment data not found, using effectiveness as proxy.")
-        high_effectiveness = enhanced_data[enhanced_data['effectiveness'] >= 8]
-        first_line_map = {}
-        for _, row in high_effectiveness.iterrows():
-            diag = row['diagnosis']
-            med = row['medication']
-            if diag not in first_line_map:
-                first_line_map[diag] = set()
-            first_line_map[diag].add(med)
-            
-        enhanced_data['is_first_line'] = enhanced_data.apply(
-            lambda row: 1 if row['medication'] in first_line_map.get(row['diagnosis'], set()) else 0,
-            axis=1
-        )
+        high_effectiveness = enhanced_data.loc[enhanced_data['effectiveness'] >= 8, ['diagnosis', 'medication']]
+        enhanced_data['is_first_line'] = pair_membership(diagnosis, medication, high_effectiveness)
     
     # 2. Add age-condition interaction features
     # Create age groups
     if 'age_group' not in enhanced_data.columns:
-        enhanced_data['age_group'] = pd.cut(
-            enhanced_data['age'], 
-            bins=[0, 18, 40, 65, 100], 
-            labels=['pediatric', 'young_adult', 'middle_age', 'elderly']
-        )
+        enhanced_data['age_group'] = age_groups(enhanced_data['age'])
     
     # 3. Add medication class features
-    med_class_file = DATA_DIR / "drugbank_sample.json"
-    if med_class_file.exists():
-        import json
-        with open(med_class_file, 'r') as f:
-            drug_data = json.load(f)
-            
-        med_class_map = {}
-        for drug in drug_data.get('drugs', []):
-            if 'name' in drug and 'drug_class' in drug:
-                med_class_map[drug['name']] = drug['drug_class']
-                
+    med_class_map = load_med_classes(DATA_DIR)
+    if med_class_map is not None:
         enhanced_data['med_class'] = enhanced_data['medication'].map(med_class_map)
         
         # Fill missing values
@@ -193,24 +168,18 @@ def enhance_training_data(data):
         print("Drug class data not found, skipping medication class features.")
     
     # 4. Add condition group features
-    condition_groups = {
-        "respiratory": ["Pneumonia", "Bronchitis", "Asthma", "COPD", "Allergic Rhinitis"],
-        "cardiovascular": ["Hypertension", "Heart failure"],
-        "metabolic": ["Type 2 Diabetes", "Obesity"],
-        "mental_health": ["Depression", "Anxiety"],
-        "pain": ["Migraine", "Osteoarthritis", "Pain"],
-        "infection": ["Pneumonia", "Urinary Tract Infection", "Bronchitis"]
-    }
-    
-    for group, conditions in condition_groups.items():
-        enhanced_data[f'group_{group}'] = enhanced_data['diagnosis'].apply(
-            lambda x: 1 if x in conditions else 0)
+    for column, flags in condition_group_flags(diagnosis, CONDITION_GROUPS).items():
+        enhanced_data[column] = flags
     
     print(f"Added {len(enhanced_data.columns) - len(data.columns)} new features")
     return enhanced_data
 
-def train_recommendation_model(treatment_data):
-    """Train an improved treatment recommendation model"""
+def build_training_matrix(treatment_data):
+    """Fit the feature encoders and build the training matrix
+
+    Returns:
+        (X, y, encoders) where encoders includes the feature names
+    """
     print("Preparing data for recommendation model training...")
     
     # Create encoders for categorical variables
@@ -257,33 +226,44 @@ def train_recommendation_model(treatment_data):
     # Replace NaNs with 0
     numerical_data = numerical_data.fillna(0)
     
-    X_numerical = age_scaler.fit_transform(numerical_data)
+    age_scaler.fit(numerical_data)
     
-    # Transform categorical features
-    print("Transforming categorical features...")
-    X_diagnosis = diagnosis_encoder.transform(treatment_data[['diagnosis']])
-    X_medication = medication_encoder.transform(treatment_data[['medication']])
-    X_gender = gender_encoder.transform(treatment_data[['gender']])
+    # Target: effectiveness (normalize to 0-1 range)
+    y = treatment_data['effectiveness'].values / 10.0
     
-    # Build feature matrix
-    feature_parts = [X_numerical, X_gender, X_diagnosis, X_medication]
+    # Store encoders
+    encoders_dict = {
+        "diagnosis": diagnosis_encoder,
+        "medication": medication_encoder,
+        "gender": gender_encoder,
+        "age": age_scaler
+    }
     
-    # Add optional encoded features
+    # Add optional encoders
     for feature in ['med_class', 'age_group']:
-        if feature in treatment_data.columns:
-            X_feature = encoders[feature].transform(treatment_data[[feature]])
-            feature_parts.append(X_feature)
+        if feature in encoders:
+            encoders_dict[feature] = encoders[feature]
     
-    # Combine all features
-    X = np.hstack(feature_parts)
+    # One feature pipeline, saved with the encoders, builds the matrix here,
+    # in evaluation and in the recommender
+    first_line = load_first_line_pairs(DATA_DIR)
+    if first_line is None:
+        first_line = treatment_data.loc[treatment_data['is_first_line'] == 1, ['diagnosis', 'medication']]
+    pipeline = FeaturePipeline.from_encoders(encoders_dict, numerical_features, first_line=first_line,
+                                             med_classes=load_med_classes(DATA_DIR))
     
+    print("Transforming features...")
+    X = pipeline.transform(treatment_data)
     print(f"Combined feature matrix shape: {X.shape}")
     
-    # Target: effectiveness (normalize to 0-1 range)
-    y = treatment_data['effectiveness'].values / 10.0
+    encoders_dict['pipeline'] = pipeline
+    encoders_dict['feature_names'] = pipeline.columns
     
-    # Try multiple model types
-    models = {
+    return X, y, encoders_dict
+
+def candidate_models():
+    """Unfitted models compared by cross-validation"""
+    return {
         'gradient_boosting': GradientBoostingRegressor(
             n_estimators=200, 
             learning_rate=0.05, 
@@ -309,91 +289,50 @@ def train_recommendation_model(treatment_data):
             random_state=42
         )
     }
-    
-    # Find best model using cross-validation
+
+def train_recommendation_model(treatment_data, n_jobs=-1, refit=True):
+    """Train an improved treatment recommendation model
+    
+    Args:
+        treatment_data: Enhanced treatment records
+        n_jobs: joblib workers for cross-validation (-1 uses all cores)
+        refit: Refit the best model on the full dataset; when False the
+            best model's fold models are averaged instead
+    """
+    X, y, encoders_dict = build_training_matrix(treatment_data)
+    models = candidate_models()
+    
+    # Find best model using cross-validation (models x folds run in parallel)
     print("Comparing models using cross-validation...")
+    cv_results = cross_validate_models(models, X, y, n_jobs=n_jobs, keep_models=not refit)
+    
     best_model_name = None
     best_score = float('-inf')
-    cv_results = {}
-    
-    for name, model in models.items():
-        cv_scores = cross_val_score(model, X, y, cv=5, scoring='r2')
-        mean_score = cv_scores.mean()
-        cv_results[name] = {
-            'mean_r2': mean_score,
-            'std_r2': cv_scores.std()
-        }
-        print(f"{name}: Mean R² = {mean_score:.4f}, Std = {cv_results[name]['std_r2']:.4f}")
+    for name, result in cv_results.items():
+        mean_score = result['mean_r2']
+        print(f"{name}: Mean R² = {mean_score:.4f}, Std = {result['std_r2']:.4f}, "
+              f"fold time = {sum(result['fold_seconds']):.1f}s")
         
         if mean_score > best_score:
             best_score = mean_score
             best_model_name = name
+    print_fold_timings(cv_results)
     
-    # Train best model on full dataset
-    print(f"\nTraining best model ({best_model_name}) on full dataset...")
-    best_model = models[best_model_name]
-    best_model.fit(X, y)
-    
-    # Store encoders
-    encoders_dict = {
-        "diagnosis": diagnosis_encoder,
-        "medication": medication_encoder,
-        "gender": gender_encoder,
-        "age": age_scaler
-    }
-    
-    # Add optional encoders
-    for feature in ['med_class', 'age_group']:
-        if feature in encoders:
-            encoders_dict[feature] = encoders[feature]
-    
-    # Save feature names for importance analysis
-    feature_names = []
-    feature_names.extend([f'numerical_{i}' for i, name in enumerate(numerical_features)])
-    feature_names.extend([f'gender_{cat}' for cat in gender_encoder.categories_[0]])
-    feature_names.extend([f'diagnosis_{cat}' for cat in diagnosis_encoder.categories_[0]])
-    feature_names.extend([f'medication_{cat}' for cat in medication_encoder.categories_[0]])
-    
-    for feature in ['med_class', 'age_group']:
-        if feature in encoders:
-            feature_names.extend([f'{feature}_{cat}' for cat in encoders[feature].categories_[0]])
-    
-    encoders_dict['feature_names'] = feature_names
+    if refit:
+        # Train best model on full dataset
+        print(f"\nTraining best model ({best_model_name}) on full dataset...")
+        best_model = models[best_model_name]
+        best_model.fit(X, y)
+    else:
+        print(f"\nAveraging the {len(cv_results[best_model_name]['fold_r2'])} fold models of {best_model_name}...")
+        best_model = average_fold_models(cv_results[best_model_name])
     
     return best_model, encoders_dict
 
 def evaluate_model(model, encoders, test_data):
     """Evaluate model performance on test data"""
     # Extract features from test data
-    numerical_features = ['age']
-    if 'is_first_line' in test_data.columns:
-        numerical_features.append('is_first_line')
-    
-    # Add condition group features
-    group_features = [col for col in test_data.columns if col.startswith('group_')]
-    numerical_features.extend(group_features)
-    
-    # Prepare numerical data
-    numerical_data = test_data[numerical_features].copy()
-    numerical_data = numerical_data.fillna(0)
-    X_numerical = encoders['age'].transform(numerical_data)
-    
-    # Transform categorical features
-    X_gender = encoders['gender'].transform(test_data[['gender']])
-    X_diagnosis = encoders['diagnosis'].transform(test_data[['diagnosis']])
-    X_medication = encoders['medication'].transform(test_data[['medication']])
-    
-    # Build feature matrix
-    feature_parts = [X_numerical, X_gender, X_diagnosis, X_medication]
-    
-    # Add optional encoded features
-    for feature in ['med_class', 'age_group']:
-        if feature in encoders and feature in test_data.columns:
-            X_feature = encoders[feature].transform(test_data[[feature]])
-            feature_parts.append(X_feature)
-    
-    # Combine all features
-    X = np.hstack(feature_parts)
+    X = pipeline_for(encoders, DATA_DIR).transform(test_data)
     
     # Target
     y_true = test_data['effectiveness'].values / 10.0
@@ -484,4 +423,8 @@ def train_side_effect_models(side_effects):
 if __name__ == "__main__":
     # Check if --force flag is provided
     force = "--force" in sys.argv
-    train_models(force)
+    # --no-refit averages the fold models instead of refitting the best model
+    refit = "--no-refit" not in sys.argv
+    # --jobs N limits the cross-validation workers
+    n_jobs = int(sys.argv[sys.argv.index("--jobs") + 1]) if "--jobs" in sys.argv else -1
+    train_models(force, n_jobs, refit)
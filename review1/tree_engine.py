@@ -0,0 +1,231 @@
+import sys
+import time
+import pickle
+import numpy as np
+from pathlib import Path
+
+# Constants
+MODELS_DIR = Path("./models")
+TOLERANCE = 1e-9
+
+# evodoc_prototype/src/ml/export.py keeps a copy of flatten_trees and
+# tree_ensemble_arrays, and its lightweight.TreeEnsemble walks trees the way
+# CompiledEnsemble does. The two apps ship separately and neither can import
+# the other: these are flat scripts run from review1/, the prototype is the
+# `src` package. Change the node layout in both places.
+# The file formats differ on purpose. This export is read once when
+# recommend.py starts, so one .npz per model is enough. The prototype
+# hot-reloads models in pre-forked workers, so it memory-maps flat arrays and
+# publishes them atomically through a versioned manifest.
+def flatten_trees(trees):
+    """Concatenate fitted sklearn regression trees into flat node arrays
+
+    Args:
+        trees: List of fitted DecisionTreeRegressor objects
+
+    Returns:
+        Dictionary with feature, threshold, left, right, value and roots arrays
+    """
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset = 0
+
+    for tree in trees:
+        tree_ = tree.tree_
+        roots.append(offset)
+        features.append(tree_.feature.astype(np.int32))
+        thresholds.append(tree_.threshold.astype(np.float64))
+        lefts.append(np.where(tree_.children_left >= 0, tree_.children_left + offset, -1).astype(np.int32))
+        rights.append(np.where(tree_.children_right >= 0, tree_.children_right + offset, -1).astype(np.int32))
+        values.append(tree_.value[:, 0, 0].astype(np.float64))
+        offset += tree_.node_count
+
+    return {
+        "feature": np.concatenate(features),
+        "threshold": np.concatenate(thresholds),
+        "left": np.concatenate(lefts),
+        "right": np.concatenate(rights),
+        "value": np.concatenate(values),
+        "roots": np.array(roots, dtype=np.int32)
+    }
+
+def tree_ensemble_arrays(model):
+    """Flatten a fitted random forest or gradient boosting regressor"""
+    if hasattr(model, "init_"):
+        # Gradient boosting: init prediction + learning_rate * sum of stages
+        trees = list(model.estimators_[:, 0])
+        scale = model.learning_rate
+        if model.init_ == "zero":
+            base = 0.0
+        else:
+            base = float(np.ravel(model.init_.predict(np.zeros((1, model.n_features_in_))))[0])
+    else:
+        # Random forest: average of trees
+        trees = list(model.estimators_)
+        scale = 1.0 / len(trees)
+        base = 0.0
+
+    arrays = flatten_trees(trees)
+    arrays["scale"] = np.float64(scale)
+    arrays["base"] = np.float64(base)
+    arrays["n_features"] = np.int64(model.n_features_in_)
+    return arrays
+
+class CompiledEnsemble:
+    """Regression tree ensemble compiled to contiguous node arrays
+
+    All trees share one set of node arrays indexed by global node id. Leaves
+    are rewritten to point at themselves, so a batch is evaluated by moving a
+    (rows x trees) matrix of node ids down one level per step, with no
+    per-tree or per-row Python loop. Entries that reached a leaf drop out of
+    the active set, so deep trees only cost what their actual paths cost.
+    The prediction is ``base + scale * sum(leaf values)``, which covers random
+    forests (scale = 1 / n_trees) and gradient boosting (scale = learning rate).
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, scale, base, n_features):
+        leaf = left < 0
+        nodes = np.arange(len(feature), dtype=np.intp)
+
+        self.feature = np.ascontiguousarray(np.where(leaf, 0, feature), dtype=np.intp)
+        self.threshold = np.ascontiguousarray(threshold, dtype=np.float64)
+        self.left = np.ascontiguousarray(np.where(leaf, nodes, left), dtype=np.intp)
+        self.right = np.ascontiguousarray(np.where(leaf, nodes, right), dtype=np.intp)
+        self.value = np.ascontiguousarray(value, dtype=np.float64)
+        self.roots = np.ascontiguousarray(roots, dtype=np.intp)
+        self.scale = float(scale)
+        self.base = float(base)
+        self.n_features_in_ = int(n_features)
+        self.depth = self._max_depth(leaf)
+
+    def _max_depth(self, leaf):
+        """Number of traversal steps needed to reach every leaf"""
+        depth = 0
+        frontier = self.roots[~leaf[self.roots]]
+        while len(frontier):
+            depth += 1
+            children = np.concatenate([self.left[frontier], self.right[frontier]])
+            frontier = children[~leaf[children]]
+        return depth
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """Build from a dictionary or .npz archive written by tree_ensemble_arrays"""
+        return cls(
+            feature=arrays["feature"],
+            threshold=arrays["threshold"],
+            left=arrays["left"],
+            right=arrays["right"],
+            value=arrays["value"],
+            roots=arrays["roots"],
+            scale=float(arrays["scale"]),
+            base=float(arrays["base"]),
+            n_features=int(arrays["n_features"])
+        )
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """Compile a fitted RandomForestRegressor or GradientBoostingRegressor"""
+        return cls.from_arrays(tree_ensemble_arrays(model))
+
+    def apply(self, X):
+        """Return the leaf node id reached in every tree, shape (rows, trees)"""
+        # Trees compare float32 features against float64 thresholds, as scikit-learn does
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_rows, n_trees = X.shape[0], len(self.roots)
+
+        # One entry per (row, tree); index into the flattened feature matrix
+        node = np.tile(self.roots, n_rows)
+        row_offset = np.repeat(np.arange(n_rows, dtype=np.intp) * X.shape[1], n_trees)
+        flat_X = X.ravel()
+
+        # Only entries that have not reached a leaf move on each step
+        active = np.flatnonzero(self.left[node] != node)
+        for _ in range(self.depth):
+            if not len(active):
+                break
+            current = node[active]
+            go_left = flat_X[row_offset[active] + self.feature[current]] <= self.threshold[current]
+            current = np.where(go_left, self.left[current], self.right[current])
+            node[active] = current
+            active = active[self.left[current] != current]
+
+        return node.reshape(n_rows, n_trees)
+
+    def predict(self, X):
+        """Predict targets for a 2-D feature matrix"""
+        return self.base + self.scale * self.value[self.apply(X)].sum(axis=1)
+
+def _compile(model):
+    """Compile one model, recursing into the members of averaged models"""
+    type_name = type(model).__name__
+    if type_name in ("RandomForestRegressor", "GradientBoostingRegressor"):
+        return CompiledEnsemble.from_sklearn(model)
+    if type_name == "AveragedModel":
+        return type(model)([_compile(member) for member in model.members])
+    return model
+
+def compile_models(models):
+    """Replace sklearn tree ensembles in a models dictionary with compiled ones"""
+    return {name: _compile(model) for name, model in models.items()}
+
+def check_predictions(model, compiled, X):
+    """Return the maximum absolute difference between sklearn and the engine"""
+    return float(np.max(np.abs(model.predict(X) - compiled.predict(X))))
+
+def benchmark(model, compiled, n_rows=200, batch_size=10000, seed=42):
+    """Compare per-row and batch latency of the engine against sklearn
+
+    Args:
+        model: Fitted sklearn tree ensemble
+        compiled: CompiledEnsemble built from the same model
+        n_rows: Number of single-row predictions to time
+        batch_size: Rows in the batch prediction
+        seed: Random seed for the synthetic inputs
+
+    Returns:
+        Dictionary with per-row microseconds, batch seconds and max difference
+    """
+    rng = np.random.default_rng(seed)
+    X = rng.random((max(n_rows, batch_size), model.n_features_in_))
+    X[:, 1:] = X[:, 1:] > 0.5
+
+    results = {"max_diff": check_predictions(model, compiled, X[:batch_size])}
+
+    for label, predictor in (("sklearn", model), ("compiled", compiled)):
+        start = time.perf_counter()
+        for i in range(n_rows):
+            predictor.predict(X[i:i + 1])
+        results[f"{label}_row_us"] = (time.perf_counter() - start) / n_rows * 1e6
+
+        start = time.perf_counter()
+        predictor.predict(X[:batch_size])
+        results[f"{label}_batch_s"] = time.perf_counter() - start
+
+    return results
+
+def benchmark_models(models_dir=MODELS_DIR, n_rows=200, batch_size=10000):
+    """Benchmark every tree ensemble in models.pkl"""
+    with open(Path(models_dir) / "models.pkl", "rb") as f:
+        models = pickle.load(f)
+
+    for name, model in models.items():
+        if type(model).__name__ not in ("RandomForestRegressor", "GradientBoostingRegressor"):
+            continue
+
+        compiled = CompiledEnsemble.from_sklearn(model)
+        results = benchmark(model, compiled, n_rows, batch_size)
+        status = "OK" if results["max_diff"] <= TOLERANCE else "MISMATCH"
+
+        print(f"\n{name} ({len(compiled.roots)} trees, depth {compiled.depth}, {len(compiled.value)} nodes)")
+        print(f"  Max difference vs sklearn: {results['max_diff']:.2e} [{status}]")
+        print(f"  Per-row latency: sklearn {results['sklearn_row_us']:.0f} us, "
+              f"compiled {results['compiled_row_us']:.0f} us "
+              f"({results['sklearn_row_us'] / results['compiled_row_us']:.1f}x)")
+        print(f"  Batch of {batch_size}: sklearn {results['sklearn_batch_s']:.3f}s, "
+              f"compiled {results['compiled_batch_s']:.3f}s")
+
+if __name__ == "__main__":
+    # Usage: python tree_engine.py [--rows N] [--batch N]
+    n_rows = int(sys.argv[sys.argv.index("--rows") + 1]) if "--rows" in sys.argv else 200
+    batch_size = int(sys.argv[sys.argv.index("--batch") + 1]) if "--batch" in sys.argv else 10000
+    benchmark_models(n_rows=n_rows, batch_size=batch_size)